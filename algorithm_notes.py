@@ -0,0 +1,168 @@
+# algorithm_notes.py
+# Ghi chú ngắn cho mọi phương pháp trong ALGORITHM_MAP (index BM25 của research.py trả lời từ đây, không cần mạng).
+# Mỗi ghi chú: điều kiện áp dụng, hội tụ / bậc chính xác, chi phí, tiêu chí dừng; dòng 'VI:' là tên tiếng Việt.
+NOTES = {
+    # root_finding
+    "Bisection": "Requires a continuous f with f(a)*f(b) < 0 (sign change bracket). Halves the interval each step: "
+                 "linear convergence, error bound (b-a)/2^(n+1), iterations n >= log2((b-a)/tol). Always converges, "
+                 "one function evaluation per iteration. VI: phương pháp chia đôi, khoảng phân ly nghiệm.",
+    "Regula Falsi": "Bracketing method using the secant through (a, f(a)), (b, f(b)); keeps the sign change. "
+                    "Convergence is linear and can stall when one endpoint stays fixed (convex f); the Illinois "
+                    "modification halves the retained f value to restore superlinear convergence. Error estimate "
+                    "|x_n - x_{n-1}| or M-m bound |f(x_n)|/m1. VI: phương pháp dây cung (false position).",
+    "Secant": "Open method x_{n+1} = x_n - f(x_n)(x_n - x_{n-1})/(f(x_n) - f(x_{n-1})). Superlinear convergence "
+              "order 1.618 (golden ratio) near a simple root, one new evaluation per step, no derivative needed. "
+              "May diverge from poor starting points. VI: phương pháp cát tuyến.",
+    "Newton-Raphson": "x_{n+1} = x_n - f(x_n)/f'(x_n). Quadratic convergence near a simple root, linear at multiple "
+                      "roots. Fourier condition: start at x0 with f(x0)*f''(x0) > 0 when f', f'' keep their sign on "
+                      "[a, b]. Error estimate |x_n - x*| <= M2/(2 m1) |x_n - x_{n-1}|^2. VI: phương pháp Newton, "
+                      "phương pháp tiếp tuyến.",
+    "Brentq": "Brent's method: combines bisection, secant and inverse quadratic interpolation on a bracket with a "
+              "sign change. Guaranteed convergence like bisection, usually superlinear; default choice in "
+              "scipy.optimize.brentq (xtol, rtol, maxiter). VI: phương pháp Brent.",
+    "Fixed-point": "Rewrite f(x) = 0 as x = g(x) and iterate x_{n+1} = g(x_n). Converges when |g'(x)| <= q < 1 on "
+                   "an interval mapped into itself (contraction mapping); linear convergence with rate q, error "
+                   "bound q/(1-q) |x_n - x_{n-1}|. Aitken / Steffensen acceleration. VI: phương pháp lặp đơn, "
+                   "điểm bất động.",
+    "Muller": "Fits a parabola through three points and takes its root nearest the last iterate; convergence "
+              "order about 1.84, can reach complex roots, no derivative needed. VI: phương pháp Muller.",
+    # linear_system
+    "Gaussian Elimination": "Direct method: forward elimination to upper triangular form then back substitution, "
+                            "O(n^3/3) flops. Use partial pivoting (largest pivot in column) for stability. "
+                            "VI: phương pháp khử Gauss, Gauss-Jordan.",
+    "LU": "Factor PA = LU once (O(n^3)), then each right-hand side costs two triangular solves O(n^2); "
+          "Doolittle / Crout variants, scipy.linalg.lu_factor / lu_solve. VI: phân rã LU.",
+    "Cholesky": "A = L L^T for symmetric positive definite matrices, half the cost of LU and stable without "
+                "pivoting; failure signals A is not SPD. VI: phân rã Cholesky (căn bậc hai).",
+    "Jacobi": "Iterative x^{k+1} = D^{-1}(b - (L+U) x^k). Converges for strictly diagonally dominant A (or spectral "
+              "radius of the iteration matrix < 1); linear convergence, error bound q/(1-q) ||x^k - x^{k-1}||. "
+              "VI: phương pháp lặp Jacobi, lặp đơn cho hệ.",
+    "Gauss-Seidel": "Like Jacobi but uses updated components immediately; converges for diagonally dominant or "
+                    "symmetric positive definite A, usually about twice as fast as Jacobi. VI: phương pháp lặp "
+                    "Seidel, Gauss-Seidel.",
+    "SOR": "Successive over-relaxation: Gauss-Seidel step weighted by omega in (0, 2); optimal omega speeds up "
+           "convergence greatly for SPD / consistently ordered matrices. VI: phương pháp giảm dư (nới lỏng).",
+    "Conjugate Gradient": "Krylov method for symmetric positive definite systems: exact in at most n steps, "
+                          "convergence rate depends on sqrt(condition number); one matrix-vector product per "
+                          "iteration, ideal for large sparse A, preconditioning helps. In optimization: nonlinear "
+                          "CG (Fletcher-Reeves, Polak-Ribiere) for smooth unconstrained minimization. VI: gradient "
+                          "liên hợp.",
+    "GMRES": "Generalized minimal residual Krylov method for general (nonsymmetric) sparse systems; minimizes the "
+             "residual over the Krylov space, restarted GMRES(m) bounds memory; needs preconditioning for hard "
+             "problems. VI: phương pháp GMRES.",
+    # integration
+    "Trapezoid": "Composite trapezoidal rule h/2 (f0 + 2 f1 + ... + 2 f_{n-1} + fn). Error -(b-a) h^2 f''/12, "
+                 "order 2; exact for linear f, very accurate for periodic integrands. VI: công thức hình thang.",
+    "Simpson": "Composite Simpson 1/3 rule, n even: h/3 (f0 + 4 odd + 2 even + fn). Error -(b-a) h^4 f''''/180, "
+               "order 4, exact for cubics; Simpson 3/8 for n multiple of 3. Runge estimate |S_2n - S_n|/15. "
+               "VI: công thức Simpson, cầu phương.",
+    "Romberg": "Richardson extrapolation of trapezoid estimates with h, h/2, h/4...: R(k, j) eliminates error terms "
+               "h^2, h^4, ...; very fast convergence for smooth integrands. VI: phương pháp Romberg.",
+    "Adaptive Quadrature": "Recursive adaptive Simpson (or Gauss-Kronrod as in scipy.integrate.quad): subdivide "
+                           "only where the local error estimate exceeds its share of the tolerance; handles "
+                           "peaks and mild singularities. VI: cầu phương thích nghi.",
+    "Gaussian Quadrature": "Gauss-Legendre with n nodes (roots of Legendre polynomials) is exact for polynomials "
+                           "of degree 2n-1; map [-1, 1] to [a, b]. Highest accuracy per function evaluation for "
+                           "smooth f. VI: công thức cầu phương Gauss.",
+    "Monte Carlo": "Random sampling estimate: mean of f at uniform points times the volume; error O(1/sqrt(N)) "
+                   "independent of dimension, standard error from the sample variance; variance reduction by "
+                   "importance or stratified sampling. Used for high-dimensional integrals and stochastic "
+                   "simulation. VI: phương pháp Monte Carlo, mô phỏng ngẫu nhiên.",
+    # differentiation
+    "Forward Diff": "Forward difference (f(x+h) - f(x))/h, truncation error O(h); rounding error grows like eps/h, "
+                    "optimal h about sqrt(eps). VI: sai phân tiến.",
+    "Central Diff": "Central difference (f(x+h) - f(x-h))/(2h), error O(h^2); second derivative "
+                    "(f(x+h) - 2f(x) + f(x-h))/h^2; optimal h about eps^(1/3). VI: sai phân trung tâm, đạo hàm số.",
+    "Richardson": "Richardson extrapolation combines estimates with steps h and h/2 to cancel the leading error "
+                  "term: (4 D(h/2) - D(h))/3 for central differences, order 4. VI: ngoại suy Richardson.",
+    # ode_ivp
+    "Euler": "Explicit Euler y_{n+1} = y_n + h f(t_n, y_n): first order, global error O(h), conditionally stable "
+             "(h < 2/|lambda| for y' = lambda y). VI: phương pháp Euler hiện; Euler cải tiến (Heun) là bậc 2.",
+    "RK4": "Classical fourth-order Runge-Kutta: four stages k1..k4 per step, global error O(h^4). Error estimate by "
+           "step doubling (Runge rule |y_h - y_{h/2}|/15). VI: phương pháp Runge-Kutta bậc 4.",
+    "RK45": "Embedded Runge-Kutta pair (Dormand-Prince 5(4)) with adaptive step size from the local error "
+            "estimate; default of scipy.integrate.solve_ivp (rtol, atol). Not for stiff problems. "
+            "VI: Runge-Kutta thích nghi bước.",
+    "Implicit Euler": "Backward Euler y_{n+1} = y_n + h f(t_{n+1}, y_{n+1}), solved with Newton iterations; first "
+                      "order, A-stable / L-stable, suited for stiff equations. VI: phương pháp Euler ẩn.",
+    "BDF": "Backward differentiation formulas (orders 1-5) for stiff ODEs; BDF2 is A-stable; "
+           "solve_ivp(method='BDF') with variable order and step. VI: công thức vi phân lùi.",
+    # ode_bvp
+    "Shooting": "Turn a boundary value problem into an initial value problem: guess the missing initial slope, "
+                "integrate (RK4/RK45) and correct the guess with secant or Newton until the far boundary "
+                "condition holds. Sensitive for unstable problems (use multiple shooting). VI: phương pháp bắn.",
+    "Finite Difference": "Replace derivatives by difference quotients on a grid. For BVP y'' = f: central "
+                         "differences give a tridiagonal linear system (Thomas algorithm), error O(h^2). For PDE: "
+                         "explicit scheme for the heat equation is stable when r = k/h^2 <= 1/2, Crank-Nicolson is "
+                         "unconditionally stable and second order; five-point stencil for Laplace / Poisson. "
+                         "VI: phương pháp sai phân hữu hạn.",
+    "Collocation": "Approximate the solution by piecewise polynomials that satisfy the ODE at collocation points "
+                   "and the boundary conditions; scipy.integrate.solve_bvp, high accuracy with mesh refinement. "
+                   "VI: phương pháp collocation (trùng khớp).",
+    # pde
+    "Finite Element": "Weak (variational) form, mesh of elements and local basis functions, assemble a sparse "
+                      "stiffness matrix; flexible geometry, error O(h^(p+1)) in L2 for degree p elements. "
+                      "VI: phương pháp phần tử hữu hạn.",
+    "Spectral Method": "Expand the solution in global basis functions (Fourier for periodic, Chebyshev otherwise); "
+                       "exponential convergence for smooth solutions, dense matrices, FFT-based. VI: phương pháp phổ.",
+    "Finite Volume": "Integral conservation laws over control volumes with numerical fluxes; conservative by "
+                     "construction, standard for hyperbolic / fluid problems (upwind, CFL condition). "
+                     "VI: phương pháp thể tích hữu hạn.",
+    # optimization_unconstrained
+    "Gradient Descent": "x_{k+1} = x_k - alpha grad f(x_k) with a fixed step or line search (Armijo). Linear "
+                        "convergence depending on the condition number; stop when ||grad f|| < tol. "
+                        "VI: phương pháp hạ gradient (suy giảm gradient).",
+    "Newton": "Newton's method for minimization: solve H(x_k) p = -grad f(x_k), quadratic convergence near a "
+              "minimum with positive definite Hessian; needs second derivatives, add line search or trust region "
+              "for global convergence. VI: phương pháp Newton cho tối ưu.",
+    "BFGS": "Quasi-Newton method updating an inverse Hessian approximation from gradient differences; superlinear "
+            "convergence, no second derivatives; L-BFGS for many variables. scipy.optimize.minimize(method='BFGS'). "
+            "VI: phương pháp tựa Newton BFGS.",
+    "Nelder-Mead": "Derivative-free simplex search (reflection, expansion, contraction, shrink); robust for small "
+                   "noisy problems, slow and without convergence guarantees in higher dimensions. "
+                   "VI: phương pháp đơn hình Nelder-Mead.",
+    # optimization_constrained
+    "Lagrange": "Lagrange multipliers for equality constraints: stationary points of L = f - lambda g solve "
+                "grad f = lambda grad g, g = 0; KKT conditions add inequality constraints with complementary "
+                "slackness. VI: phương pháp nhân tử Lagrange.",
+    "SQP": "Sequential quadratic programming: each iteration solves a QP built from a quadratic model of the "
+           "Lagrangian and linearized constraints; superlinear convergence, scipy SLSQP. VI: quy hoạch toàn "
+           "phương liên tiếp.",
+    "Interior Point": "Barrier / primal-dual interior point methods keep iterates strictly feasible and follow the "
+                      "central path; polynomial complexity for LP/QP, good for large problems. "
+                      "VI: phương pháp điểm trong.",
+    "Augmented Lagrangian": "Adds a quadratic penalty to the Lagrangian and updates multipliers "
+                            "lambda <- lambda - mu g(x); avoids the ill-conditioning of pure penalty methods. "
+                            "VI: phương pháp Lagrange tăng cường.",
+    # approximation
+    "Polynomial Interpolation": "Lagrange or Newton divided-difference form of the unique degree n polynomial "
+                                "through n+1 points; error f^(n+1)(xi)/(n+1)! prod (x - x_i); Runge phenomenon on "
+                                "equispaced nodes, prefer Chebyshev nodes. VI: đa thức nội suy Lagrange, Newton tiến/lùi.",
+    "Spline": "Piecewise cubic polynomials with continuous first and second derivatives (natural or clamped end "
+              "conditions); tridiagonal system for the coefficients, error O(h^4), no Runge oscillation. "
+              "VI: nội suy spline bậc ba.",
+    "Chebyshev": "Chebyshev nodes cos((2k+1) pi/(2n+2)) minimize the interpolation error product; Chebyshev "
+                 "series give near-minimax polynomial approximation. VI: đa thức Chebyshev.",
+    "Least Squares": "Minimize ||A c - y||^2 for a chosen model (polynomial, exponential after log transform): "
+                     "normal equations A^T A c = A^T y or QR / SVD (better conditioned); report residual sum of "
+                     "squares. VI: phương pháp bình phương tối thiểu, hồi quy.",
+    # eigen
+    "Power Method": "Repeated x <- A x / ||A x|| converges to the dominant eigenvector; the Rayleigh quotient gives "
+                    "the eigenvalue; rate |lambda2/lambda1|. VI: phương pháp lũy thừa, trị riêng trội.",
+    "Inverse Power": "Power method on (A - sigma I)^{-1} (one LU factorization, then solves) converges to the "
+                     "eigenvalue closest to the shift sigma; Rayleigh quotient iteration converges cubically for "
+                     "symmetric A. VI: phương pháp lũy thừa ngược.",
+    "QR": "QR algorithm: A_k = Q_k R_k, A_{k+1} = R_k Q_k after Hessenberg reduction, with shifts and deflation; "
+          "computes all eigenvalues, numpy.linalg.eig / eigh. VI: thuật toán QR tìm giá trị riêng.",
+    "Lanczos": "Krylov method for a few extreme eigenvalues of large sparse symmetric matrices (tridiagonal "
+               "projection); scipy.sparse.linalg.eigsh. VI: phương pháp Lanczos.",
+    "Arnoldi": "Krylov method for a few eigenvalues of large sparse nonsymmetric matrices (Hessenberg "
+               "projection, implicitly restarted in ARPACK); scipy.sparse.linalg.eigs. VI: phương pháp Arnoldi.",
+    # stochastic
+    "MCMC": "Markov chain Monte Carlo (Metropolis-Hastings, Gibbs) samples from a distribution known up to a "
+            "constant; discard burn-in, check convergence (trace, R-hat), estimates have autocorrelated error. "
+            "VI: Monte Carlo xích Markov.",
+    "Importance Sampling": "Sample from a proposal q and weight by p/q to reduce variance of Monte Carlo estimates "
+                           "(rare events, peaked integrands); self-normalized weights when p is unnormalized. "
+                           "VI: lấy mẫu theo trọng số.",
+}
@@ -1,14 +1,10 @@
 # algorithm_researcher.py
 import textwrap, json, re
-from settings import LLM
+from settings import get_cached_llm
 from algorithm_map import ALGORITHM_MAP
 
-def research_and_propose(task_text: str, category_hint: str = None, short_form: str = None, domain_hint: str = None) -> dict:
-    """
-    Return: { candidate_methods: [...], reasoning: str, research_actions: str }
-    Prefer JSON from LLM; fallback to ALGORITHM_MAP.
-    """
-    prompt = textwrap.dedent(f"""
+def _research_prompt(task_text: str, category_hint: str = None, short_form: str = None, domain_hint: str = None) -> str:
+    return textwrap.dedent(f"""
     Bạn là nhà nghiên cứu thuật toán số. Dựa trên:
     - category_hint: {category_hint}
     - short_form: {short_form}
@@ -18,8 +14,21 @@ def research_and_propose(task_text: str, category_hint: str = None, short_form:
     Đề xuất khoảng 2-3 phương pháp phù hợp (không liệt kê tất cả). Với mỗi phương pháp hãy nêu lí do lựa chọn.
     Trả về kết quả dưới dạng JSON: {{ "candidate_methods": [...], "reasoning":"...", "research_actions":"..." }}
     """)
-    resp = LLM.invoke(prompt)
-    content = getattr(resp, "content", str(resp)).strip()
+
+def research_and_propose(task_text: str, category_hint: str = None, short_form: str = None, domain_hint: str = None) -> dict:
+    """
+    Return: { candidate_methods: [...], reasoning: str, research_actions: str }
+    Prefer JSON from LLM; fallback to ALGORITHM_MAP.
+    """
+    resp = get_cached_llm().invoke(_research_prompt(task_text, category_hint, short_form, domain_hint))
+    return _parse_research(getattr(resp, "content", str(resp)).strip(), category_hint)
+
+async def aresearch_and_propose(task_text: str, category_hint: str = None, short_form: str = None, domain_hint: str = None) -> dict:
+    """Async research_and_propose (non-blocking LLM call)."""
+    resp = await get_cached_llm().ainvoke(_research_prompt(task_text, category_hint, short_form, domain_hint))
+    return _parse_research(getattr(resp, "content", str(resp)).strip(), category_hint)
+
+def _parse_research(content: str, category_hint: str = None) -> dict:
     m = re.search(r"\{.*\}", content, re.S)
     if m:
         try:
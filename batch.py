@@ -0,0 +1,162 @@
+# batch.py
+"""
+Batch runner: run the compiled graph over many tasks with bounded concurrency.
+
+    python batch.py tasks.jsonl -o results.jsonl -c 8
+    cat tasks.jsonl | python batch.py - -o results.jsonl
+
+Input lines: {"id": "...", "task": "..."} (id optional, defaults to a hash of the task) or a JSON string.
+Each finished task is appended to the output as one JSON line (status, timing, answer, run report summary) and flushed,
+so a crash keeps everything already written; re-running with the same output skips tasks whose
+last recorded status is "ok"; with checkpoints on (CHECKPOINT=1) a task that failed or timed out
+resumes from its last completed node instead of starting over. Gemini calls and sandbox creation share the token-bucket limiters
+from settings (get_gemini_rate_limiter(), get_sandbox_rate_limiter()).
+"""
+import argparse, asyncio, json, os, sys, time
+from typing import Iterator, Optional, Set
+from contextlib import asynccontextmanager
+from instrumentation import start_run, end_run, EXPORTER
+from checkpoint import task_hash, open_checkpointer, invoke_checkpointed
+
+def task_id(task: str) -> str:
+    return task_hash(task)
+
+def read_tasks(path: str) -> Iterator[dict]:
+    f = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        for n, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                obj = json.loads(line)
+            except json.JSONDecodeError:
+                obj = line  # cho phép dòng text thuần
+            if isinstance(obj, str):
+                obj = {"task": obj}
+            if not obj.get("task"):
+                print(f"[batch] line {n}: missing 'task', skipped", file=sys.stderr)
+                continue
+            obj.setdefault("id", task_id(obj["task"]))
+            yield obj
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+def completed_ids(path: str) -> Set[str]:
+    """Ids whose latest line in an existing output file has status 'ok'."""
+    status = {}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                    status[rec["id"]] = rec.get("status")
+                except (json.JSONDecodeError, KeyError, TypeError):
+                    continue  # dòng ghi dở khi crash
+    return {k for k, v in status.items() if v == "ok"}
+
+def _text(value) -> Optional[str]:
+    return getattr(value, "content", value) if value is not None else None
+
+class JsonlWriter:
+    def __init__(self, path: str):
+        self._f = open(path, "a", encoding="utf-8")
+        self._lock = asyncio.Lock()
+
+    async def write(self, rec: dict):
+        async with self._lock:
+            self._f.write(json.dumps(rec, ensure_ascii=False, default=str) + "\n")
+            self._f.flush()
+            os.fsync(self._f.fileno())
+
+    def close(self):
+        self._f.close()
+
+async def run_one(graph, item: dict, timeout: Optional[float], ledger=None) -> dict:
+    started = time.time()
+    t0 = time.perf_counter()
+    report = start_run(item["task"])
+    rec = {"id": item["id"], "task": item["task"], "started_at": started}
+    from main import close_run_session
+    try:
+        thread_id, state = await asyncio.wait_for(
+            invoke_checkpointed(graph, item["task"], ledger, resume=True, on_abort=close_run_session), timeout)
+        best = state.get("best_algorithm") or {}
+        rec.update(status="ok", final_response=_text(state.get("final_response")),
+                   method=best.get("method"), steps=len(state.get("past_steps", [])), thread_id=thread_id)
+    except asyncio.TimeoutError:
+        rec.update(status="timeout", error=f"timeout after {timeout}s")
+    except Exception as e:
+        rec.update(status="error", error=f"{type(e).__name__}: {e}")
+    rec["elapsed_s"] = round(time.perf_counter() - t0, 3)
+    rec["report"] = end_run(report).summary()
+    return rec
+
+@asynccontextmanager
+async def _graph():
+    from main import graph, builder  # import muộn: main dựng tools/agent khi import
+    from settings import CHECKPOINT
+    if not CHECKPOINT:
+        yield graph, None
+        return
+    async with open_checkpointer() as (saver, ledger):
+        yield builder.compile(checkpointer=saver), ledger
+
+async def run_batch(path: str, out_path: str, concurrency: int = 4, timeout: Optional[float] = None) -> dict:
+    async with _graph() as (graph, ledger):
+        return await _run_batch(graph, ledger, path, out_path, concurrency, timeout)
+
+async def _run_batch(graph, ledger, path: str, out_path: str, concurrency: int, timeout: Optional[float]) -> dict:
+    done = completed_ids(out_path)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    writer = JsonlWriter(out_path)
+    summary = {"ok": 0, "error": 0, "timeout": 0, "skipped": 0}
+
+    async def producer():
+        for item in read_tasks(path):
+            if item["id"] in done:
+                summary["skipped"] += 1
+                continue
+            done.add(item["id"])  # trùng id trong cùng file chỉ chạy một lần
+            await queue.put(item)
+        for _ in range(concurrency):
+            await queue.put(None)
+
+    async def worker():
+        while (item := await queue.get()) is not None:
+            rec = await run_one(graph, item, timeout, ledger)
+            summary[rec["status"]] += 1
+            await writer.write(rec)
+            print(f"[batch] {rec['id']} {rec['status']} {rec['elapsed_s']}s", file=sys.stderr)
+
+    t0 = time.perf_counter()
+    try:
+        await asyncio.gather(producer(), *(worker() for _ in range(concurrency)))
+    finally:
+        writer.close()
+    summary["elapsed_s"] = round(time.perf_counter() - t0, 3)
+    return summary
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Run many numerical tasks through the graph.")
+    ap.add_argument("input", help="tasks JSONL file, or - for stdin")
+    ap.add_argument("-o", "--output", required=True, help="results JSONL (appended; completed ids are skipped)")
+    ap.add_argument("-c", "--concurrency", type=int, default=4)
+    ap.add_argument("--timeout", type=float, default=None, help="per-task timeout in seconds")
+    ap.add_argument("--gemini-rps", type=float, default=None, help="override GEMINI_RPS")
+    ap.add_argument("--sandbox-rps", type=float, default=None, help="override SANDBOX_CREATE_RPS")
+    ap.add_argument("--metrics", default=None, help="write aggregated Prometheus-text metrics to this file")
+    args = ap.parse_args(argv)
+    from settings import get_gemini_rate_limiter, get_sandbox_rate_limiter
+    if args.gemini_rps:
+        get_gemini_rate_limiter().requests_per_second = args.gemini_rps
+    if args.sandbox_rps:
+        get_sandbox_rate_limiter().requests_per_second = args.sandbox_rps
+    summary = asyncio.run(run_batch(args.input, args.output, args.concurrency, args.timeout))
+    if args.metrics:
+        EXPORTER.write(args.metrics)
+    print(json.dumps(summary))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+# benchmark/bench.py
+"""
+Offline end-to-end benchmark: runs the compiled graph over benchmark/corpus.jsonl with the scripted
+mock LLM (LLM_BACKEND=mock) and the local subprocess sandbox (SANDBOX_BACKEND=local).
+
+    python -m benchmark.bench run -o bench_base.json --latency 0.05 --repeat 3
+    python -m benchmark.bench run -o bench_new.json --only integration,ode_ivp
+    python -m benchmark.bench compare bench_base.json bench_new.json --threshold 0.10
+
+`run` reports p50/p95 latency, LLM / sandbox call counts, tokens and answer accuracy (overall and per
+category, per task in the JSON). `compare` prints the deltas and exits 1 when latency or call counts
+grew by more than `threshold` (relative) or accuracy dropped.
+"""
+import argparse, asyncio, json, os, re, subprocess, sys, time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+_NUMBER = re.compile(r"[-+]?(?:\d+\.\d*|\.\d+|\d+)(?:[eE][-+]?\d+)?")
+
+def _offline_env(latency: float, corpus: str, cache: bool) -> None:
+    # phải đặt trước khi import settings/main
+    os.environ["LLM_BACKEND"] = "mock"
+    os.environ["MOCK_LLM_LATENCY"] = str(latency)
+    os.environ["MOCK_LLM_CORPUS"] = os.path.abspath(corpus)
+    os.environ.setdefault("SANDBOX_BACKEND", "local")
+    os.environ.setdefault("SEARCH_TOOLS", "")
+    if not cache:
+        os.environ["LLM_CACHE"] = "0"
+
+def check_answer(text: str, reference, rel_tol: float):
+    """Compare the last number(s) in the final answer with the reference (scalar or vector)."""
+    nums = [float(n) for n in _NUMBER.findall(text or "")]
+    ref = reference if isinstance(reference, list) else [reference]
+    if len(nums) < len(ref):
+        return False, nums
+    got = nums[-len(ref):]
+    ok = all(abs(g - r) <= rel_tol * max(1.0, abs(r)) for g, r in zip(got, ref))
+    return ok, got if isinstance(reference, list) else got[0]
+
+def _pct(values: List[float], q: float) -> Optional[float]:
+    return round(float(np.percentile(values, q)), 4) if values else None
+
+def summarize(records: List[dict]) -> Dict[str, object]:
+    lat = [r["elapsed_s"] for r in records if r["status"] == "ok"]
+    n = len(records) or 1
+    c = lambda key: sum(r["counters"].get(key, 0) for r in records) / n
+    nodes = defaultdict(list)
+    for r in records:
+        for k, v in r["nodes"].items():
+            nodes[k].append(v)
+    return {
+        "runs": len(records), "ok": len(lat), "errors": len(records) - len(lat),
+        "accuracy": round(sum(r["correct"] for r in records) / n, 4),
+        "p50_s": _pct(lat, 50), "p95_s": _pct(lat, 95), "mean_s": round(sum(lat) / len(lat), 4) if lat else None,
+        "llm_calls": round(c("llm_calls"), 2), "llm_cache_hits": round(c("llm_cache_calls"), 2),
+        "sandbox_calls": round(c("sandbox_run_calls") + c("sandbox_create_calls"), 2),
+        "sandbox_runs": round(c("sandbox_run_calls"), 2), "sandbox_creates": round(c("sandbox_create_calls"), 2),
+        "prompt_tokens": round(c("prompt_tokens"), 1), "completion_tokens": round(c("completion_tokens"), 1),
+        "context_tokens_saved": round(c("context_tokens_saved"), 1), "round_trips_saved": round(c("round_trips_saved"), 2),
+        "kb_pruned": round(c("kb_pruned"), 2), "classify_rules": round(c("classify_rules"), 2),
+        "node_p50_s": {k: _pct(v, 50) for k, v in sorted(nodes.items())},
+    }
+
+async def _run_one(graph, entry: dict, repeat: int, timeout: Optional[float]) -> dict:
+    from instrumentation import start_run, end_run
+    report = start_run(entry["task"])
+    rec = {"id": entry["id"], "category": entry["category"], "repeat": repeat, "reference": entry["reference"]}
+    t0 = time.perf_counter()
+    try:
+        state = await asyncio.wait_for(graph.ainvoke({"task": entry["task"]}), timeout)
+        final = state.get("final_response")
+        rec["status"] = "ok"
+        rec["final_response"] = getattr(final, "content", final)
+        rec["method"] = (state.get("best_algorithm") or {}).get("method")
+    except asyncio.TimeoutError:
+        rec.update(status="timeout", final_response=None)
+    except Exception as e:
+        rec.update(status="error", final_response=None, error=f"{type(e).__name__}: {e}")
+    rec["elapsed_s"] = round(time.perf_counter() - t0, 4)
+    rec["correct"], rec["answer"] = check_answer(rec["final_response"], entry["reference"], entry.get("rel_tol", 1e-6))
+    summary = end_run(report).summary()
+    rec["nodes"], rec["counters"] = summary["nodes"], summary["counters"]
+    return rec
+
+async def run_benchmark(entries: List[dict], repeat: int = 1, concurrency: int = 1,
+                        timeout: Optional[float] = 120, warmup: int = 1) -> List[dict]:
+    from main import graph
+    for entry in entries[:warmup]:  # khởi động pool sandbox / import, không tính
+        await _run_one(graph, entry, -1, timeout)
+    sem = asyncio.Semaphore(concurrency)
+    async def one(entry, k):
+        async with sem:
+            rec = await _run_one(graph, entry, k, timeout)
+            print(f"[bench] {rec['id']} #{k} {rec['status']} {rec['elapsed_s']}s correct={rec['correct']}", file=sys.stderr)
+            return rec
+    return await asyncio.gather(*(one(e, k) for k in range(repeat) for e in entries))
+
+def _git_rev() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return None
+
+def cmd_run(args) -> int:
+    _offline_env(args.latency, args.corpus, args.cache)
+    from benchmark.mock_llm import load_corpus
+    entries = load_corpus(args.corpus)
+    if args.only:
+        wanted = set(args.only.split(","))
+        entries = [e for e in entries if e["category"] in wanted or e["id"] in wanted]
+    records = asyncio.run(run_benchmark(entries, args.repeat, args.concurrency, args.timeout, args.warmup))
+    by_cat = defaultdict(list)
+    for r in records:
+        by_cat[r["category"]].append(r)
+    result = {
+        "meta": {"git": _git_rev(), "created_at": time.time(), "latency": args.latency, "repeat": args.repeat,
+                 "concurrency": args.concurrency, "tasks": len(entries),
+                 "sandbox_backend": os.environ.get("SANDBOX_BACKEND"), "validation_mode": os.environ.get("VALIDATION_MODE"),
+                 "execution_mode": os.environ.get("EXECUTION_MODE", "full")},
+        "summary": summarize(records),
+        "by_category": {k: summarize(v) for k, v in sorted(by_cat.items())},
+        "tasks": records,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2, default=str)
+    print(json.dumps({"summary": result["summary"], "by_category": {k: {m: v[m] for m in ("accuracy", "p50_s", "p95_s")}
+                                                                   for k, v in result["by_category"].items()}}, indent=2))
+    return 0
+
+# metric -> direction (+1: higher is worse, -1: lower is worse)
+COMPARED = {"p50_s": 1, "p95_s": 1, "llm_calls": 1, "sandbox_calls": 1, "prompt_tokens": 1, "accuracy": -1}
+
+def compare(base: dict, new: dict, threshold: float = 0.10) -> List[dict]:
+    """Rows for overall + per-category metrics; 'regression' marks latency/calls/tokens growth > threshold or any accuracy drop."""
+    rows = []
+    scopes = [("all", base["summary"], new["summary"])] + \
+             [(k, base["by_category"][k], new["by_category"][k]) for k in new["by_category"] if k in base["by_category"]]
+    for scope, b, n in scopes:
+        for metric, sign in COMPARED.items():
+            bv, nv = b.get(metric), n.get(metric)
+            if bv is None or nv is None:
+                continue
+            rel = (nv - bv) / bv if bv else (0.0 if nv == bv else float("inf"))
+            bad = nv < bv if sign < 0 else rel > threshold
+            rows.append({"scope": scope, "metric": metric, "base": bv, "new": nv, "rel": round(rel, 4), "regression": bad})
+    return rows
+
+def cmd_compare(args) -> int:
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+    if base["meta"].get("tasks") != new["meta"].get("tasks"):
+        print(f"warning: different task sets ({base['meta'].get('tasks')} vs {new['meta'].get('tasks')} tasks)", file=sys.stderr)
+    rows = compare(base, new, args.threshold)
+    for r in rows:
+        flag = "REGRESSION" if r["regression"] else ""
+        print(f"{r['scope']:<16}{r['metric']:<16}{r['base']:>12}{r['new']:>12}{r['rel']:>+10.1%}  {flag}")
+    bad = [r for r in rows if r["regression"]]
+    print(f"\n{len(bad)} regression(s) (threshold {args.threshold:.0%})")
+    return 1 if bad else 0
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Offline end-to-end benchmark (mock LLM + local sandbox).")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("run", help="run the corpus through the graph")
+    r.add_argument("-o", "--output", default=None, help="write results JSON here")
+    r.add_argument("--corpus", default=os.path.join(os.path.dirname(__file__), "corpus.jsonl"))
+    r.add_argument("--latency", type=float, default=0.05, help="simulated seconds per LLM call")
+    r.add_argument("--repeat", type=int, default=1)
+    r.add_argument("-c", "--concurrency", type=int, default=1)
+    r.add_argument("--timeout", type=float, default=120, help="per-task timeout in seconds")
+    r.add_argument("--warmup", type=int, default=1, help="untimed warm-up tasks")
+    r.add_argument("--only", default=None, help="comma-separated categories or task ids")
+    r.add_argument("--cache", action="store_true", help="keep the LLM response cache enabled")
+    r.set_defaults(func=cmd_run)
+    c = sub.add_parser("compare", help="compare two result files")
+    c.add_argument("base")
+    c.add_argument("new")
+    c.add_argument("--threshold", type=float, default=0.10, help="relative growth counted as a regression")
+    c.set_defaults(func=cmd_compare)
+    args = ap.parse_args(argv)
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
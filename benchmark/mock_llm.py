@@ -0,0 +1,139 @@
+# benchmark/mock_llm.py
+"""
+Scripted chat model for offline benchmarks: replays the responses recorded in the benchmark corpus
+instead of calling Gemini, with a configurable (simulated) latency.
+
+Each prompt is matched to a corpus entry by its task text and to a pipeline stage by the stage's
+prompt wording (classifier, researcher, planner, validator, execution agent, final answer):
+  - classify / research / plan / validate: the recorded JSON / code
+  - execution agent: a tool call running the recorded code of the current plan step (or of all fused
+    steps, with "### STEP k" markers), then a reply quoting the tool output
+  - final: the output of the last step (so accuracy measures what actually ran in the sandbox)
+Enable with LLM_BACKEND=mock; MOCK_LLM_CORPUS and MOCK_LLM_LATENCY configure it.
+"""
+import asyncio, json, os, random, re, time, uuid
+from typing import Any, Dict, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import PrivateAttr
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), "corpus.jsonl")
+
+# prompt wording of each stage (problem_classifier, algorithm_researcher, planner, validator, tools, main)
+_STAGES = [
+    ("classify", "Trả về MỘT KHỐI JSON"),
+    ("research", "nhà nghiên cứu thuật toán số"),
+    ("plan", '"steps"'),
+    ("validate", "Viết script Python để áp dụng phương pháp"),
+    ("methods", "Đề xuất 2-3 thuật toán phù hợp"),
+    ("install", "No module named"),
+    ("agent", "STEP TO EXECUTE:"),
+    ("agent", "STEPS TO EXECUTE:"),
+    ("final", "FINAL ANSWER:"),
+]
+
+def load_corpus(path: str = DEFAULT_CORPUS) -> List[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def _text(messages: List[BaseMessage]) -> str:
+    return "\n".join(m.content if isinstance(m.content, str) else json.dumps(m.content) for m in messages)
+
+def _approx_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+class ScriptedChatModel(BaseChatModel):
+    corpus: List[dict] = []
+    latency: float = 0.0  # seconds per call
+    jitter: float = 0.0   # +- uniform fraction of latency
+    model: str = "scripted"
+    temperature: float = 0.0
+    _stats: Dict[str, int] = PrivateAttr(default_factory=dict)
+
+    @classmethod
+    def from_env(cls, **kwargs) -> "ScriptedChatModel":
+        return cls(corpus=load_corpus(os.getenv("MOCK_LLM_CORPUS", DEFAULT_CORPUS)),
+                   latency=float(os.getenv("MOCK_LLM_LATENCY", "0.05")),
+                   jitter=float(os.getenv("MOCK_LLM_JITTER", "0.2")), **kwargs)
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs):
+        return self  # tool calls come from the script, not from the schema
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return dict(self._stats)
+
+    def _delay(self) -> float:
+        return max(0.0, self.latency * (1 + random.uniform(-self.jitter, self.jitter)))
+
+    def _entry(self, text: str) -> Optional[dict]:
+        hits = [e for e in self.corpus if e["task"] in text]
+        return max(hits, key=lambda e: len(e["task"])) if hits else None
+
+    def respond(self, messages: List[BaseMessage]) -> AIMessage:
+        text = _text(messages)
+        stage = next((name for name, marker in _STAGES if marker in text), None)
+        entry = self._entry(text)
+        self._stats[stage or "unmatched"] = self._stats.get(stage or "unmatched", 0) + 1
+        rec = (entry or {}).get("responses", {})
+        if stage == "classify":
+            return AIMessage(content=json.dumps(rec.get("classify", {}), ensure_ascii=False))
+        if stage == "research":
+            return AIMessage(content=json.dumps(rec.get("research", {}), ensure_ascii=False))
+        if stage == "plan":
+            return AIMessage(content=json.dumps({"steps": rec.get("plan", [])}, ensure_ascii=False))
+        if stage == "validate":
+            m = re.search(r"phương pháp '([^']*)'", text)
+            return AIMessage(content=rec.get("validate", "").replace("{method}", m.group(1) if m else ""))
+        if stage == "methods":
+            return AIMessage(content=", ".join(rec.get("research", {}).get("candidate_methods", [])))
+        if stage == "install":
+            m = re.search(r"No module named '([^']+)'", text)
+            return AIMessage(content=f"pip install {m.group(1) if m else ''}".strip())
+        if stage == "agent":
+            return self._agent_turn(messages, text, rec)
+        if stage == "final":
+            results = re.findall(r"^Result: (.*?)(?=\n# \d+\. |\n+FINAL ANSWER:|\Z)", text, re.M | re.S)
+            last = results[-1].strip().splitlines() if results else []
+            return AIMessage(content=f"Đáp số: {last[-1] if last else ''}")
+        return AIMessage(content="")
+
+    def _agent_turn(self, messages: List[BaseMessage], text: str, rec: dict) -> AIMessage:
+        if isinstance(messages[-1], ToolMessage):
+            out = messages[-1].content.strip()
+            return AIMessage(content=f"Kết quả:\n{out}" if out else "(no output)")
+        plan, codes = rec.get("plan", []), rec.get("run", [])
+        code_of = lambda step: next((codes[i] for i, s in enumerate(plan) if s.strip() == step.strip() and i < len(codes)), None)
+        if "STEPS TO EXECUTE:" in text:  # main.fused_template: one script, "### STEP k" before each step
+            block = text.split("STEPS TO EXECUTE:", 1)[1].strip().split("\n\n")[0]
+            steps = re.findall(r"^(\d+)\. (.*)$", block, re.M)
+            code = "\n".join(f"print({'### STEP ' + k!r})\n{code_of(s) or ''}" for k, s in steps)
+        else:
+            step = text.split("STEP TO EXECUTE:", 1)[1].strip()
+            code = code_of(step)
+            if not code:
+                return AIMessage(content=f"Đã thực hiện: {step}")
+        return AIMessage(content="", tool_calls=[{"name": "e2b_sandbox", "args": {"code": code},
+                                                   "id": f"call_{uuid.uuid4().hex[:8]}"}])
+
+    def _result(self, messages: List[BaseMessage]) -> ChatResult:
+        msg = self.respond(messages)
+        prompt_tokens = _approx_tokens(_text(messages))
+        completion_tokens = _approx_tokens(msg.content or json.dumps(msg.tool_calls))
+        msg.usage_metadata = {"input_tokens": prompt_tokens, "output_tokens": completion_tokens,
+                              "total_tokens": prompt_tokens + completion_tokens}
+        return ChatResult(generations=[ChatGeneration(message=msg)])
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        time.sleep(self._delay())
+        return self._result(messages)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self._delay())
+        return self._result(messages)
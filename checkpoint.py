@@ -0,0 +1,216 @@
+# checkpoint.py
+"""
+Durable checkpoints for the graph (SQLite via langgraph-checkpoint-sqlite).
+
+PlanState is saved after every node under thread id "<task hash>:<run id>". A `runs` table in the same
+database keeps each thread's task, status and last completed node, so a run that died at step 5
+(sandbox timeout, Gemini 429, crash) resumes from its last checkpoint instead of redoing
+classify/research/validate/plan. gc() drops old threads by age and/or total size.
+
+    python checkpoint.py list
+    python checkpoint.py resume [THREAD_ID]        # default: latest unfinished run
+    python checkpoint.py gc --max-age-days 7 --max-mb 200
+"""
+import argparse, asyncio, hashlib, json, os, sqlite3, sys, time, uuid
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+_RUNS_SQL = ("CREATE TABLE IF NOT EXISTS runs (thread_id TEXT PRIMARY KEY, task_hash TEXT NOT NULL, task TEXT NOT NULL, "
+             "status TEXT NOT NULL, last_node TEXT, error TEXT, created REAL NOT NULL, updated REAL NOT NULL)")
+_RUN_COLS = ("thread_id", "task_hash", "task", "status", "last_node", "error", "created", "updated")
+
+def task_hash(task: str) -> str:
+    return hashlib.sha1(task.strip().encode("utf-8")).hexdigest()[:16]
+
+def new_thread_id(task: str) -> str:
+    return f"{task_hash(task)}:{uuid.uuid4().hex[:8]}"
+
+def thread_config(thread_id: str) -> dict:
+    return {"configurable": {"thread_id": thread_id}}
+
+def _serde():
+    from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+    try:
+        return JsonPlusSerializer(allowed_msgpack_modules=[("planner", "Plan")])
+    except TypeError:  # langgraph-checkpoint cũ chưa có allow-list
+        return JsonPlusSerializer()
+
+class RunLedger:
+    """`runs` table on the checkpointer's aiosqlite connection."""
+    def __init__(self, conn):
+        self.conn = conn
+
+    async def setup(self) -> None:
+        await self.conn.execute(_RUNS_SQL)
+        await self.conn.commit()
+
+    async def start(self, thread_id: str, task: str) -> None:
+        now = time.time()
+        await self.conn.execute("INSERT INTO runs VALUES (?,?,?,?,?,?,?,?) ON CONFLICT(thread_id) DO UPDATE "
+                                "SET status='running', error=NULL, updated=excluded.updated",
+                                (thread_id, task_hash(task), task, "running", None, None, now, now))
+        await self.conn.commit()
+
+    async def node_done(self, thread_id: str, node: str) -> None:
+        await self.conn.execute("UPDATE runs SET last_node=?, updated=? WHERE thread_id=?", (node, time.time(), thread_id))
+        await self.conn.commit()
+
+    async def finish(self, thread_id: str, status: str, error: Optional[str] = None) -> None:
+        await self.conn.execute("UPDATE runs SET status=?, error=?, updated=? WHERE thread_id=?",
+                                (status, error, time.time(), thread_id))
+        await self.conn.commit()
+
+    async def get(self, thread_id: str) -> Optional[Dict[str, Any]]:
+        async with self.conn.execute(f"SELECT {','.join(_RUN_COLS)} FROM runs WHERE thread_id=?", (thread_id,)) as cur:
+            row = await cur.fetchone()
+        return dict(zip(_RUN_COLS, row)) if row else None
+
+    async def latest_unfinished(self, task: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Most recently updated run that did not finish (optionally for one task)."""
+        sql = f"SELECT {','.join(_RUN_COLS)} FROM runs WHERE status != 'done'"
+        args: tuple = ()
+        if task is not None:
+            sql += " AND task_hash=?"
+            args = (task_hash(task),)
+        async with self.conn.execute(sql + " ORDER BY updated DESC LIMIT 1", args) as cur:
+            row = await cur.fetchone()
+        return dict(zip(_RUN_COLS, row)) if row else None
+
+@asynccontextmanager
+async def open_checkpointer(path: Optional[str] = None):
+    """Yield (AsyncSqliteSaver, RunLedger) on one connection; runs gc() with the settings limits first."""
+    import aiosqlite
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+    from settings import CHECKPOINT_DB, CHECKPOINT_MAX_AGE_DAYS, CHECKPOINT_MAX_MB
+    path = path or CHECKPOINT_DB
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    if CHECKPOINT_MAX_AGE_DAYS or CHECKPOINT_MAX_MB:
+        await asyncio.to_thread(gc, path, CHECKPOINT_MAX_AGE_DAYS, CHECKPOINT_MAX_MB)
+    async with aiosqlite.connect(path) as conn:
+        saver = AsyncSqliteSaver(conn, serde=_serde())
+        await saver.setup()
+        ledger = RunLedger(conn)
+        await ledger.setup()
+        yield saver, ledger
+
+async def invoke_checkpointed(graph, task: str, ledger: Optional[RunLedger] = None, thread_id: Optional[str] = None,
+                              resume: bool = False, on_update: Optional[Callable[[str, dict], None]] = None,
+                              on_abort: Optional[Callable[[dict], Awaitable[None]]] = None) -> Tuple[Optional[str], dict]:
+    """
+    Run `task` (or resume it) and return (thread_id, final state).
+    resume=True continues `thread_id`, or the task's latest unfinished run, from its last checkpoint;
+    a new thread is started when there is nothing to resume. Without a checkpointer this is a plain run.
+    on_abort(last state) runs when the run fails or is cancelled and cannot be resumed (no checkpointer),
+    e.g. to release its sandbox session.
+    """
+    inputs: Optional[dict] = {"task": task}
+    config = None
+    if graph.checkpointer is not None:
+        if thread_id is None and resume and ledger is not None:
+            row = await ledger.latest_unfinished(task)
+            thread_id = row["thread_id"] if row else None
+        if thread_id is not None and resume:
+            snap = await graph.aget_state(thread_config(thread_id))
+            if snap.values and snap.next:
+                inputs = None  # tiếp tục từ node kế tiếp
+            elif snap.values:
+                return thread_id, snap.values  # đã chạy xong
+        thread_id = thread_id or new_thread_id(task)
+        config = thread_config(thread_id)
+        if ledger is not None:
+            await ledger.start(thread_id, task)
+    state: dict = {}
+    try:
+        async for mode, chunk in graph.astream(inputs, config, stream_mode=["updates", "values"]):
+            if mode == "values":
+                state = chunk
+                continue
+            for node, out in chunk.items():
+                if ledger is not None and config is not None:
+                    await ledger.node_done(thread_id, node)
+                if on_update:
+                    on_update(node, out or {})
+    except BaseException as e:
+        if ledger is not None and config is not None:
+            status = "error" if isinstance(e, Exception) else "interrupted"
+            await asyncio.shield(ledger.finish(thread_id, status, f"{type(e).__name__}: {e}"))
+        # run resume được giữ lại session (tools hết hạn nó sau SESSION_IDLE_TTL nếu không ai resume)
+        if on_abort is not None and config is None:
+            await asyncio.shield(on_abort(state))
+        raise
+    if ledger is not None and config is not None:
+        await ledger.finish(thread_id, "done")
+    return thread_id, state
+
+def gc(path: str, max_age_days: Optional[float] = None, max_mb: Optional[float] = None) -> Dict[str, int]:
+    """Delete threads last updated more than `max_age_days` ago, then oldest threads until the data fits `max_mb`."""
+    if not os.path.exists(path):
+        return {"threads_removed": 0}
+    db = sqlite3.connect(path, timeout=30)
+    try:
+        db.execute(_RUNS_SQL)
+        tables = {r[0] for r in db.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+        if "checkpoints" not in tables:
+            return {"threads_removed": 0}
+        # thread -> (last update, bytes); runs.updated nếu có, không thì coi như mới
+        sizes = dict(db.execute("SELECT thread_id, SUM(LENGTH(checkpoint) + LENGTH(metadata)) FROM checkpoints GROUP BY thread_id"))
+        for tid, n in db.execute("SELECT thread_id, SUM(LENGTH(value)) FROM writes GROUP BY thread_id"):
+            sizes[tid] = sizes.get(tid, 0) + (n or 0)
+        updated = dict(db.execute("SELECT thread_id, updated FROM runs"))
+        now = time.time()
+        threads = sorted(sizes, key=lambda t: updated.get(t, now))
+        drop = [t for t in threads if max_age_days and now - updated.get(t, now) > max_age_days * 86400]
+        if max_mb:
+            total = sum(sizes[t] for t in threads if t not in drop)
+            for t in threads:
+                if total <= max_mb * 1024 * 1024:
+                    break
+                if t not in drop:
+                    drop.append(t)
+                    total -= sizes[t]
+        for t in drop:
+            for table in ("checkpoints", "writes", "runs"):
+                db.execute(f"DELETE FROM {table} WHERE thread_id=?", (t,))
+        db.commit()
+        if drop:
+            db.execute("VACUUM")
+        return {"threads_removed": len(drop)}
+    finally:
+        db.close()
+
+def list_runs(path: str, limit: int = 20) -> List[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return []
+    db = sqlite3.connect(path, timeout=30)
+    try:
+        db.execute(_RUNS_SQL)
+        rows = db.execute(f"SELECT {','.join(_RUN_COLS)} FROM runs ORDER BY updated DESC LIMIT ?", (limit,)).fetchall()
+        return [dict(zip(_RUN_COLS, r)) for r in rows]
+    finally:
+        db.close()
+
+def main(argv=None):
+    from settings import CHECKPOINT_DB
+    ap = argparse.ArgumentParser(description="Inspect, resume and garbage-collect graph checkpoints.")
+    ap.add_argument("--db", default=CHECKPOINT_DB)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    ls = sub.add_parser("list")
+    ls.add_argument("-n", type=int, default=20)
+    rs = sub.add_parser("resume")
+    rs.add_argument("thread_id", nargs="?", default=None)
+    g = sub.add_parser("gc")
+    g.add_argument("--max-age-days", type=float, default=None)
+    g.add_argument("--max-mb", type=float, default=None)
+    args = ap.parse_args(argv)
+    if args.cmd == "list":
+        for r in list_runs(args.db, args.n):
+            print(f"{r['thread_id']:<26} {r['status']:<12} {r['last_node'] or '-':<9} "
+                  f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(r['updated']))}  {r['task'][:60]}")
+    elif args.cmd == "resume":
+        from main import resume_task  # import muộn: main dựng tools/agent khi import
+        asyncio.run(resume_task(args.thread_id, db=args.db))
+    else:
+        print(json.dumps(gc(args.db, args.max_age_days, args.max_mb)))
+
+if __name__ == "__main__":
+    main()
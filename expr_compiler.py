@@ -0,0 +1,205 @@
+# expr_compiler.py
+"""
+Compile a short_form such as 'x**3 - x - 1' once into NumPy-vectorized callables.
+
+The text is parsed into a Python AST and rejected unless it only contains numbers, the allowed
+variables, arithmetic operators and whitelisted math functions (np./math. prefixes allowed).
+Powers with a constant exponent above MAX_EXPONENT, or constant powers that overflow a float, are
+rejected too ('9**9**9' would otherwise hang the process in big-integer arithmetic).
+Derivatives come from sympy when available, otherwise from central differences.
+Compiled results are memoized by normalized expression in a bounded LRU.
+"""
+import ast, math, re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Optional, Tuple
+import numpy as np
+
+class UnsafeExpression(ValueError):
+    """short_form contains something other than arithmetic / math functions."""
+
+# tên hàm cho phép -> tên tương ứng trong numpy
+FUNCTIONS = {
+    "sin": "sin", "cos": "cos", "tan": "tan", "asin": "arcsin", "acos": "arccos", "atan": "arctan",
+    "arcsin": "arcsin", "arccos": "arccos", "arctan": "arctan", "sinh": "sinh", "cosh": "cosh", "tanh": "tanh",
+    "exp": "exp", "log": "log", "ln": "log", "log10": "log10", "log2": "log2", "sqrt": "sqrt", "abs": "abs",
+    "fabs": "abs", "cbrt": "cbrt",
+}
+CONSTANTS = {"pi": np.pi, "e": np.e}
+_MODULES = {"np", "numpy", "math", "sp", "sympy"}
+_BINOPS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow)
+_UNARYOPS = (ast.UAdd, ast.USub)
+MAX_EXPONENT = 100  # |số mũ hằng| tối đa
+
+@dataclass(frozen=True)
+class CompiledExpr:
+    expr: str                    # normalized source
+    variables: Tuple[str, ...]
+    f: Callable                  # f(*variables), vectorized
+    df: Callable                 # d f / d variables[0]
+    d2f: Callable                # d2 f / d variables[0]^2
+    symbolic: bool               # True if df/d2f are exact (sympy)
+
+def normalize(expr: str, variables: Tuple[str, ...] = ("x",)) -> str:
+    """'f(x) = x^3 - x - 1 = 0' -> 'x**3 - x - 1'; 'lhs = rhs' -> '(lhs) - (rhs)'."""
+    s = (expr or "").strip().replace("^", "**").replace("−", "-").replace("×", "*")
+    s = re.sub(r"^\s*[A-Za-z]\w*\s*\(\s*[\w\s,]*\)\s*=", "", s)  # bỏ 'f(x) ='
+    parts = [p.strip() for p in s.split("=") if p.strip()]
+    if len(parts) >= 2 and not re.fullmatch(r"0+(\.0*)?", parts[-1]):
+        s = f"({parts[0]}) - ({parts[-1]})"
+    elif parts:
+        s = parts[0]
+    for v in variables:
+        s = re.sub(rf"(?<![\w.])(\d+(?:\.\d*)?)\s*({re.escape(v)})\b", r"\1*\2", s)  # 3x -> 3*x
+    return re.sub(r"\s+", " ", s).strip()
+
+def _const_value(node: ast.AST, variables: Tuple[str, ...]) -> Optional[float]:
+    """Float value of a constant arithmetic subtree (never big integers); None if it has variables or calls."""
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        return float(node.value)
+    if isinstance(node, ast.Name) and node.id in CONSTANTS and node.id not in variables:
+        return float(CONSTANTS[node.id])
+    if isinstance(node, ast.Attribute) and node.attr in CONSTANTS:
+        return float(CONSTANTS[node.attr])
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, _UNARYOPS):
+        v = _const_value(node.operand, variables)
+        return None if v is None else -v if isinstance(node.op, ast.USub) else v
+    if isinstance(node, ast.BinOp) and isinstance(node.op, _BINOPS):
+        a, b = _const_value(node.left, variables), _const_value(node.right, variables)
+        if a is None or b is None:
+            return None
+        try:
+            if isinstance(node.op, ast.Pow):
+                return abs(a) ** b  # chỉ cần độ lớn
+            if isinstance(node.op, ast.Div):
+                return a / b
+            return a + b if isinstance(node.op, ast.Add) else a - b if isinstance(node.op, ast.Sub) else a * b
+        except OverflowError:
+            return math.inf
+        except ZeroDivisionError:
+            return math.nan
+    return None
+
+def _check(node: ast.AST, variables: Tuple[str, ...]) -> None:
+    if isinstance(node, ast.Expression):
+        return _check(node.body, variables)
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        return
+    if isinstance(node, ast.Name) and (node.id in variables or node.id in CONSTANTS):
+        return
+    if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) and node.value.id in _MODULES \
+            and node.attr in CONSTANTS:
+        return
+    if isinstance(node, ast.BinOp) and isinstance(node.op, _BINOPS):
+        _check(node.left, variables); _check(node.right, variables)
+        if isinstance(node.op, ast.Pow):
+            e = _const_value(node.right, variables)
+            if e is not None and not abs(e) <= MAX_EXPONENT:
+                raise UnsafeExpression(f"exponent too large in expression (|exponent| > {MAX_EXPONENT})")
+            v = _const_value(node, variables)
+            if v is not None and math.isinf(v):
+                raise UnsafeExpression("constant power overflows a float")
+        return
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, _UNARYOPS):
+        return _check(node.operand, variables)
+    if isinstance(node, ast.Call) and not node.keywords and len(node.args) == 1:
+        fn = node.func
+        name = fn.id if isinstance(fn, ast.Name) else fn.attr if (
+            isinstance(fn, ast.Attribute) and isinstance(fn.value, ast.Name) and fn.value.id in _MODULES) else None
+        if name in FUNCTIONS:
+            return _check(node.args[0], variables)
+    raise UnsafeExpression(f"unsupported element in expression: {ast.dump(node)[:80]}")
+
+class _Canonical(ast.NodeTransformer):
+    """np.sin(x) / math.sin(x) -> sin(x); np.pi -> pi."""
+    def visit_Attribute(self, node):
+        return ast.copy_location(ast.Name(id=node.attr, ctx=ast.Load()), node)
+
+def _numpy_namespace() -> dict:
+    ns = {k: getattr(np, v) for k, v in FUNCTIONS.items()}
+    ns.update(CONSTANTS)
+    ns["__builtins__"] = {}
+    return ns
+
+def _broadcast(fn: Callable) -> Callable:
+    # hằng số (vd đạo hàm của x) phải trả về mảng cùng shape với input
+    def wrapped(*args):
+        return fn(*args) + 0 * args[0]
+    return wrapped
+
+def _numeric_derivatives(f: Callable) -> Tuple[Callable, Callable]:
+    def df(x, *rest):
+        h = 1e-6 * np.maximum(1.0, np.abs(x))
+        return (f(x + h, *rest) - f(x - h, *rest)) / (2 * h)
+    def d2f(x, *rest):
+        h = 1e-4 * np.maximum(1.0, np.abs(x))
+        return (f(x + h, *rest) - 2 * f(x, *rest) + f(x - h, *rest)) / (h * h)
+    return df, d2f
+
+@lru_cache(maxsize=256)
+def _compile(expr: str, variables: Tuple[str, ...]) -> CompiledExpr:
+    try:
+        tree = ast.parse(expr, mode="eval")
+    except SyntaxError as e:
+        raise UnsafeExpression(f"cannot parse expression {expr!r}: {e}") from e
+    _check(tree, variables)
+    canon = ast.unparse(_Canonical().visit(tree))
+    code = compile(f"lambda {', '.join(variables)}: {canon}", "<short_form>", "eval")
+    f = _broadcast(eval(code, _numpy_namespace()))
+    try:
+        import sympy
+        syms = sympy.symbols(variables)
+        local = {v: s for v, s in zip(variables, syms)}
+        local.update({"ln": sympy.log, "fabs": sympy.Abs, "abs": sympy.Abs, "arcsin": sympy.asin,
+                      "arccos": sympy.acos, "arctan": sympy.atan, "cbrt": sympy.cbrt, "e": sympy.E, "pi": sympy.pi,
+                      "log10": lambda a: sympy.log(a, 10), "log2": lambda a: sympy.log(a, 2)})
+        sexpr = sympy.sympify(canon, locals=local)
+        d1 = sympy.diff(sexpr, syms[0])
+        df = _broadcast(sympy.lambdify(syms, d1, modules="numpy"))
+        d2f = _broadcast(sympy.lambdify(syms, sympy.diff(d1, syms[0]), modules="numpy"))
+        symbolic = True
+    except Exception:
+        df, d2f = _numeric_derivatives(f)
+        symbolic = False
+    return CompiledExpr(expr=expr, variables=variables, f=f, df=df, d2f=d2f, symbolic=symbolic)
+
+def compile_expr(expr: str, variables: Tuple[str, ...] = ("x",)) -> CompiledExpr:
+    """Normalize, validate and compile `expr`; repeated calls with the same expression hit the LRU."""
+    variables = tuple(variables)
+    return _compile(normalize(expr, variables), variables)
+
+def try_compile(expr: Optional[str], variables: Tuple[str, ...] = ("x",)) -> Optional[CompiledExpr]:
+    """compile_expr, or None for empty/unsafe/unparseable expressions."""
+    if not expr:
+        return None
+    try:
+        return compile_expr(expr, variables)
+    except UnsafeExpression:
+        return None
+
+def check_expr(expr: Optional[str], variables: Tuple[str, ...] = ("x",)) -> Optional[str]:
+    """Normalized `expr` if it parses and passes the whitelist, else None (cheap: no compile, no sympy)."""
+    if not expr:
+        return None
+    s = normalize(expr, tuple(variables))
+    try:
+        _check(ast.parse(s, mode="eval"), tuple(variables))
+    except (SyntaxError, UnsafeExpression):
+        return None
+    return s
+
+def evaluate_constant(expr: Optional[str]) -> Optional[float]:
+    """'pi/2' / '1e-3' / 'sqrt(2)' -> float; None unless `expr` is a finite constant expression."""
+    if not expr:
+        return None
+    try:
+        tree = ast.parse(normalize(expr, ()), mode="eval")
+        _check(tree, ())
+        with np.errstate(all="ignore"):
+            v = float(eval(compile(ast.unparse(_Canonical().visit(tree)), "<constant>", "eval"), _numpy_namespace()))
+    except (SyntaxError, UnsafeExpression, TypeError, ValueError, ZeroDivisionError, OverflowError):
+        return None
+    return v if np.isfinite(v) else None
+
+cache_info = _compile.cache_info
+cache_clear = _compile.cache_clear
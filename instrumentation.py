@@ -0,0 +1,191 @@
+# instrumentation.py
+"""
+Per-run instrumentation: node timings, LLM calls/tokens, cache hits and sandbox usage.
+
+A RunReport is bound to the current context (ContextVar) by start_run(); graph nodes are wrapped
+with timed_node(), model calls are recorded by LLMCallbackHandler (attached to the shared chat model),
+CachedLLM records cache hits, and the sandbox pool / tools record creations, runs and installs.
+Reports export as JSON; PrometheusExporter aggregates finished runs into Prometheus text format.
+"""
+import contextvars, functools, json, threading, time, uuid
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+@dataclass
+class RunReport:
+    task: str = ""
+    run_id: str = field(default_factory=lambda: uuid.uuid4().hex[:12])
+    started_at: float = field(default_factory=time.time)
+    elapsed_s: Optional[float] = None
+    nodes: List[Dict[str, Any]] = field(default_factory=list)
+    calls: List[Dict[str, Any]] = field(default_factory=list)
+    counters: Dict[str, float] = field(default_factory=lambda: defaultdict(float))
+    _t0: float = field(default_factory=time.perf_counter, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add_node(self, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self.nodes.append(entry)
+
+    def add_call(self, entry: Dict[str, Any], **counters: float) -> None:
+        with self._lock:
+            self.calls.append(entry)
+            for k, v in counters.items():
+                self.counters[k] += v
+
+    def count(self, name: str, n: float = 1) -> None:
+        with self._lock:
+            self.counters[name] += n
+
+    def finish(self) -> "RunReport":
+        self.elapsed_s = round(time.perf_counter() - self._t0, 4)
+        return self
+
+    def summary(self) -> Dict[str, Any]:
+        """Compact view: per-node totals + counters (no per-call list)."""
+        per_node: Dict[str, float] = defaultdict(float)
+        for n in self.nodes:
+            per_node[n["node"]] += n["elapsed_s"]
+        return {"run_id": self.run_id, "elapsed_s": self.elapsed_s,
+                "nodes": {k: round(v, 4) for k, v in per_node.items()},
+                "counters": {k: round(v, 4) for k, v in self.counters.items()}}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"run_id": self.run_id, "task": self.task, "started_at": self.started_at,
+                "elapsed_s": self.elapsed_s, "nodes": list(self.nodes), "calls": list(self.calls),
+                "counters": dict(self.counters), "summary": self.summary()}
+
+    def to_json(self, path: Optional[str] = None) -> str:
+        text = json.dumps(self.to_dict(), ensure_ascii=False, indent=2, default=str)
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+        return text
+
+_current: contextvars.ContextVar[Optional[RunReport]] = contextvars.ContextVar("na_run_report", default=None)
+
+def current() -> Optional[RunReport]:
+    return _current.get()
+
+def start_run(task: str = "") -> RunReport:
+    report = RunReport(task=task)
+    _current.set(report)
+    return report
+
+def end_run(report: RunReport, exporter: Optional["PrometheusExporter"] = None) -> RunReport:
+    report.finish()
+    (exporter or EXPORTER).observe(report)
+    return report
+
+def count(name: str, n: float = 1) -> None:
+    r = _current.get()
+    if r is not None:
+        r.count(name, n)
+
+def record_call(kind: str, site: str, elapsed_s: float, **extra) -> None:
+    """kind: llm | llm_cache | sandbox_create | sandbox_run | sandbox_install | research."""
+    r = _current.get()
+    if r is None:
+        return
+    counters = {f"{kind}_calls": 1, f"{kind}_seconds": elapsed_s}
+    for k in ("prompt_tokens", "completion_tokens"):
+        if extra.get(k):
+            counters[k] = extra[k]
+    r.add_call({"kind": kind, "site": site, "elapsed_s": round(elapsed_s, 4), **extra}, **counters)
+
+def timed_node(name: str, label: Optional[Callable[[dict], Dict[str, Any]]] = None):
+    """Decorator for async graph nodes: records wall time (and optional labels from state)."""
+    def deco(fn):
+        @functools.wraps(fn)
+        async def wrapper(state, *args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return await fn(state, *args, **kwargs)
+            finally:
+                r = _current.get()
+                if r is not None:
+                    entry = {"node": name, "elapsed_s": round(time.perf_counter() - t0, 4)}
+                    if label:
+                        entry.update(label(state))
+                    r.add_node(entry)
+        return wrapper
+    return deco
+
+class LLMCallbackHandler(BaseCallbackHandler):
+    """Records every chat-model request (latency + token usage) into the current RunReport."""
+    run_inline = True  # chạy trong context của lời gọi để thấy ContextVar
+
+    def __init__(self):
+        self._starts: Dict[Any, tuple] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        md = metadata or {}
+        site = md.get("call_site") or md.get("langgraph_node") or "llm"
+        self._starts[run_id] = (time.perf_counter(), site)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        t0, site = self._starts.pop(run_id, (None, "llm"))
+        if t0 is None:
+            return
+        usage = {}
+        try:
+            usage = response.generations[0][0].message.usage_metadata or {}
+        except (AttributeError, IndexError):
+            pass
+        record_call("llm", site, time.perf_counter() - t0,
+                    prompt_tokens=usage.get("input_tokens", 0), completion_tokens=usage.get("output_tokens", 0))
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        t0, site = self._starts.pop(run_id, (None, "llm"))
+        if t0 is not None:
+            record_call("llm", site, time.perf_counter() - t0, error=type(error).__name__)
+
+class PrometheusExporter:
+    """Aggregates finished RunReports; render() returns Prometheus text exposition format."""
+    def __init__(self, prefix: str = "na"):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._metrics: Dict[tuple, float] = defaultdict(float)  # (name, labels) -> value
+
+    def _add(self, name: str, value: float, **labels) -> None:
+        self._metrics[(name, tuple(sorted(labels.items())))] += value
+
+    def observe(self, report: RunReport) -> None:
+        with self._lock:
+            self._add("runs_total", 1)
+            self._add("run_seconds_total", report.elapsed_s or 0.0)
+            for n in report.nodes:
+                self._add("node_seconds_total", n["elapsed_s"], node=n["node"])
+                self._add("node_calls_total", 1, node=n["node"])
+            for c in report.calls:
+                self._add("calls_total", 1, kind=c["kind"], site=c["site"])
+                self._add("call_seconds_total", c["elapsed_s"], kind=c["kind"], site=c["site"])
+            self._add("llm_tokens_total", report.counters.get("prompt_tokens", 0), type="prompt")
+            self._add("llm_tokens_total", report.counters.get("completion_tokens", 0), type="completion")
+            for k in ("install_retries", "sandbox_reused", "context_tokens_saved", "round_trips_saved", "kb_pruned",
+                      "classify_rules", "classify_llm", "classify_fallback", "research_local", "research_cache_hits",
+                      "research_busy", "sessions_expired"):
+                self._add(f"{k}_total", report.counters.get(k, 0))
+
+    def render(self) -> str:
+        lines, seen = [], set()
+        with self._lock:
+            items = sorted(self._metrics.items())
+        for (name, labels), value in items:
+            full = f"{self.prefix}_{name}"
+            if full not in seen:
+                seen.add(full)
+                lines.append(f"# TYPE {full} counter")
+            lab = ",".join(f'{k}="{v}"' for k, v in labels)
+            lines.append(f"{full}{{{lab}}} {value:g}" if lab else f"{full} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.render())
+
+EXPORTER = PrometheusExporter()
+LLM_CALLBACK = LLMCallbackHandler()
@@ -0,0 +1,387 @@
+# linear_solver.py
+"""
+In-process solvers for the methods in ALGORITHM_MAP["linear_system"], on NumPy dense arrays or
+SciPy CSR matrices.
+
+Direct methods (Gaussian Elimination, LU, Cholesky) use one factorization; iterative ones (Jacobi,
+Gauss-Seidel, SOR, Conjugate Gradient, GMRES) record the relative residual ||b - Ax|| / ||b|| per
+iteration. Jacobi is a fully vectorized sweep; Gauss-Seidel / SOR sweep with one triangular solve
+(factorized once for sparse input). run_method() returns the metrics dicts Validator.pick_best uses.
+parse_linear_system() extracts A and b from task text (equations or matrix literals).
+"""
+import ast, json, re
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+import scipy.linalg as sla
+import scipy.sparse as sp
+import scipy.sparse.linalg as spla
+
+Array = np.ndarray
+
+# canonical name -> aliases (lowercase, no punctuation), incl. Vietnamese names; matched as whole words
+_ALIASES = {
+    "Gaussian Elimination": ["gaussian elimination", "gauss elimination", "gaussian", "khu gauss", "khử gauss", "gauss"],
+    "LU": ["lu", "doolittle", "crout", "phan ra lu", "phân rã lu"],
+    "Cholesky": ["cholesky", "choleski"],
+    "Jacobi": ["jacobi"],
+    "Gauss-Seidel": ["gauss seidel", "seidel"],
+    "SOR": ["sor", "successive over relaxation", "over relaxation", "giam du", "giảm dư", "relaxation"],
+    "Conjugate Gradient": ["conjugate gradient", "cg", "gradient lien hop", "gradient liên hợp"],
+    "GMRES": ["gmres"],
+}
+
+_GE_DENSE_MAX = 400  # khử Gauss bằng vòng lặp NumPy đến cỡ này, lớn hơn dùng LAPACK (getrf)
+_HISTORY_POINTS = 50
+
+def match_method(name: str) -> Optional[str]:
+    """Map a free-form method name ('Phương pháp lặp Seidel', 'LU decomposition'...) to a canonical one."""
+    key = re.sub(r"[^\w\s]", " ", (name or "").lower())
+    key = re.sub(r"\s+", " ", key).strip()
+    pairs = sorted(((a, m) for m, al in _ALIASES.items() for a in al), key=lambda p: -len(p[0]))
+    for alias, method in pairs:
+        if re.search(rf"(?<!\w){re.escape(alias)}(?!\w)", key):
+            return method
+    return None
+
+def as_matrix(A, sparse_threshold: int = 200, density: float = 0.05):
+    """Float CSR for sparse input (or large, mostly-zero dense input), float ndarray otherwise."""
+    if sp.issparse(A):
+        return sp.csr_matrix(A, dtype=float)
+    A = np.asarray(A, float)
+    if A.shape[0] >= sparse_threshold and np.count_nonzero(A) < density * A.size:
+        return sp.csr_matrix(A)
+    return A
+
+def _check_square(A, b: Array):
+    if A.ndim != 2 or A.shape[0] != A.shape[1] or A.shape[0] != b.shape[0]:
+        raise ValueError(f"shape mismatch: A {A.shape}, b {b.shape}")
+
+def _symmetric(A) -> bool:
+    if sp.issparse(A):
+        d = abs(A - A.T)
+        return d.nnz == 0 or d.max() <= 1e-12 * abs(A).max()
+    return np.allclose(A, A.T, rtol=0, atol=1e-12 * np.abs(A).max())
+
+def _diag(A) -> Array:
+    d = np.asarray(A.diagonal(), float)
+    if np.any(d == 0):
+        raise ZeroDivisionError("zero on the diagonal")
+    return d
+
+def _relres(A, b: Array, x: Array, bn: float) -> float:
+    return float(np.linalg.norm(b - A @ x) / bn)
+
+# Each method: (A, b, tol, maxiter, x0, omega) -> (x, iterations, converged, history)
+
+def gaussian_elimination(A, b, tol, maxiter, x0=None, omega=None):
+    bn = np.linalg.norm(b) or 1.0
+    if sp.issparse(A):
+        x = spla.splu(A.tocsc()).solve(b)
+        return x, 1, True, [_relres(A, b, x, bn)]
+    n = b.shape[0]
+    if n > _GE_DENSE_MAX:
+        x = sla.lu_solve(sla.lu_factor(A, check_finite=False), b, check_finite=False)
+        return x, 1, True, [_relres(A, b, x, bn)]
+    M = np.hstack([A, b[:, None]])
+    for k in range(n - 1):
+        p = k + int(np.argmax(np.abs(M[k:, k])))  # chọn trụ
+        if M[p, k] == 0:
+            raise np.linalg.LinAlgError("singular matrix")
+        if p != k:
+            M[[k, p]] = M[[p, k]]
+        M[k + 1:, k:] -= np.outer(M[k + 1:, k] / M[k, k], M[k, k:])
+    if M[n - 1, n - 1] == 0:
+        raise np.linalg.LinAlgError("singular matrix")
+    x = sla.solve_triangular(M[:, :n], M[:, n], lower=False, check_finite=False)
+    return x, 1, True, [_relres(A, b, x, bn)]
+
+def lu(A, b, tol, maxiter, x0=None, omega=None):
+    bn = np.linalg.norm(b) or 1.0
+    if sp.issparse(A):
+        x = spla.splu(A.tocsc()).solve(b)
+    else:
+        lu_piv = sla.lu_factor(A, check_finite=False)
+        if np.any(np.diag(lu_piv[0]) == 0):
+            raise np.linalg.LinAlgError("singular matrix")
+        x = sla.lu_solve(lu_piv, b, check_finite=False)
+    return x, 1, True, [_relres(A, b, x, bn)]
+
+def cholesky(A, b, tol, maxiter, x0=None, omega=None):
+    if not _symmetric(A):
+        raise np.linalg.LinAlgError("matrix is not symmetric")
+    bn = np.linalg.norm(b) or 1.0
+    if sp.issparse(A):
+        # không có Cholesky thưa trong SciPy: LU đối xứng không hoán vị trụ, trụ > 0 <=> xác định dương
+        f = spla.splu(A.tocsc(), permc_spec="MMD_AT_PLUS_A", diag_pivot_thresh=0.0, options={"SymmetricMode": True})
+        if np.any(f.U.diagonal() <= 0):
+            raise np.linalg.LinAlgError("matrix is not positive definite")
+        x = f.solve(b)
+    else:
+        x = sla.cho_solve(sla.cho_factor(A, lower=True, check_finite=False), b, check_finite=False)
+    return x, 1, True, [_relres(A, b, x, bn)]
+
+def jacobi(A, b, tol, maxiter, x0=None, omega=None):
+    d = _diag(A)
+    bn = np.linalg.norm(b) or 1.0
+    x = np.zeros_like(b) if x0 is None else np.array(x0, float)
+    hist = []
+    for it in range(maxiter + 1):
+        r = b - A @ x
+        hist.append(float(np.linalg.norm(r) / bn))
+        if hist[-1] < tol or it == maxiter or not np.isfinite(hist[-1]):
+            break
+        x = x + r / d  # x_{k+1} = D^-1 (b - (A - D) x_k)
+    return x, it, hist[-1] < tol, hist
+
+def _sweep_solver(A, omega: float) -> Callable[[Array], Array]:
+    """Solve (D/omega + L) y = r, L strictly lower triangular part of A."""
+    d = _diag(A)
+    if sp.issparse(A):
+        M = (sp.tril(A, k=-1) + sp.diags(d / omega)).tocsc()
+        return spla.factorized(M)  # tam giác: không fill-in, mỗi lần quét chỉ còn thế tiến
+    M = np.tril(A, k=-1) + np.diag(d / omega)
+    return lambda r: sla.solve_triangular(M, r, lower=True, check_finite=False)
+
+def _estimate_omega(A, iters: int = 30) -> float:
+    """Optimal SOR factor 2 / (1 + sqrt(1 - rho_J^2)) from a power-iteration estimate of rho(Jacobi)."""
+    d = _diag(A)
+    v = np.random.default_rng(0).standard_normal(A.shape[0])
+    rho = 0.0
+    for _ in range(iters):
+        w = v - (A @ v) / d  # (I - D^-1 A) v
+        nw = np.linalg.norm(w)
+        if nw == 0:
+            return 1.0
+        rho, v = nw / np.linalg.norm(v), w / nw
+    return float(np.clip(2 / (1 + np.sqrt(1 - rho ** 2)), 1.0, 1.95)) if rho < 1 else 1.0
+
+def _relaxation(A, b, tol, maxiter, x0, omega):
+    solve_m = _sweep_solver(A, omega)
+    bn = np.linalg.norm(b) or 1.0
+    x = np.zeros_like(b) if x0 is None else np.array(x0, float)
+    hist = []
+    for it in range(maxiter + 1):
+        r = b - A @ x
+        hist.append(float(np.linalg.norm(r) / bn))
+        if hist[-1] < tol or it == maxiter or not np.isfinite(hist[-1]):
+            break
+        x = x + solve_m(r)  # dạng hiệu chỉnh phần dư của một lần quét
+    return x, it, hist[-1] < tol, hist
+
+def gauss_seidel(A, b, tol, maxiter, x0=None, omega=None):
+    return _relaxation(A, b, tol, maxiter, x0, 1.0)
+
+def sor(A, b, tol, maxiter, x0=None, omega=None):
+    return _relaxation(A, b, tol, maxiter, x0, omega or _estimate_omega(A))
+
+def conjugate_gradient(A, b, tol, maxiter, x0=None, omega=None):
+    if not _symmetric(A):
+        raise np.linalg.LinAlgError("matrix is not symmetric")
+    bn = np.linalg.norm(b) or 1.0
+    x = np.zeros_like(b) if x0 is None else np.array(x0, float)
+    r = b - A @ x
+    p, rs = r.copy(), float(r @ r)
+    hist = []
+    for it in range(maxiter + 1):
+        hist.append(float(np.sqrt(rs) / bn))
+        if hist[-1] < tol or it == maxiter:
+            break
+        Ap = A @ p
+        pAp = float(p @ Ap)
+        if pAp <= 0:
+            raise np.linalg.LinAlgError("matrix is not positive definite")
+        alpha = rs / pAp
+        x += alpha * p
+        r -= alpha * Ap
+        rs_new = float(r @ r)
+        p = r + (rs_new / rs) * p
+        rs = rs_new
+    return x, it, hist[-1] < tol, hist
+
+def gmres(A, b, tol, maxiter, x0=None, omega=None):
+    hist: List[float] = []
+    restart = min(A.shape[0], 50)
+    try:
+        x, info = spla.gmres(A, b, x0=x0, rtol=tol, atol=0.0, restart=restart, maxiter=maxiter,
+                             callback=hist.append, callback_type="pr_norm")
+    except TypeError:  # SciPy < 1.12: tol thay cho rtol
+        x, info = spla.gmres(A, b, x0=x0, tol=tol, atol=0.0, restart=restart, maxiter=maxiter,
+                             callback=hist.append, callback_type="pr_norm")
+    bn = np.linalg.norm(b) or 1.0
+    final = _relres(A, b, x, bn)
+    return x, len(hist), info == 0 and final < tol * 10, hist + [final]
+
+METHODS: Dict[str, Callable] = {
+    "Gaussian Elimination": gaussian_elimination, "LU": lu, "Cholesky": cholesky, "Jacobi": jacobi,
+    "Gauss-Seidel": gauss_seidel, "SOR": sor, "Conjugate Gradient": conjugate_gradient, "GMRES": gmres,
+}
+
+def solve(method: str, A, b, tol: float = 1e-8, maxiter: int = 1000, x0=None, omega: Optional[float] = None) -> Dict[str, object]:
+    """Returns x, iterations, converged, residual (relative, final) and history (relative residual per iteration)."""
+    name = match_method(method)
+    if name is None:
+        raise ValueError(f"unsupported linear-system method: {method}")
+    A, b = as_matrix(A), np.asarray(b, float).ravel()
+    _check_square(A, b)
+    x, it, conv, hist = METHODS[name](A, b, tol, maxiter, x0, omega)
+    return {"x": x, "iterations": int(it), "converged": bool(conv), "residual": hist[-1], "history": hist}
+
+def _thin(hist: List[float], points: int = _HISTORY_POINTS) -> List[float]:
+    if len(hist) <= points:
+        return hist
+    idx = np.unique(np.linspace(0, len(hist) - 1, points).astype(int))
+    return [hist[i] for i in idx]
+
+def run_method(method: str, A, b, tol: float = 1e-8, maxiter: int = 1000, x0=None, omega: Optional[float] = None,
+               max_result: int = 100) -> dict:
+    """Metrics dict with the sandbox JSON keys; `result` is the solution vector when n <= max_result."""
+    r = {"method": method, "engine": "native", "format": "csr" if sp.issparse(A) else "dense",
+         "n": int(np.shape(b)[0])}
+    try:
+        out = solve(method, A, b, tol, maxiter, x0, omega)
+    except (np.linalg.LinAlgError, ZeroDivisionError, ValueError, RuntimeError) as e:
+        r.update({"success": False, "iterations": None, "result": None, "residual": None, "error": str(e)})
+        return r
+    x = out["x"]
+    r.update({"success": out["converged"], "iterations": out["iterations"],
+              "result": [float(v) for v in x] if x.size <= max_result else None,
+              "x_norm": float(np.linalg.norm(x)), "residual": out["residual"], "history": _thin(out["history"])})
+    if not np.all(np.isfinite(x)) or not np.isfinite(out["residual"]):
+        r.update({"success": False, "result": None, "residual": None, "error": "non-finite"})
+    elif not r["success"]:
+        r["error"] = f"no convergence in {maxiter} iterations"
+    return r
+
+# ---- task text -> (A, b) ----
+
+_NUM = r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?"
+_TOKEN = re.compile(r"\s*(?:(?P<num>(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)|(?P<var>[A-Za-z][A-Za-z]?_?\d*)|(?P<op>[-+*]))")
+_PARAMS = {"eps", "epsilon", "tol", "omega", "h", "n", "maxiter", "k"}
+
+def _linear(expr: str) -> Optional[Tuple[Dict[str, float], float]]:
+    """'2x - 3.5*y + 1' -> ({'x': 2, 'y': -3.5}, 1.0); None unless the whole string is a linear expression."""
+    pos, coeffs, const = 0, {}, 0.0
+    sign, coef, expect_term = 1.0, None, True
+    expr = expr.strip()
+    if not expr:
+        return None
+    while pos < len(expr):
+        m = _TOKEN.match(expr, pos)
+        if not m or m.end() == pos:
+            return None
+        pos = m.end()
+        if m.group("op") in ("+", "-"):
+            if coef is not None:
+                const += sign * coef
+                coef, expect_term = None, True
+                sign = 1.0
+            elif not expect_term:
+                expect_term = True
+            sign *= -1.0 if m.group("op") == "-" else 1.0
+        elif m.group("op") == "*":
+            if coef is None:
+                return None
+        elif m.group("num") is not None:
+            if coef is not None or not expect_term:
+                return None
+            coef = float(m.group("num"))
+        else:
+            if not expect_term or (coef is not None and m.group(0)[0].isspace()):
+                return None  # "2x" là 2*x, nhưng "15 với" không phải
+            name = m.group("var")
+            coeffs[name] = coeffs.get(name, 0.0) + sign * (1.0 if coef is None else coef)
+            sign, coef, expect_term = 1.0, None, False
+    if coef is not None:
+        const += sign * coef
+    elif expect_term:
+        return None
+    return coeffs, const
+
+def _longest(text: str, from_left: bool) -> Optional[Tuple[Dict[str, float], float]]:
+    """Longest suffix (lhs) / prefix (rhs) of `text` at word boundaries that parses as a linear expression."""
+    cuts = [m.start() for m in re.finditer(r"(?<=\s)\S", text)] if from_left else \
+        [m.end() for m in re.finditer(r"\S(?=\s)", text)][::-1]
+    for cut in [0 if from_left else len(text)] + cuts:
+        part = text[cut:] if from_left else text[:cut]
+        parsed = _linear(part)
+        if parsed is not None:
+            return parsed
+    return None
+
+def _natural(name: str):
+    m = re.match(r"([A-Za-z]+)_?(\d*)", name)
+    return (m.group(1), int(m.group(2)) if m.group(2) else -1)
+
+def _parse_equations(text: str) -> Optional[Tuple[Array, Array, List[str]]]:
+    text = text.replace("−", "-").replace("–", "-")
+    rows = []
+    for m in re.finditer("=", text):
+        left = re.search(r"[0-9A-Za-z_.+\-* \t]*$", text[:m.start()]).group(0)
+        right = re.match(r"[0-9A-Za-z_.+\-* \t]*", text[m.end():]).group(0)
+        lhs, rhs = _longest(left, True), _longest(right, False)
+        if lhs is None or rhs is None or not (lhs[0] or rhs[0]):
+            continue
+        coeffs = dict(lhs[0])
+        for k, v in rhs[0].items():
+            coeffs[k] = coeffs.get(k, 0.0) - v
+        if len(coeffs) == 1 and next(iter(coeffs)).lower() in _PARAMS:
+            continue  # "epsilon = 1e-5", "omega = 1.25"
+        rows.append((coeffs, rhs[1] - lhs[1]))
+    names = sorted({k for c, _ in rows for k in c}, key=_natural)
+    if len(rows) < 2 or len(rows) != len(names):
+        return None
+    A = np.array([[c.get(k, 0.0) for k in names] for c, _ in rows])
+    return A, np.array([r for _, r in rows]), names
+
+def _parse_matrix_literal(s: str) -> Optional[Array]:
+    s = s.strip()
+    try:
+        return np.array(ast.literal_eval(s), float)
+    except (ValueError, SyntaxError):
+        pass
+    # kiểu MATLAB: [2 1 -1; -3 -1 2]
+    body = s.strip("[] ")
+    try:
+        rows = [[float(v) for v in re.split(r"[\s,]+", r.strip()) if v] for r in body.split(";")]
+        return np.array(rows, float) if rows and all(len(r) == len(rows[0]) for r in rows) else None
+    except ValueError:
+        return None
+
+def _parse_matrices(text: str) -> Optional[Tuple[Array, Array, List[str]]]:
+    lits = re.findall(r"\[\s*\[[^\[\]]*\](?:\s*[,;]?\s*\[[^\[\]]*\])*\s*\]|\[[^\[\]]*\]", text)
+    arrays = [a for a in (_parse_matrix_literal(l) for l in lits) if a is not None]
+    mats = [a for a in arrays if a.ndim == 2 and a.shape[0] == a.shape[1] and a.shape[0] > 1]
+    if not mats:
+        return None
+    A = mats[0]
+    rhs = [a.ravel() for a in arrays if a is not A and (a.ndim == 1 or 1 in a.shape) and a.size == A.shape[0]]
+    if not rhs:
+        return None
+    return A, rhs[0], [f"x{i + 1}" for i in range(A.shape[0])]
+
+def parse_linear_system(task_text: str) -> Optional[Tuple[Array, Array, List[str]]]:
+    """(A, b, variable names) from 'A = [[...]], b = [...]' / '[2 1; 1 3]' literals or equations '2x + y - z = 8; ...'."""
+    if not task_text:
+        return None
+    return _parse_matrices(task_text) or _parse_equations(task_text)
+
+def parse_omega(task_text: str) -> Optional[float]:
+    """SOR relaxation factor 'omega = 1.25' / 'ω = 1.1' (not a bare 'w', which may be an unknown); None unless 0 < ω < 2."""
+    m = re.search(rf"(?<![\w.])(?:omega|ω)(?!\w)\s*=\s*({_NUM})", task_text or "", re.I)
+    if not m:
+        return None
+    omega = float(m.group(1))
+    return omega if 0 < omega < 2 else None
+
+if __name__ == "__main__":
+    import time
+    n = 2000
+    main_diag = 5.0 * np.ones(n)  # chéo trội chặt: mọi phương pháp lặp đều hội tụ
+    A = sp.diags([-np.ones(n - 1), main_diag, -np.ones(n - 1)], [-1, 0, 1]) - sp.eye(n, k=40) - sp.eye(n, k=-40)
+    A, b = A.tocsr(), np.ones(n)
+    for name in METHODS:
+        t = time.perf_counter()
+        r = run_method(name, A, b, tol=1e-8)
+        print(f"{name:<22}{(time.perf_counter() - t) * 1000:8.2f} ms  it={r['iterations']}  res={r['residual']}")
+    print(json.dumps(run_method("Gauss-Seidel", *parse_linear_system("4x - y + z = 7; 4x - 8y + z = -21; -2x + y + 5z = 15")[:2]),
+                     ensure_ascii=False))
@@ -0,0 +1,227 @@
+# llm_cache.py
+"""
+Content-addressed cache for the shared LLM (settings.get_cached_llm()).
+
+Key = sha256(model + sampling params + normalized prompt). Two tiers:
+  - MemoryLRU: in-process OrderedDict LRU
+  - DiskCache: SQLite file with TTL, total-size cap and least-recently-used eviction
+Only string prompts at temperature 0 are cached; everything else is passed through.
+Hit/miss counts are kept per call site (calling function name unless `site=` is given).
+ainvoke() additionally coalesces identical in-flight prompts into a single model request.
+"""
+import asyncio, hashlib, json, os, re, sqlite3, sys, textwrap, threading, time
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Optional
+import instrumentation
+
+class MemoryLRU:
+    def __init__(self, maxsize: int = 512):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+class DiskCache:
+    """SQLite key/value store with TTL and a total size cap (LRU eviction by last access)."""
+    def __init__(self, path: str, ttl: float = 7 * 24 * 3600, max_bytes: int = 200 * 1024 * 1024,
+                 evict_every: int = 100):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path, self.ttl, self.max_bytes, self.evict_every = path, ttl, max_bytes, evict_every
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                         "created REAL NOT NULL, accessed REAL NOT NULL, size INTEGER NOT NULL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache(accessed)")
+        self._writes = 0
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT value, created FROM cache WHERE key=?", (key,)).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl:
+                self._db.execute("DELETE FROM cache WHERE key=?", (key,))
+                return None
+            self._db.execute("UPDATE cache SET accessed=? WHERE key=?", (now, key))
+            return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO cache VALUES (?,?,?,?,?)",
+                             (key, value, now, now, len(value.encode("utf-8"))))
+            self._writes += 1
+            if self._writes % self.evict_every == 0:
+                self._evict_locked()
+
+    def evict(self) -> int:
+        with self._lock:
+            return self._evict_locked()
+
+    def _evict_locked(self) -> int:
+        removed = self._db.execute("DELETE FROM cache WHERE created < ?", (time.time() - self.ttl,)).rowcount
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+        if total > self.max_bytes:
+            # giữ các entry mới truy cập nhất cho tới khi vừa max_bytes
+            keep, cutoff = 0, None
+            for accessed, size in self._db.execute("SELECT accessed, size FROM cache ORDER BY accessed DESC"):
+                keep += size
+                if keep > self.max_bytes:
+                    cutoff = accessed
+                    break
+            if cutoff is not None:
+                removed += self._db.execute("DELETE FROM cache WHERE accessed <= ?", (cutoff,)).rowcount
+        return removed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM cache")
+
+def normalize_prompt(prompt: str) -> str:
+    """Dedent, strip trailing spaces and collapse blank-line/space runs so cosmetic edits share a key."""
+    lines = [re.sub(r"[ \t]+", " ", l).rstrip() for l in textwrap.dedent(prompt).strip().splitlines()]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines))
+
+_PARAMS = ("model", "temperature", "top_p", "top_k", "max_output_tokens", "max_tokens", "n")
+
+class CachedLLM:
+    """Wraps a chat model; invoke() checks memory -> disk -> model. Other attributes are delegated."""
+    def __init__(self, llm, memory: Optional[MemoryLRU] = None, disk: Optional[DiskCache] = None,
+                 enabled: bool = True):
+        self.llm = llm
+        self.memory = memory or MemoryLRU()
+        self.disk = disk
+        self.enabled = enabled
+        self.stats: Dict[str, Dict[str, int]] = defaultdict(lambda: {"memory_hit": 0, "disk_hit": 0, "miss": 0, "bypass": 0, "coalesced": 0})
+        self._stats_lock = threading.Lock()
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
+
+    def params(self) -> Dict[str, Any]:
+        return {p: getattr(self.llm, p) for p in _PARAMS if getattr(self.llm, p, None) is not None}
+
+    def cache_key(self, prompt: str, **kwargs) -> str:
+        payload = json.dumps({"params": self.params(), "kwargs": kwargs, "prompt": normalize_prompt(prompt)},
+                             sort_keys=True, default=str, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _cacheable(self, prompt, kwargs) -> bool:
+        return self.enabled and isinstance(prompt, str) and not kwargs.get("tools") \
+            and (self.params().get("temperature") in (0, 0.0))
+
+    def _count(self, site: str, kind: str) -> None:
+        with self._stats_lock:
+            self.stats[site][kind] += 1
+
+    def lookup(self, key: str):
+        """memory -> disk; returns (content, tier) or (None, None). Disk hits are promoted to memory."""
+        content = self.memory.get(key)
+        if content is not None:
+            return content, "memory_hit"
+        if self.disk is not None:
+            content = self.disk.get(key)
+            if content is not None:
+                self.memory.set(key, content)
+                return content, "disk_hit"
+        return None, None
+
+    def store(self, key: str, response) -> None:
+        content = getattr(response, "content", None)
+        if isinstance(content, str) and content:
+            self.memory.set(key, content)
+            if self.disk is not None:
+                self.disk.set(key, content)
+
+    @staticmethod
+    def _config(site: str) -> dict:
+        # call_site đi vào metadata để instrumentation.LLMCallbackHandler ghi đúng nơi gọi
+        return {"metadata": {"call_site": site}}
+
+    def _hit(self, site: str, tier: str, t0: float, content: str):
+        self._count(site, tier)
+        instrumentation.record_call("llm_cache", site, time.perf_counter() - t0, tier=tier)
+        return _message(content)
+
+    def invoke(self, prompt, site: Optional[str] = None, **kwargs):
+        site = site or sys._getframe(1).f_code.co_name
+        if not self._cacheable(prompt, kwargs):
+            self._count(site, "bypass")
+            return self.llm.invoke(prompt, config=self._config(site), **kwargs)
+        t0 = time.perf_counter()
+        key = self.cache_key(prompt, **kwargs)
+        content, tier = self.lookup(key)
+        if content is not None:
+            return self._hit(site, tier, t0, content)
+        self._count(site, "miss")
+        resp = self.llm.invoke(prompt, config=self._config(site), **kwargs)
+        self.store(key, resp)
+        return resp
+
+    def ainvoke(self, prompt, site: Optional[str] = None, **kwargs):
+        # không phải async def: call site phải lấy từ frame của người gọi trước khi coroutine chạy
+        return self._ainvoke(prompt, site or sys._getframe(1).f_code.co_name, **kwargs)
+
+    async def _ainvoke(self, prompt, site: str, **kwargs):
+        if not self._cacheable(prompt, kwargs):
+            self._count(site, "bypass")
+            return await self.llm.ainvoke(prompt, config=self._config(site), **kwargs)
+        t0 = time.perf_counter()
+        key = self.cache_key(prompt, **kwargs)
+        loop = asyncio.get_running_loop()
+        while True:
+            content, tier = self.lookup(key)
+            if content is not None:
+                return self._hit(site, tier, t0, content)
+            leader = self._inflight.get((id(loop), key))
+            if leader is None:
+                break
+            # cùng prompt đang chạy: chờ kết quả thay vì gửi request thứ hai
+            self._count(site, "coalesced")
+            try:
+                return await asyncio.shield(leader)
+            except asyncio.CancelledError:
+                if not leader.cancelled():
+                    raise
+                # request gốc bị huỷ (vd race mode) -> thử lại
+        fut = loop.create_future()
+        self._inflight[(id(loop), key)] = fut
+        self._count(site, "miss")
+        try:
+            resp = await self.llm.ainvoke(prompt, config=self._config(site), **kwargs)
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except Exception as e:
+            fut.set_exception(e)
+            fut.exception()  # tránh warning "exception was never retrieved" khi không có ai chờ
+            raise
+        finally:
+            self._inflight.pop((id(loop), key), None)
+        self.store(key, resp)
+        fut.set_result(resp)
+        return resp
+
+    def report(self) -> Dict[str, Dict[str, int]]:
+        with self._stats_lock:
+            return {k: dict(v) for k, v in self.stats.items()}
+
+def _message(content: str):
+    from langchain_core.messages import AIMessage
+    return AIMessage(content=content, response_metadata={"cache_hit": True})
@@ -1,26 +1,45 @@
 # main.py
-import asyncio, operator
-from typing import TypedDict, Annotated, Literal
-from langchain.agents import load_tools
+import asyncio, operator, uuid
+from typing import TypedDict, Annotated, Literal, Optional
 from langgraph.graph import StateGraph, START, END
 from langgraph.prebuilt import create_react_agent
 from langgraph.prebuilt.chat_agent_executor import AgentState
 from langchain_core.prompts import ChatPromptTemplate, PromptTemplate
-from settings import LLM
-from problem_classifier import classify_task
-from algorithm_researcher import research_and_propose
+from settings import get_llm, VALIDATION_MODE, SEARCH_TOOLS, get_research_cache, RESEARCH_TIMEOUT, RESEARCH_LOCAL_MIN_COVERAGE, RESEARCH_NOTES_MIN_SCORE, EXECUTION_MODE, CONTEXT_BUDGET, STEP_RESULT_MAX, STEP_FUSION_MAX, get_step_store, CHECKPOINT, get_method_kb
+from problem_classifier import aclassify_task
+from algorithm_researcher import aresearch_and_propose
 from algorithm_map import ALGORITHM_MAP
-from planner import make_plan, Plan
+from planner import amake_plan, Plan
 from validator import Validator
-from tools import e2b_sandbox_tool
+from instrumentation import timed_node, start_run, end_run, count
+from step_context import approx_tokens, compact, fit_results, fusable_group, split_fused_output
+from tools import e2b_sandbox_tool, open_session, close_session, session_alive, execute_in_session, session_snapshot, make_session_tool
+from checkpoint import open_checkpointer, invoke_checkpointed
+from method_kb import task_features
+from research import ResearchLayer, ToolBackend
 
-# web tools (search/arxiv/wiki)
-search_tools = load_tools(["ddg-search","arxiv","wikipedia"], llm=LLM)
+# main dựng agent/tools khi import: LLM và research cache lấy từ settings ở đây
+LLM = get_llm()
+
+# one `research` tool: local method notes, plus web tools (search/arxiv/wiki) queried concurrently and
+# cached on disk; notes only when SEARCH_TOOLS="" (offline runs)
+if SEARCH_TOOLS:
+    from langchain.agents import load_tools
+    remote_sources = [ToolBackend(t) for t in load_tools(SEARCH_TOOLS, llm=LLM)]
+else:
+    remote_sources = []
+research_layer = ResearchLayer(remote_sources, cache=get_research_cache(), timeout=RESEARCH_TIMEOUT,
+                               min_coverage=RESEARCH_LOCAL_MIN_COVERAGE, min_note_score=RESEARCH_NOTES_MIN_SCORE)
+search_tools = [research_layer.as_tool()]
 tools = search_tools + [e2b_sandbox_tool]
 
 # execution agent: runs steps, can call tools
-system_prompt = "Bạn là trợ lý thực thi các bước; ưu tiên ArXiv->Search->Wikipedia để research; chỉ gọi sandbox khi có code hoàn chỉnh."
+system_prompt = "Bạn là trợ lý thực thi các bước; research bằng tool `research` (một câu hỏi mỗi lần gọi, kết quả được cache); chỉ gọi sandbox khi có code hoàn chỉnh. Sandbox giữ nguyên biến/hàm giữa các bước: dùng lại kết quả của bước trước thay vì tính lại."
 step_template = "TASK:\n{task}\n\nPLAN:\n{plan}\n\nSTEP TO EXECUTE:\n{step}\n"
+# EXECUTION_MODE=fused: several consecutive compute-only steps in one round-trip
+fused_template = ("TASK:\n{task}\n\nPLAN:\n{plan}\n\nSTEPS TO EXECUTE:\n{steps}\n\n"
+                  "Thực hiện các bước trên bằng MỘT khối code và chỉ gọi sandbox một lần; "
+                  "trước output của mỗi bước in đúng một dòng `### STEP <số thứ tự bước>`.\n")
 prompt_template = ChatPromptTemplate.from_messages([("system",system_prompt),("user",step_template)])
 execution_agent = create_react_agent(
     model=LLM,
@@ -28,6 +47,18 @@ execution_agent = create_react_agent(
     state_schema=AgentState
 )
 
+# one agent per sandbox session (its sandbox tool is bound to the session)
+_session_agents = {}
+
+def get_session_agent(session_id: str):
+    if session_id not in _session_agents:
+        _session_agents[session_id] = create_react_agent(
+            model=LLM,
+            tools=search_tools + [make_session_tool(session_id)],
+            state_schema=AgentState
+        )
+    return _session_agents[session_id]
+
 # Graph state
 class PlanState(TypedDict):
     task: str
@@ -37,59 +68,152 @@ class PlanState(TypedDict):
     best_algorithm: dict
     plan: Plan
     past_steps: Annotated[list[str], operator.add]
+    session_id: str
+    store_key: str  # step store key (session id of the first step; stable when a resumed run reopens the sandbox)
+    step_snapshots: Annotated[list[list], operator.add]
+    step_code: Annotated[list[str], operator.add]  # code run per agent round-trip, replayed into a new sandbox on resume
     final_response: str
 
 def get_current_step(state: PlanState) -> int:
     return len(state.get("past_steps", []))
 
-def get_full_plan(state: PlanState) -> str:
+def _render_plan(steps: list[str], results: list[str]) -> str:
     out=[]
-    for i, s in enumerate(state["plan"].steps):
+    for i, s in enumerate(steps):
         txt=f"# {i+1}. {s}\n"
-        if i<get_current_step(state): txt+=f"Result: {state['past_steps'][i]}\n"
+        if i<len(results) and results[i]: txt+=f"Result: {results[i]}\n"  # "" = đã gộp vào dòng tóm tắt
         out.append(txt)
     return "\n".join(out)
 
+def get_full_plan(state: PlanState, budget: Optional[int] = None) -> str:
+    """Plan with the results so far; with `budget`, earlier results are compacted to ~budget chars."""
+    results = state.get("past_steps", [])
+    return _render_plan(state["plan"].steps, fit_results(results, budget) if budget else results)
+
+def _compact_mode() -> bool:
+    return EXECUTION_MODE in ("compact", "fused")
+
+def _full_results(state: PlanState) -> list[str]:
+    """Earlier step outputs in full (from the step store when compacting, else the state itself)."""
+    past = state.get("past_steps", [])
+    key = state.get("store_key") or state.get("session_id")
+    if not (_compact_mode() and key):
+        return list(past)
+    return [get_step_store().get(key, i + 1) or r for i, r in enumerate(past)]
+
+def _full_prompt_tokens(state: PlanState, group: list[int], outputs: list[str]) -> int:
+    """Prompt tokens "full" mode would have sent for `group`: one agent call per step, every earlier result verbatim."""
+    steps, full = state["plan"].steps, _full_results(state)
+    return sum(approx_tokens(step_template.format(task=state["task"], plan=_render_plan(steps, full + outputs[:j]), step=steps[k]))
+               for j, k in enumerate(group))
+
+def _store_outputs(key: str, group: list[int], outputs: list[str]) -> None:
+    for k, out in zip(group, outputs):
+        get_step_store().put(key, k + 1, out)
+
+def _record_savings(full_tokens: int, sent: str, round_trips: int = 0) -> None:
+    count("context_tokens_saved", max(0, full_tokens - approx_tokens(sent)))
+    if round_trips:
+        count("round_trips_saved", round_trips)
+
+def _executed_code(messages: list) -> str:
+    """Sandbox code from the agent's successful tool calls, in order."""
+    results = {m.tool_call_id: m.content for m in messages if getattr(m, "type", None) == "tool"}
+    code = [tc["args"].get("code", "") for m in messages for tc in (getattr(m, "tool_calls", None) or [])
+            if tc.get("name") == "e2b_sandbox" and not str(results.get(tc.get("id"), "")).startswith("Error")]
+    return "\n\n".join(c for c in code if c)
+
+async def _ensure_session(state: PlanState) -> str:
+    """Session of this run; a resumed run whose sandbox is gone gets a new one with earlier step code replayed."""
+    session_id = state.get("session_id")
+    if session_id and await asyncio.to_thread(session_alive, session_id):
+        return session_id
+    new_id = await asyncio.to_thread(open_session)
+    if session_id:
+        for code in state.get("step_code", []):
+            if code:
+                await asyncio.to_thread(execute_in_session, new_id, code)
+        count("session_replays")
+    return new_id
+
 final_prompt = PromptTemplate.from_template("TASK:\n{task}\n\nPLAN+RESULTS:\n{plan}\n\nFINAL ANSWER:\n")
 
 # nodes
+@timed_node("classify")
 async def _classify(state: PlanState) -> PlanState:
-    cls = classify_task(state["task"])
+    cls = await aclassify_task(state["task"])
     return {"classification": cls}
 
+@timed_node("research")
 async def _research(state: PlanState) -> PlanState:
     cls = state["classification"]
-    ar = research_and_propose(state["task"], category_hint=cls.get("category"), short_form=cls.get("short_form"), domain_hint=cls.get("domain_hint"))
+    ar = await aresearch_and_propose(state["task"], category_hint=cls.get("category"), short_form=cls.get("short_form"), domain_hint=cls.get("domain_hint"))
     if not ar.get("candidate_methods"):
         ar["candidate_methods"] = ALGORITHM_MAP.get(cls.get("category"), list(ALGORITHM_MAP.values())[0])[:6]
     return {"research": ar}
 
+@timed_node("validate")
 async def _validate(state: PlanState) -> PlanState:
     ar = state["research"]
     cls = state["classification"]
-    validator = Validator(task_text=state["task"], short_form=cls.get("short_form"), domain_hint=cls.get("domain_hint"), candidate_methods=ar.get("candidate_methods"))
-    results = validator.validate_methods(ar.get("candidate_methods"))
+    validator = Validator(task_text=state["task"], short_form=cls.get("short_form"), domain_hint=cls.get("domain_hint"), candidate_methods=ar.get("candidate_methods"), category=cls.get("category"))
+    methods, pruned = ar.get("candidate_methods"), []
+    kb = get_method_kb()
+    if kb is not None:
+        # xếp candidate theo chi phí dự đoán, bỏ các phương pháp luôn thất bại với loại bài này
+        features = task_features(cls.get("category"), cls.get("short_form"), cls.get("domain_hint"), validator.system)
+        methods, pruned = await asyncio.to_thread(kb.rank, cls.get("category"), features, methods)
+        if pruned:
+            count("kb_pruned", len(pruned))
+    results = await validator.avalidate_methods(methods, concurrent=VALIDATION_MODE != "sequential", race=VALIDATION_MODE == "race")
     best = validator.pick_best(results)
+    if kb is not None:
+        await asyncio.to_thread(kb.record, uuid.uuid4().hex[:12], cls.get("category"), features, results, best, methods, pruned,
+                                validator.timings)
+    results += [{"method": p["method"], "success": False, "pruned": True,
+                 "error": f"pruned: {p['success_rate']:.0%} success in {p['runs']} runs"} for p in pruned]
     return {"validation_results": results, "best_algorithm": best}
 
+@timed_node("plan")
 async def _plan(state: PlanState) -> PlanState:
     best_name = state["best_algorithm"].get("method") or state["research"]["candidate_methods"][0]
-    summary = f"Method: {best_name}\nShort: {state['classification'].get('short_form')}\nDomain: {state['classification'].get('domain_hint')}\nTask: {state['task']}"
-    plan = make_plan(task_summary=summary, method_name=best_name)
+    domain = state['classification'].get('domain_hint') or state["best_algorithm"].get("bracket")
+    summary = f"Method: {best_name}\nShort: {state['classification'].get('short_form')}\nDomain: {domain}\nTask: {state['task']}"
+    plan = await amake_plan(task_summary=summary, method_name=best_name)
     return {"plan": plan}
 
+async def close_run_session(state: dict) -> None:
+    """Release the run's sandbox session (end of run, or a failed run that cannot be resumed)."""
+    session_id = (state or {}).get("session_id")
+    if session_id:
+        _session_agents.pop(session_id, None)
+        await asyncio.to_thread(close_session, session_id)
+
+@timed_node("run", label=lambda s: {"step": get_current_step(s) + 1})
 async def _run_step(state: PlanState) -> PlanState:
+    session_id = await _ensure_session(state)
+    try:
+        return await _step_in_session(state, session_id)
+    except BaseException:
+        # session vừa mở ở bước này chưa vào state: on_abort / lần resume sau không thấy nó
+        if session_id != state.get("session_id"):
+            await asyncio.shield(close_run_session({"session_id": session_id}))
+        raise
+
+async def _step_in_session(state: PlanState, session_id: str) -> PlanState:
     plan = state["plan"]
     idx = get_current_step(state)
-    step_text = plan.steps[idx]
+    store_key = state.get("store_key") or session_id
+    budget = CONTEXT_BUDGET if _compact_mode() else None
+    group = fusable_group(plan.steps, idx, STEP_FUSION_MAX) if EXECUTION_MODE == "fused" else [idx]
     # Nội dung user từ template
-    user_content = step_template.format(
-        task=state["task"],
-        plan=get_full_plan(state),
-        step=step_text
-    )
+    if len(group) == 1:
+        user_content = step_template.format(task=state["task"], plan=get_full_plan(state, budget), step=plan.steps[idx])
+    else:
+        user_content = fused_template.format(task=state["task"], plan=get_full_plan(state, budget),
+                                             steps="\n".join(f"{k+1}. {plan.steps[k]}" for k in group))
     # Truyền vào agent dạng messages
-    res = await execution_agent.ainvoke({
+    res = await get_session_agent(session_id).ainvoke({
         "messages": [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_content}
@@ -98,10 +222,30 @@ async def _run_step(state: PlanState) -> PlanState:
     # Lấy output cuối từ agent
     messages = res.get("messages", [])
     content = messages[-1].content if messages else str(res)
-    return {"past_steps": [content]}
+    outputs = [content]
+    if len(group) > 1:
+        tool_out = "\n".join(m.content for m in messages if getattr(m, "type", None) == "tool")
+        outputs = split_fused_output(tool_out, [k + 1 for k in group]) \
+            or [f"(gộp vào bước {group[-1] + 1})"] * (len(group) - 1) + [content]
+    if budget:
+        # đầy đủ -> step store, state chỉ giữ bản rút gọn
+        _record_savings(_full_prompt_tokens(state, group, outputs), user_content, round_trips=len(group) - 1)
+        await asyncio.to_thread(_store_outputs, store_key, group, outputs)
+        outputs = [compact(o, STEP_RESULT_MAX, ref=f"step {k + 1}") for k, o in zip(group, outputs)]
+    snapshot = await asyncio.to_thread(session_snapshot, session_id)
+    return {"past_steps": outputs, "session_id": session_id, "store_key": store_key,
+            "step_snapshots": [snapshot] * len(group), "step_code": [_executed_code(messages)]}
 
+@timed_node("final")
 async def _final(state: PlanState) -> PlanState:
-    final = await (final_prompt | LLM).ainvoke({"task": state["task"], "plan": get_full_plan(state)})
+    budget = CONTEXT_BUDGET if _compact_mode() else None
+    plan_text = get_full_plan(state, budget)
+    final = await (final_prompt | LLM).ainvoke({"task": state["task"], "plan": plan_text})
+    if budget:
+        full_plan = _render_plan(state["plan"].steps, _full_results(state))
+        _record_savings(approx_tokens(final_prompt.format(task=state["task"], plan=full_plan)),
+                        final_prompt.format(task=state["task"], plan=plan_text))
+    await close_run_session(state)
     return {"final_response": final}
 
 def _should_continue(state: PlanState) -> Literal["run","final"]:
@@ -125,35 +269,58 @@ builder.add_edge("final", END)
 graph = builder.compile()
 
 # runner
-async def run_task(task_text: str):
+def _print_update(node: str, out: dict) -> None:
+    # In khi node kết thúc
+    if node == "classify":
+        print("\n[CLASSIFY] ->", out)
+    elif node == "research":
+        print("\n[RESEARCH] ->", out)
+    elif node == "validate":
+        print("\n[VALIDATE] ->", out["best_algorithm"])
+    elif node == "plan":
+        print("\n[PLAN] ->")
+        for i, s in enumerate(out["plan"].steps, 1):
+            print(f"  {i}. {s}")
+    elif node == "run":
+        print("\n[RUN STEP] ->", out["past_steps"][-1])
+        snapshot = out.get("step_snapshots", [[]])[-1]
+        if snapshot:
+            print("  [SESSION VARS] ->", ", ".join(f"{v['name']}:{v['type']}({v['size']}B)" for v in snapshot))
+    elif node == "final":
+        print("\n[FINAL RESPONSE] ->", out["final_response"])
+
+async def run_task(task_text: str, report_path: str = None, thread_id: str = None, resume: bool = False,
+                   db: str = None):
+    """
+    Run the pipeline (checkpointed unless CHECKPOINT=0; `db` overrides CHECKPOINT_DB);
+    resume=True continues an unfinished run of this task.
+    """
     print("\n=== RUNNING PIPELINE ===\n")
-    final_res = None
-    # stream theo event v1 thay vì raw updates
-    async for event in graph.astream_events({"task": task_text}, version="v1"):
-        etype = event["event"]
-        name = event.get("name")
-        # In khi node kết thúc
-        if etype == "on_chain_end":
-            if name == "classify":
-                print("\n[CLASSIFY] ->", event["data"]["output"])
-            elif name == "research":
-                print("\n[RESEARCH] ->", event["data"]["output"])
-            elif name == "validate":
-                print("\n[VALIDATE] ->", event["data"]["output"]["best_algorithm"])
-            elif name == "plan":
-                plan = event["data"]["output"]["plan"]
-                print("\n[PLAN] ->")
-                for i, s in enumerate(plan.steps, 1):
-                    print(f"  {i}. {s}")
-            elif name == "run":
-                step_out = event["data"]["output"]["past_steps"][-1]
-                print("\n[RUN STEP] ->", step_out)
-            elif name == "final":
-                final_res = event["data"]["output"]["final_response"]
-                print("\n[FINAL RESPONSE] ->", final_res)
+    report = start_run(task_text)
+    if CHECKPOINT or db:
+        async with open_checkpointer(db) as (saver, ledger):
+            thread_id, state = await invoke_checkpointed(builder.compile(checkpointer=saver), task_text, ledger,
+                                                         thread_id=thread_id, resume=resume, on_update=_print_update)
+        print("\n[THREAD] ->", thread_id)
+    else:
+        _, state = await invoke_checkpointed(graph, task_text, on_update=_print_update, on_abort=close_run_session)
+    final_res = state.get("final_response")
     print("\n=== FINAL ===\n", final_res)
+    end_run(report)
+    print("\n=== REPORT ===\n", report.summary())
+    if report_path:
+        report.to_json(report_path)
     return final_res
 
+async def resume_task(thread_id: str = None, report_path: str = None, db: str = None):
+    """Continue a checkpointed run (in `db`, default CHECKPOINT_DB) from its last completed node (default: the latest unfinished run)."""
+    async with open_checkpointer(db) as (_, ledger):
+        row = await (ledger.get(thread_id) if thread_id else ledger.latest_unfinished())
+    if row is None:
+        print("Không có lần chạy nào để tiếp tục.")
+        return None
+    return await run_task(row["task"], report_path, thread_id=row["thread_id"], resume=True, db=db)
+
 if __name__ == "__main__":
     sample = "Bằng phương pháp dây cung, tìm nghiệm gần đúng của phương trình sau: x**3 - x - 1 = 0 trong khoảng phân ly nghiệm (1, 2), với sai số epsilon = 10e-5."
     # sample = "Tính thể tích hình cầu với sáu chữ số đáng tin biết đường kính d là nghiệm dương lớn nhất của phương trình 3*sin(x) + x**3 - 8*x**2 + 8*x + 1 = 0; pi lấy đúng 7 chữ số sau dấu phẩy. Ghi bảng lặp."
@@ -0,0 +1,233 @@
+# method_kb.py
+"""
+Knowledge base of past validation outcomes (SQLite, append-only, indexed by category + features).
+
+Every validated candidate is stored under its engine name (see canonical()) with its category, a
+structural feature key of the task (function families, polynomial degree, interval given, system size /
+symmetry / diagonal dominance...), success, iterations, residual and wall time. rank() orders new candidates by predicted cost
+(mean wall time / success rate over each method's last `window` runs with the same features, else the
+same category) and prunes those that recently fail; methods without history keep the proposed order after
+the known good ones. A pruned method is let back in (last) after `explore_every` prunings, so its stats
+can recover when the solver or the tasks change.
+
+    python method_kb.py stats [--category root_finding]
+    python method_kb.py compact --max-rows 100000
+"""
+import argparse, json, os, re, sqlite3, threading, time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS outcomes (id INTEGER PRIMARY KEY, ts REAL NOT NULL, run TEXT NOT NULL, "
+    "category TEXT NOT NULL, features TEXT NOT NULL, method TEXT NOT NULL, status TEXT NOT NULL, "
+    "iterations INTEGER, residual REAL, wall_s REAL, engine TEXT, predicted_rank INTEGER, best INTEGER NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS ix_outcomes_cat ON outcomes (category, features, method)",
+]
+# status: ok | fail | pruned (bỏ qua nhờ KB) | cancelled (thua race, không tính vào tỉ lệ thành công)
+
+_FAMILIES = {
+    "trig": r"\b(?:sin|cos|tan|asin|acos|atan|arcsin|arccos|arctan)\b",
+    "hyp": r"\b(?:sinh|cosh|tanh)\b",
+    "exp": r"\bexp\b|\be\s*\*\*",
+    "log": r"\b(?:log|ln|log10|log2)\b",
+    "root": r"\b(?:sqrt|cbrt)\b|\*\*\s*\(?\s*(?:0?\.5|1\s*/\s*[23])",
+    "abs": r"\b(?:abs|fabs)\b",
+    "rational": r"/\s*\(?[^)]*[a-z]",
+}
+
+def task_features(category: Optional[str], short_form: Optional[str] = None, domain_hint: Optional[str] = None,
+                  system: Optional[tuple] = None) -> str:
+    """Structural key such as 'poly3,interval' / 'trig,exp' / 'n<=10,sym,diagdom' (same key = same kind of task)."""
+    feats: List[str] = []
+    expr = (short_form or "").lower().replace("^", "**")
+    if expr:
+        feats += [name for name, pat in _FAMILIES.items() if re.search(pat, expr)]
+        powers = [int(p) for p in re.findall(r"\*\*\s*(\d+)", expr)]
+        if not any(f in feats for f in ("trig", "hyp", "exp", "log", "root", "abs", "rational")):
+            feats.append(f"poly{max(powers, default=1)}")
+        elif powers:
+            feats.append("pow")
+    if domain_hint:
+        feats.append("interval")
+    if system is not None:
+        A = system[0]
+        n = A.shape[0]
+        feats.append(next(f"n<={k}" for k in (10, 100, 1000, 10 ** 9) if n <= k))
+        if n <= 1000:
+            dense = np.asarray(A.toarray() if hasattr(A, "toarray") else A, float)
+            if np.allclose(dense, dense.T):
+                feats.append("sym")
+            d = np.abs(np.diag(dense))
+            if np.all(2 * d > np.abs(dense).sum(axis=1)):
+                feats.append("diagdom")
+    return ",".join(feats) or "-"
+
+def canonical(category: Optional[str], method: str) -> str:
+    """Engine name for free-form LLM method names ('Phương pháp dây cung' -> 'Regula Falsi'), else as given."""
+    from root_solver import match_method as root
+    from linear_solver import match_method as linear
+    from quadrature import match_method as quad
+    from ode_solver import match_method as ode
+    matcher = {"root_finding": root, "linear_system": linear, "integration": quad, "ode_ivp": ode}.get(category)
+    return (matcher(method) if matcher else None) or (method or "").strip()
+
+class MethodKB:
+    """Append-only outcome store + ranking. Thread-safe (one connection guarded by a lock)."""
+    def __init__(self, path: str, min_runs: int = 5, min_success: float = 0.1, max_rows: Optional[int] = None,
+                 window: int = 50, explore_every: int = 10):
+        self.path = path
+        self.min_runs = min_runs
+        self.min_success = min_success
+        self.window = window
+        self.explore_every = explore_every
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        for sql in _SCHEMA:
+            self._db.execute(sql)
+        self._db.commit()
+        if max_rows:
+            self.compact(max_rows)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def _stats(self, category: str, features: Optional[str]) -> Dict[str, Dict[str, float]]:
+        inner = ("SELECT method, status, wall_s, iterations, ROW_NUMBER() OVER (PARTITION BY method ORDER BY id DESC) AS k "
+                 "FROM outcomes WHERE category=? AND status IN ('ok','fail')")
+        args: tuple = (category,)
+        if features is not None:
+            inner += " AND features=?"
+            args += (features,)
+        # chỉ `window` lần chạy gần nhất của mỗi phương pháp
+        sql = (f"SELECT method, COUNT(*), SUM(status='ok'), AVG(wall_s), AVG(iterations) FROM ({inner}) "
+               f"WHERE k<=? GROUP BY method")
+        with self._lock:
+            rows = self._db.execute(sql, args + (self.window,)).fetchall()
+        return {m: {"runs": n, "success": ok / n, "wall_s": wall or 0.0, "iterations": it} for m, n, ok, wall, it in rows}
+
+    def _pruned_since_tried(self, category: str) -> Dict[str, int]:
+        """Times each method was pruned since it last actually ran (ok/fail) in this category."""
+        sql = ("SELECT method, COUNT(*) FROM outcomes o WHERE category=? AND status='pruned' AND id > "
+               "COALESCE((SELECT MAX(id) FROM outcomes WHERE category=o.category AND method=o.method "
+               "AND status IN ('ok','fail')), 0) GROUP BY method")
+        with self._lock:
+            return dict(self._db.execute(sql, (category,)).fetchall())
+
+    def rank(self, category: Optional[str], features: str, methods: Sequence[str]) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """
+        (ordered methods, pruned) for `methods`: known methods by predicted cost (mean wall time / success
+        rate), then methods without enough history in their original order. A method with >= min_runs
+        runs and a success rate below min_success is pruned (never all of them), except every
+        explore_every-th time, when it is tried again after the others.
+        """
+        if not category or not methods:
+            return list(methods), []
+        exact, broad = self._stats(category, features), self._stats(category, None)
+        since = self._pruned_since_tried(category) if self.explore_every else {}
+        known, unknown, explore, pruned = [], [], [], []
+        for pos, m in enumerate(methods):
+            c = canonical(category, m)
+            s = exact.get(c) if exact.get(c, {}).get("runs", 0) >= self.min_runs else broad.get(c)
+            if s is None or s["runs"] < self.min_runs:
+                unknown.append(m)
+            elif s["success"] < self.min_success:
+                if self.explore_every and since.get(c, 0) + 1 >= self.explore_every:
+                    explore.append(m)
+                else:
+                    pruned.append({"method": m, "runs": s["runs"], "success_rate": round(s["success"], 3)})
+            else:
+                # min_success=0 giữ cả phương pháp chưa thành công lần nào (chi phí ~ vô cùng, xếp cuối)
+                known.append((s["wall_s"] / max(s["success"], 1e-9), pos, m))
+        ordered = [m for _, _, m in sorted(known)] + unknown + explore
+        if not ordered and pruned:  # luôn giữ lại ít nhất một candidate
+            keep = max(pruned, key=lambda p: p["success_rate"])
+            pruned.remove(keep)
+            ordered = [keep["method"]]
+        return ordered, pruned
+
+    def record(self, run: str, category: Optional[str], features: str, results: Sequence[Dict[str, Any]],
+               best: Optional[Dict[str, Any]] = None, ranked: Optional[Sequence[str]] = None,
+               pruned: Sequence[Dict[str, Any]] = (), timings: Optional[Dict[str, float]] = None) -> None:
+        """Append one row per validated (and pruned) candidate of one validation run (wall time from `timings`)."""
+        if not category:
+            return
+        now, best_m = time.time(), (best or {}).get("method")
+        known = list(ranked or [])
+        rows = []
+        for r in results:
+            status = "cancelled" if r.get("cancelled") else "ok" if r.get("success") else "fail"
+            it, res = r.get("iterations"), r.get("residual")
+            rows.append((now, run, category, features, canonical(category, r.get("method")), status,
+                         int(it) if isinstance(it, (int, float)) else None,
+                         float(res) if isinstance(res, (int, float)) else None, (timings or {}).get(r.get("method")), r.get("engine"),
+                         known.index(r["method"]) if r.get("method") in known else None, int(r.get("method") == best_m)))
+        rows += [(now, run, category, features, canonical(category, p["method"]), "pruned", None, None, None, None, None, 0) for p in pruned]
+        with self._lock:
+            self._db.executemany("INSERT INTO outcomes (ts, run, category, features, method, status, iterations, "
+                                 "residual, wall_s, engine, predicted_rank, best) VALUES (?,?,?,?,?,?,?,?,?,?,?,?)", rows)
+            self._db.commit()
+
+    def compact(self, max_rows: int) -> int:
+        """Drop the oldest rows beyond `max_rows`; returns the number removed."""
+        with self._lock:
+            cur = self._db.execute("DELETE FROM outcomes WHERE id <= (SELECT id FROM outcomes ORDER BY id DESC "
+                                   "LIMIT 1 OFFSET ?)", (max_rows,))
+            self._db.commit()
+            return cur.rowcount
+
+    def report(self, category: Optional[str] = None) -> Dict[str, Any]:
+        """Per category: validation runs, prune count, top-1 hit rate (predicted first = picked best) and per-method stats."""
+        where, args = ("WHERE category=?", (category,)) if category else ("", ())
+        with self._lock:
+            per_method = self._db.execute(
+                f"SELECT category, method, SUM(status IN ('ok','fail')), SUM(status='ok'), SUM(status='pruned'), "
+                f"SUM(best), AVG(CASE WHEN status IN ('ok','fail') THEN wall_s END), "
+                f"AVG(CASE WHEN status='ok' THEN iterations END) FROM outcomes {where} "
+                f"GROUP BY category, method ORDER BY category, method", args).fetchall()
+            per_cat = self._db.execute(
+                f"SELECT category, COUNT(DISTINCT run), COUNT(DISTINCT features), SUM(status='pruned'), "
+                f"SUM(predicted_rank=0), SUM(predicted_rank=0 AND best=1) FROM outcomes {where} GROUP BY category",
+                args).fetchall()
+        out: Dict[str, Any] = {}
+        for cat, runs, nfeat, n_pruned, ranked, hits in per_cat:
+            out[cat] = {"runs": runs, "feature_keys": nfeat, "pruned": n_pruned or 0,
+                        "top1_hit_rate": round(hits / ranked, 3) if ranked else None, "methods": {}}
+        for cat, m, n, ok, n_pruned, best, wall, it in per_method:
+            out[cat]["methods"][m] = {"runs": n or 0, "success_rate": round(ok / n, 3) if n else None,
+                                      "pruned": n_pruned or 0, "best": best or 0,
+                                      "mean_wall_s": round(wall, 4) if wall is not None else None,
+                                      "mean_iterations": round(it, 1) if it is not None else None}
+        return out
+
+def main(argv=None):
+    default_db = os.getenv("METHOD_KB_DB", os.path.join(os.getenv("LLM_CACHE_DIR", ".cache"), "method_kb.sqlite"))
+    ap = argparse.ArgumentParser(description="Inspect the method performance knowledge base.")
+    ap.add_argument("--db", default=default_db)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    st = sub.add_parser("stats")
+    st.add_argument("--category", default=None)
+    st.add_argument("--json", action="store_true")
+    cp = sub.add_parser("compact")
+    cp.add_argument("--max-rows", type=int, required=True)
+    args = ap.parse_args(argv)
+    kb = MethodKB(args.db)
+    if args.cmd == "compact":
+        print(json.dumps({"rows_removed": kb.compact(args.max_rows)}))
+        return
+    report = kb.report(args.category)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+    for cat, c in report.items():
+        hit = f"{c['top1_hit_rate']:.0%}" if c["top1_hit_rate"] is not None else "-"
+        print(f"{cat}: {c['runs']} runs, {c['feature_keys']} feature keys, {c['pruned']} pruned, top-1 hit rate {hit}")
+        for m, s in sorted(c["methods"].items(), key=lambda kv: -(kv[1]["success_rate"] or 0)):
+            rate = f"{s['success_rate']:.0%}" if s["success_rate"] is not None else "-"
+            print(f"  {m:<24}{s['runs']:>6} runs  ok {rate:>5}  best {s['best']:>4}  pruned {s['pruned']:>4}  "
+                  f"wall {s['mean_wall_s'] if s['mean_wall_s'] is not None else '-':>8}  it {s['mean_iterations'] or '-'}")
+
+if __name__ == "__main__":
+    main()
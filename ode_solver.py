@@ -0,0 +1,300 @@
+# ode_solver.py
+"""
+In-process, vectorized solvers for the methods in ALGORITHM_MAP["ode_ivp"] (scalar IVPs y' = f(t, y)).
+
+Every method advances a batch: arrays of initial values y0, start / end points and step sizes h
+(broadcast together), so many initial conditions or step sizes run in one loop. Fixed-step methods
+(Euler, RK4, Implicit Euler, BDF) estimate their global error by step doubling (h and h/2 in the same
+batch); without h they halve it until the estimate is below tol. RK45 is Dormand-Prince with per-element
+step-size control. Implicit Euler and BDF (2-step) solve each step by Newton on df/dy, which comes from
+expr_compiler (symbolic when sympy is available).
+run_method() returns the metrics dicts Validator.pick_best uses; parse_ivp() reads f, y(t0) = y0, h and
+the requested point from the task.
+"""
+import json, re, time
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+from expr_compiler import FUNCTIONS, CONSTANTS, try_compile
+
+Array = np.ndarray
+
+# canonical name -> aliases (lowercase, no punctuation), incl. Vietnamese names; matched as whole words
+_ALIASES = {
+    "Euler": ["euler", "explicit euler", "forward euler", "euler hien", "euler hiện", "euler tien", "euler tiến"],
+    "RK4": ["rk4", "runge kutta", "runge kutta 4", "runge kutta bac 4", "runge kutta bậc 4", "classical runge kutta"],
+    "RK45": ["rk45", "rk4 5", "rk 45", "rkf45", "ode45", "dormand prince", "runge kutta fehlberg",
+             "adaptive runge kutta", "runge kutta thich nghi", "runge kutta thích nghi"],
+    "Implicit Euler": ["implicit euler", "backward euler", "euler an", "euler ẩn", "euler lui", "euler lùi"],
+    "BDF": ["bdf", "bdf2", "backward differentiation", "gear"],
+}
+
+ORDERS = {"Euler": 1, "RK4": 4, "Implicit Euler": 1, "BDF": 2}
+_MAX_STEPS = 1 << 20     # tổng số bước tối đa mỗi lần tích phân (h do đề cho)
+_MAX_HALVINGS = 16
+# không có h: tổng số bước và thời gian tối đa cho cả vòng chia đôi h (phương pháp bậc thấp bỏ cuộc sớm)
+_HALVING_MAX_STEPS = 1 << 12
+_HALVING_TIME_S = 0.1
+_NEWTON_ITERS = 25
+
+def match_method(name: str) -> Optional[str]:
+    """Map a free-form method name ('Runge-Kutta bậc 4', 'Backward Euler'...) to a canonical one."""
+    key = re.sub(r"[^\w\s]", " ", (name or "").lower())
+    key = re.sub(r"\s+", " ", key).strip()
+    pairs = sorted(((a, m) for m, al in _ALIASES.items() for a in al), key=lambda p: -len(p[0]))
+    for alias, method in pairs:
+        if re.search(rf"(?<!\w){re.escape(alias)}(?!\w)", key):
+            return method
+    return None
+
+def _num_jac(f: Callable) -> Callable:
+    def jac(t, y):
+        h = 1e-7 * np.maximum(1.0, np.abs(y))
+        return (f(t, y + h) - f(t, y - h)) / (2 * h)
+    return jac
+
+def _prep(*arrays) -> List[Array]:
+    return [x.astype(float).ravel() for x in np.broadcast_arrays(*(np.asarray(v, float) for v in arrays))]
+
+# One step for the rows being advanced: (f, jac, t, y, h, y_prev) -> (y_next, f evaluations per row)
+
+def _euler(f, jac, t, y, h, y_prev):
+    return y + h * f(t, y), 1
+
+def _rk4(f, jac, t, y, h, y_prev):
+    k1 = f(t, y)
+    k2 = f(t + h / 2, y + h / 2 * k1)
+    k3 = f(t + h / 2, y + h / 2 * k2)
+    k4 = f(t + h, y + h * k3)
+    return y + h / 6 * (k1 + 2 * k2 + 2 * k3 + k4), 4
+
+def _newton(f, jac, t1, guess, c, gamma):
+    """Solve Y - gamma * f(t1, Y) = c elementwise; returns (Y, evaluations)."""
+    Y, evals = guess, 0
+    for _ in range(_NEWTON_ITERS):
+        g = Y - gamma * f(t1, Y) - c
+        d = 1 - gamma * jac(t1, Y)
+        evals += 2
+        step = g / np.where(np.abs(d) > 1e-300, d, 1.0)
+        Y = Y - step
+        if np.all(np.abs(step) <= 1e-12 * (1 + np.abs(Y))):
+            break
+    return Y, evals
+
+def _implicit_euler(f, jac, t, y, h, y_prev):
+    fy = f(t, y)
+    Y, evals = _newton(f, jac, t + h, y + h * fy, y, h)
+    return Y, evals + 1
+
+def _bdf2(f, jac, t, y, h, y_prev):
+    if y_prev is None:  # bước đầu: Euler ẩn
+        return _implicit_euler(f, jac, t, y, h, None)
+    guess = 2 * y - y_prev
+    Y, evals = _newton(f, jac, t + h, guess, (4 * y - y_prev) / 3, 2 * h / 3)
+    return Y, evals
+
+_STEPS = {"Euler": _euler, "RK4": _rk4, "Implicit Euler": _implicit_euler, "BDF": _bdf2}
+
+def integrate_fixed(method: str, f: Callable, t0, y0, t1, h, jac: Optional[Callable] = None) -> Dict[str, Array]:
+    """
+    Fixed-step integration of a batch; h is adjusted per row so that t1 is hit exactly.
+    Returns arrays: y (at t1), steps, h (used), evaluations.
+    """
+    step = _STEPS[method]
+    jac = jac or _num_jac(f)
+    t0, y0, t1, h = _prep(t0, y0, t1, h)
+    n = np.maximum(1, np.round(np.abs(t1 - t0) / np.abs(h))).astype(int)
+    if n.sum() > _MAX_STEPS:
+        raise ValueError(f"too many steps ({int(n.sum())})")
+    h = (t1 - t0) / n
+    t, y = t0.copy(), y0.copy()
+    prev = np.full(y.shape, np.nan)
+    evals = np.zeros(y.shape, int)
+    with np.errstate(all="ignore"):
+        for k in range(int(n.max())):
+            i = np.nonzero(k < n)[0]
+            all_rows = i.size == y.size
+            ti, yi, hi = (t, y, h) if all_rows else (t[i], y[i], h[i])
+            y_new, e = step(f, jac, ti, yi, hi, None if k == 0 else (prev if all_rows else prev[i]))
+            if all_rows:
+                prev, y, t = y, np.asarray(y_new, float), t + h
+            else:
+                prev[i], y[i], t[i] = yi, y_new, ti + hi
+            evals[i] += e
+    return {"y": y, "steps": n, "h": h, "evaluations": evals}
+
+# Dormand-Prince 5(4)
+_DP_C = np.array([0, 1 / 5, 3 / 10, 4 / 5, 8 / 9, 1, 1])
+_DP_A = [[], [1 / 5], [3 / 40, 9 / 40], [44 / 45, -56 / 15, 32 / 9],
+         [19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729],
+         [9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656],
+         [35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84]]
+_DP_E = np.array([71 / 57600, 0, -71 / 16695, 71 / 1920, -17253 / 339200, 22 / 525, -1 / 40])
+
+def rk45(f: Callable, t0, y0, t1, tol=1e-8, h0=None, max_steps: int = 100000) -> Dict[str, Array]:
+    """
+    Dormand-Prince with per-row step-size control (rtol = atol = tol, FSAL).
+    Returns arrays: y, steps (accepted), rejected, error (sum of local error estimates), evaluations, converged.
+    """
+    t0, y0, t1 = _prep(t0, y0, t1)
+    span = t1 - t0
+    direction = np.where(span < 0, -1.0, 1.0)
+    h = np.abs(np.asarray(h0, float)) * np.ones_like(span) if h0 is not None else np.maximum(np.abs(span) / 100, 1e-12)
+    t, y = t0.copy(), y0.copy()
+    steps, rejected, evals = np.zeros(y.shape, int), np.zeros(y.shape, int), np.ones(y.shape, int)
+    err_sum = np.zeros(y.shape)
+    with np.errstate(all="ignore"):
+        k1 = np.asarray(f(t, y), float) * np.ones_like(y)
+        for _ in range(max_steps):
+            i = np.nonzero((np.abs(t1 - t) > 1e-12 * np.maximum(1.0, np.abs(t1))) & np.isfinite(y))[0]
+            if i.size == 0:
+                break
+            ti, yi = t[i], y[i]
+            hi = direction[i] * np.minimum(h[i], np.abs(t1[i] - ti))
+            k = [k1[i]]
+            for s in range(1, 7):
+                k.append(f(ti + _DP_C[s] * hi, yi + hi * sum(a * kj for a, kj in zip(_DP_A[s], k))))
+            y5 = yi + hi * sum(a * kj for a, kj in zip(_DP_A[6], k))
+            err = np.abs(hi * sum(e * kj for e, kj in zip(_DP_E, k)))
+            scale = tol + tol * np.maximum(np.abs(yi), np.abs(y5))
+            ratio = err / scale
+            ok = ratio <= 1
+            evals[i] += 6
+            acc = i[ok]
+            t[acc], y[acc], k1[acc] = ti[ok] + hi[ok], y5[ok], k[6][ok]
+            err_sum[acc] += err[ok]
+            steps[acc] += 1
+            rejected[i[~ok]] += 1
+            factor = np.clip(0.9 * np.where(ratio > 0, ratio, 1e-10) ** -0.2, 0.2, 5.0)
+            h[i] = np.abs(hi) * np.where(np.isfinite(factor), factor, 0.2)
+    done = np.abs(t1 - t) <= 1e-12 * np.maximum(1.0, np.abs(t1))
+    return {"y": y, "steps": steps, "rejected": rejected, "error": err_sum, "evaluations": evals,
+            "converged": done & np.isfinite(y)}
+
+def solve(method: str, f: Callable, t0, y0, t1, h=None, tol=1e-8, maxiter: int = _MAX_HALVINGS,
+          jac: Optional[Callable] = None) -> Dict[str, Array]:
+    """
+    Batched IVP solve. Returns arrays: y, error (estimate), steps, h, evaluations, converged.
+    Fixed-step methods with h report the step-doubling estimate for that h; without h they halve
+    (t1 - t0) / 10 until the estimate is below tol (at most `maxiter` halvings, _HALVING_MAX_STEPS
+    steps and _HALVING_TIME_S seconds in total; rows still above tol are reported as not converged).
+    """
+    name = match_method(method)
+    if name is None:
+        raise ValueError(f"unsupported ode_ivp method: {method}")
+    if name == "RK45":
+        out = rk45(f, t0, y0, t1, tol, h0=h)
+        return {"y": out["y"], "error": out["error"], "steps": out["steps"], "h": np.full(out["y"].shape, np.nan),
+                "evaluations": out["evaluations"], "converged": out["converged"]}
+    p = ORDERS[name]
+    if h is not None:
+        t0, y0, t1, h = _prep(t0, y0, t1, h)
+        # h và h/2 trong cùng một batch
+        out = integrate_fixed(name, f, np.tile(t0, 2), np.tile(y0, 2), np.tile(t1, 2), np.concatenate([h, h / 2]), jac)
+        m = t0.size
+        y, fine = out["y"][:m], out["y"][m:]
+        err = np.abs(fine - y) * 2 ** p / (2 ** p - 1)
+        return {"y": y, "error": err, "steps": out["steps"][:m], "h": out["h"][:m],
+                "evaluations": out["evaluations"][:m] + out["evaluations"][m:], "converged": np.isfinite(y)}
+    t0, y0, t1 = _prep(t0, y0, t1)
+    m = t0.size
+    y, err = np.full(m, np.nan), np.full(m, np.inf)
+    steps, hs, evals, conv = np.zeros(m, int), np.full(m, np.nan), np.zeros(m, int), np.zeros(m, bool)
+    idx, hk = np.arange(m), (t1 - t0) / 10
+    deadline = time.perf_counter() + _HALVING_TIME_S
+    coarse = integrate_fixed(name, f, t0, y0, t1, hk, jac)
+    prev = coarse["y"]
+    evals += coarse["evaluations"]
+    used = int(coarse["steps"].sum())
+    for _ in range(min(maxiter, _MAX_HALVINGS)):
+        hk = hk / 2
+        need = int(np.sum(np.maximum(1, np.round(np.abs(t1[idx] - t0[idx]) / np.abs(hk)))))
+        if used + need > _HALVING_MAX_STEPS or time.perf_counter() > deadline:
+            break
+        used += need
+        out = integrate_fixed(name, f, t0[idx], y0[idx], t1[idx], hk, jac)
+        cur = out["y"]
+        e = np.abs(cur - prev) / (2 ** p - 1)
+        y[idx], err[idx], steps[idx], hs[idx] = cur, e, out["steps"], out["h"]
+        evals[idx] += out["evaluations"]
+        done = (e <= tol) | ~np.isfinite(cur)
+        conv[idx[done]] = np.isfinite(cur[done])
+        keep = ~done
+        idx, hk, prev = idx[keep], hk[keep], cur[keep]
+        if idx.size == 0:
+            break
+    return {"y": y, "error": err, "steps": steps, "h": hs, "evaluations": evals, "converged": conv}
+
+def run_method(method: str, f: Callable, t0, y0, t1, h=None, tol=1e-8, maxiter: int = _MAX_HALVINGS,
+               jac: Optional[Callable] = None) -> List[dict]:
+    """One metrics dict per batch element; `result` is y(t1), `residual` the global error estimate."""
+    try:
+        out = solve(method, f, t0, y0, t1, h, tol, maxiter, jac)
+    except (ValueError, ZeroDivisionError, FloatingPointError) as e:
+        n = np.broadcast(np.asarray(t0), np.asarray(y0), np.asarray(t1)).size
+        return [{"method": method, "success": False, "iterations": None, "result": None, "residual": None,
+                 "engine": "native", "error": str(e)} for _ in range(n)]
+    results = []
+    for i in range(out["y"].size):
+        r = {"method": method, "success": bool(out["converged"][i]), "iterations": int(out["steps"][i]),
+             "result": float(out["y"][i]), "residual": float(out["error"][i]),
+             "evaluations": int(out["evaluations"][i]), "engine": "native"}
+        if np.isfinite(out["h"][i]):
+            r["h"] = float(out["h"][i])
+        if not np.isfinite(r["result"]) or not np.isfinite(r["residual"]):
+            r.update({"success": False, "result": None, "residual": None, "error": "non-finite"})
+        elif not r["success"]:
+            r["error"] = f"error estimate {r['residual']:.3g} above tol {tol:g}"
+        results.append(r)
+    return results
+
+# ---- task text -> IVP ----
+
+_NUM = r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?"
+
+def make_rhs(expr: str, dependent: str = "y", independent: str = "x") -> Optional[Tuple[Callable, Callable]]:
+    """(f(t, y), df/dy(t, y)) from a short_form such as 'y - x**2 + 1' (or "y' = ..."); None if it does not compile."""
+    expr = re.sub(rf"^\s*(?:{dependent}\s*'|d{dependent}\s*/\s*d{independent})\s*=", "", expr or "")
+    c = try_compile(expr, (dependent, independent))
+    if c is None:
+        return None
+    return (lambda t, y: c.f(y, t)), (lambda t, y: c.df(y, t))
+
+def parse_ivp(task_text: str, short_form: Optional[str], domain_hint: Optional[str] = None) -> Optional[dict]:
+    """{'f', 'jac', 't0', 'y0', 't1', 'h', 'dependent', 'independent'} from the task and the classifier output."""
+    from root_solver import parse_interval
+    text = task_text or ""
+    ic = re.search(rf"(?<!\w)([A-Za-z])\s*\(\s*({_NUM})\s*\)\s*=\s*({_NUM})", text)
+    dep = ic.group(1) if ic else "y"
+    names = set(re.findall(r"(?<![\w.])([A-Za-z_]\w*)", short_form or "")) - set(FUNCTIONS) - set(CONSTANTS) - {dep}
+    m = re.search(rf"d{dep}\s*/\s*d([A-Za-z])", text)
+    indep = m.group(1) if m else ("t" if "t" in names else "x")
+    rhs = make_rhs(short_form, dep, indep)
+    if rhs is None or ic is None:
+        return None
+    t0, y0 = float(ic.group(2)), float(ic.group(3))
+    # điểm cần tính: y(T) cuối cùng không phải điều kiện đầu, hoặc cận phải của domain_hint
+    targets = [float(x) for x in re.findall(rf"(?<!\w){dep}\s*\(\s*({_NUM})\s*\)(?!\s*=)", text)]
+    targets = [x for x in targets if x != t0]
+    dom = parse_interval(domain_hint)
+    t1 = targets[-1] if targets else (dom[1] if dom and dom[1] != t0 else None)
+    if t1 is None:
+        return None
+    h = re.search(rf"(?<!\w)h\s*=\s*({_NUM})", text)
+    n = re.search(r"(?<!\w)(?:n|N)\s*=\s*(\d+)", text)
+    step = float(h.group(1)) if h else ((t1 - t0) / int(n.group(1)) if n and int(n.group(1)) > 0 else None)
+    return {"f": rhs[0], "jac": rhs[1], "t0": t0, "y0": y0, "t1": t1, "h": step,
+            "dependent": dep, "independent": indep}
+
+if __name__ == "__main__":
+    import time
+    f, jac = make_rhs("y - x**2 + 1")
+    y0 = np.linspace(0.0, 1.0, 1000)  # 1000 điều kiện đầu trong một lần gọi
+    exact = lambda y0: (2 + 1) ** 2 - (1 - y0) * np.exp(2)  # y = (x+1)^2 - (1 - y0) e^x
+    for name in list(ORDERS) + ["RK45"]:
+        t = time.perf_counter()
+        out = solve(name, f, 0.0, y0, 2.0, tol=1e-6, jac=jac)
+        print(f"{name:<16}{(time.perf_counter() - t) * 1000:8.2f} ms  converged={out['converged'].mean():.2f}  "
+              f"max_abs_err={np.nanmax(np.abs(out['y'] - exact(y0))):.2e}  max_est={np.nanmax(out['error']):.2e}")
+    ivp = parse_ivp("Giải phương trình vi phân y' = y - x**2 + 1, y(0) = 0.5 bằng phương pháp Runge-Kutta bậc 4 "
+                    "với bước h = 0.2, tính y(2).", "y - x**2 + 1", "(0,2)")
+    print(json.dumps(run_method("RK4", ivp["f"], ivp["t0"], ivp["y0"], ivp["t1"], ivp["h"], jac=ivp["jac"])[0]))
@@ -1,21 +1,30 @@
 # planner.py
 import textwrap, re, json
-from settings import LLM
+from settings import get_cached_llm
 from pydantic import BaseModel, Field
 
 class Plan(BaseModel):
     steps: list[str] = Field(...)
 
-def make_plan(task_summary: str, method_name: str) -> Plan:
-    prompt = textwrap.dedent(f"""
+def _plan_prompt(task_summary: str, method_name: str) -> str:
+    return textwrap.dedent(f"""
     Bạn là một nhà nghiên cứu toán học có khả năng giải quyết các bài toán phức tạp theo từng bước. Dựa trên:
     {task_summary}
     Thuật toán: {method_name}
     Hãy trả về JSON: {{ "steps": [ "step1", "step2", ... ] }}
     Mỗi step phải đủ để thực thi (input/output và nếu cần RUN_CODE).
     """)
-    r = LLM.invoke(prompt)
-    content = getattr(r, "content", str(r)).strip()
+
+def make_plan(task_summary: str, method_name: str) -> Plan:
+    r = get_cached_llm().invoke(_plan_prompt(task_summary, method_name))
+    return _parse_plan(getattr(r, "content", str(r)).strip())
+
+async def amake_plan(task_summary: str, method_name: str) -> Plan:
+    """Async make_plan (non-blocking LLM call)."""
+    r = await get_cached_llm().ainvoke(_plan_prompt(task_summary, method_name))
+    return _parse_plan(getattr(r, "content", str(r)).strip())
+
+def _parse_plan(content: str) -> Plan:
     m = re.search(r"\{.*\}", content, re.S)
     if m:
         try:
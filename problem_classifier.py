@@ -1,16 +1,17 @@
 # problem_classifier.py
 import textwrap, re, json
-from settings import LLM
+from typing import Dict, List, Optional, Tuple
+from settings import get_cached_llm, CLASSIFY_RULE_THRESHOLD
+from algorithm_map import ALGORITHM_MAP
+from expr_compiler import FUNCTIONS, CONSTANTS, check_expr, evaluate_constant
+from instrumentation import count
 
-def classify_task(task_text: str) -> dict:
-    """
-    Return minimal classification but ALWAYS preserve original_task.
-    Keys: category, short_form, domain_hint, notes, original_task
-    """
-    prompt = textwrap.dedent(f"""
+def _classify_prompt(task_text: str) -> str:
+    categories = "|".join(f"'{c}'" for c in list(ALGORITHM_MAP) + ["other"])
+    return textwrap.dedent(f"""
     Bạn là chuyên gia toán và lập trình. Đọc đề bài sau (nguyên văn).
     Trả về MỘT KHỐI JSON gồm:
-      - category: 'root_finding'|'linear_system'|'integration'|'ode_ivp'|'pde'|'optimization_unconstrained'|'other'
+      - category: {categories}
       - short_form: biểu thức Python tóm tắt nếu có (vd 'x**3 - x - 1') hoặc null
       - domain_hint: ví dụ '(1,2)' hoặc null
       - notes: ghi chú ngắn (tiếng Việt)
@@ -18,8 +19,31 @@ def classify_task(task_text: str) -> dict:
     Đề bài:
     {task_text}
     """)
-    resp = LLM.invoke(prompt)
-    content = getattr(resp, "content", str(resp)).strip()
+
+def classify_task(task_text: str) -> dict:
+    """
+    Return minimal classification but ALWAYS preserve original_task.
+    Keys: category, short_form, domain_hint, notes, original_task, classifier ('rules'|'llm'|'fallback'), confidence
+    The rule-based classifier answers alone when its confidence >= CLASSIFY_RULE_THRESHOLD (no LLM call).
+    """
+    rules = rule_classify(task_text)
+    if rules["confidence"] >= CLASSIFY_RULE_THRESHOLD:
+        count("classify_rules")
+        return rules
+    resp = get_cached_llm().invoke(_classify_prompt(task_text))
+    return _parse_classification(getattr(resp, "content", str(resp)).strip(), task_text, rules)
+
+async def aclassify_task(task_text: str) -> dict:
+    """Async classify_task (non-blocking LLM call)."""
+    rules = rule_classify(task_text)
+    if rules["confidence"] >= CLASSIFY_RULE_THRESHOLD:
+        count("classify_rules")
+        return rules
+    resp = await get_cached_llm().ainvoke(_classify_prompt(task_text))
+    return _parse_classification(getattr(resp, "content", str(resp)).strip(), task_text, rules)
+
+def _parse_classification(content: str, task_text: str, rules: Optional[dict] = None) -> dict:
+    rules = rules or rule_classify(task_text)
     # try parse JSON block
     m = re.search(r"\{.*\}", content, re.S)
     if m:
@@ -30,30 +54,271 @@ def classify_task(task_text: str) -> dict:
             data.setdefault("domain_hint", None)
             data.setdefault("notes", "")
             data["original_task"] = data.get("original_task") or task_text
+            data["classifier"] = "llm"
+            data["confidence"] = rules["confidence"]  # độ tin cậy của luật (để theo dõi ngưỡng)
+            count("classify_llm")
             return data
         except Exception:
             pass
-    # fallback heuristics but keep original_task
-    lower = task_text.lower()
-    if "tích phân" in lower or "integral" in lower:
-        cat = "integration"
-    elif "hệ phương trình" in lower or "ma trận" in lower:
-        cat = "linear_system"
-    elif "phương trình vi phân" in lower or "ode" in lower:
-        cat = "ode_ivp"
-    elif "pde" in lower:
-        cat = "pde"
-    elif "tìm nghiệm" in lower or "= 0" in lower or "giải phương trình" in lower:
-        cat = "root_finding"
-    elif "tối ưu" in lower or "cực trị" in lower:
-        cat = "optimization_unconstrained"
-    else:
-        cat = "other"
-    # simple short_form/domain extraction
-    short = None
-    dm = re.search(r"\(([0-9\.\-]+)\s*,\s*([0-9\.\-]+)\)", task_text)
-    dom = f"({dm.group(1)},{dm.group(2)})" if dm else None
-    m2 = re.search(r"(.+?)=\s*0", task_text)
-    if m2:
-        short = m2.group(1).strip().replace("^","**")
-    return {"category":cat,"short_form":short,"domain_hint":dom,"notes":"fallback","original_task":task_text}
\ No newline at end of file
+    # fallback: kết quả của bộ phân loại theo luật
+    count("classify_fallback")
+    return dict(rules, classifier="fallback")
+
+# ---- rule-based classifier ----
+# keyword index: normalized keyword -> [(category, weight)]; one precompiled alternation finds them all.
+# weight 3: names the problem; 2: method / strong hint; 1: weak hint. Each keyword counts once per task.
+
+_KEYWORDS: Dict[str, Dict[int, List[str]]] = {
+    "root_finding": {
+        3: ["tìm nghiệm", "nghiệm gần đúng", "khoảng phân ly", "phân ly nghiệm", "nghiệm dương", "nghiệm âm",
+            "nghiệm thực", "nghiệm của phương trình", "find the root", "root of", "roots of", "zero of", "zeros of"],
+        2: ["phương trình phi tuyến", "nonlinear equation", "dây cung", "chia đôi", "tiếp tuyến", "lặp đơn",
+            "cát tuyến", "điểm bất động", "newton", "brent", "bisection"],
+        1: ["giải phương trình", "solve the equation"],
+    },
+    "linear_system": {
+        3: ["hệ phương trình", "hệ phương trình tuyến tính", "system of linear equations", "linear system",
+            "hệ tuyến tính", "ma trận hệ số", "ax = b", "ax=b"],
+        2: ["khử gauss", "phân rã lu", "lặp seidel", "gauss seidel", "gauss jordan", "giảm dư"],
+        1: ["ma trận", "matrix", "ẩn số"],
+    },
+    "integration": {
+        3: ["tích phân", "integral", "integrate", "∫", "quadrature", "cầu phương"],
+        2: ["hình thang", "trapezoidal"],
+    },
+    "differentiation": {
+        3: ["đạo hàm", "derivative", "differentiate", "vi phân số"],
+        2: ["sai phân tiến", "sai phân trung tâm", "sai phân lùi", "ngoại suy richardson"],
+    },
+    "ode_ivp": {
+        3: ["phương trình vi phân", "giải phương trình vi phân", "differential equation", "ode", "bài toán cauchy",
+            "giá trị đầu", "điều kiện đầu", "initial value", "ivp", "logistic"],
+        2: ["runge kutta", "runge kutta bậc 4", "euler ẩn", "euler hiện", "euler cải tiến", "heun"],
+    },
+    "ode_bvp": {
+        4: ["bài toán biên", "điều kiện biên", "boundary value", "bvp", "boundary condition", "boundary conditions"],
+        2: ["bắn", "shooting"],
+    },
+    "pde": {
+        5: ["đạo hàm riêng", "phương trình đạo hàm riêng", "partial differential", "pde"],
+        3: ["phương trình nhiệt", "heat equation", "phương trình truyền nhiệt", "phương trình sóng", "wave equation",
+            "phương trình laplace", "laplace equation", "phương trình poisson", "poisson equation", "∂"],
+    },
+    "optimization_unconstrained": {
+        3: ["cực tiểu", "cực đại", "cực trị", "tối ưu", "tối thiểu hóa", "cực tiểu hóa", "minimize", "maximize",
+            "minimum of", "maximum of", "optimization", "optimize", "giá trị nhỏ nhất", "giá trị lớn nhất"],
+        2: ["gradient descent", "hạ gradient", "suy giảm gradient"],
+    },
+    "optimization_constrained": {
+        4: ["ràng buộc", "constraint", "constraints", "subject to", "s.t."],
+        2: ["nhân tử lagrange", "lagrange multiplier", "lagrange multipliers", "quy hoạch"],
+    },
+    "approximation": {
+        3: ["nội suy", "interpolation", "interpolate", "xấp xỉ hàm", "bình phương tối thiểu", "least squares",
+            "đa thức xấp xỉ", "hồi quy", "regression", "fit"],
+        2: ["lagrange", "newton tiến", "newton lùi", "spline bậc ba", "cubic spline"],
+    },
+    "eigen": {
+        4: ["trị riêng", "giá trị riêng", "vectơ riêng", "véc tơ riêng", "vector riêng", "eigenvalue", "eigenvalues",
+            "eigenvector", "eigenvectors", "eigen"],
+        2: ["lũy thừa", "power iteration"],
+    },
+    "stochastic": {
+        3: ["ngẫu nhiên", "random", "stochastic", "xác suất", "probability", "mô phỏng", "simulation", "markov"],
+    },
+}
+
+def _norm_kw(s: str) -> str:
+    return re.sub(r"[\s\-]+", " ", s.lower()).strip()
+
+def _build_index() -> Dict[str, List[Tuple[str, float]]]:
+    index: Dict[str, Dict[str, float]] = {}
+    for cat, tiers in _KEYWORDS.items():
+        for weight, words in tiers.items():
+            for w in words:
+                index.setdefault(_norm_kw(w), {})[cat] = max(weight, index.get(_norm_kw(w), {}).get(cat, 0))
+    # tên phương pháp trong ALGORITHM_MAP: trọng số 2, chia đều nếu thuộc nhiều category (vd Monte Carlo);
+    # từ khóa đã khai báo ở _KEYWORDS (vd 'newton' -> root_finding) giữ nguyên
+    owners: Dict[str, List[str]] = {}
+    for cat, methods in ALGORITHM_MAP.items():
+        for m in methods:
+            owners.setdefault(_norm_kw(m), []).append(cat)
+    for key, cats in owners.items():
+        if key in index:
+            continue
+        for cat in cats:
+            index.setdefault(key, {}).setdefault(cat, 2.0 / len(cats))
+    return {k: sorted(v.items()) for k, v in index.items()}
+
+_INDEX = _build_index()
+_KEYWORD_RE = re.compile(r"(?<!\w)(?:" + "|".join(
+    r"[\s\-]+".join(re.escape(part) for part in k.split(" ")) for k in sorted(_INDEX, key=len, reverse=True)) + r")(?!\w)", re.I)
+
+_RUN = r"[A-Za-z0-9_.\s+\-*/^()]"
+_LEFT_RUN = re.compile(_RUN + r"*$")
+_RIGHT_RUN = re.compile(_RUN + r"*")
+_EQUALS = re.compile(r"(?<![<>=!])=(?!=)")
+_NUM = r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?"
+_BOUND = r"[-+]?[\w.*/()]+?"
+_INTERVAL = re.compile(rf"[\[(]\s*({_BOUND})\s*[,;]\s*({_BOUND})\s*[\])]"
+                       rf"|(?<!\w)(?:từ|from)\s+({_BOUND})\s+(?:đến|tới|to)\s+({_BOUND})(?![\w.])", re.I)
+_ODE = re.compile(r"(?<![\w'])([A-Za-z])\s*'\s*(?:\(\s*([A-Za-z])\s*\))?\s*=|(?<!\w)d([A-Za-z])\s*/\s*d([A-Za-z])\s*=")
+_INTEGRAND = re.compile(r"(?:tích phân|integral|integrate|∫)(?:\s*_\{?([^\s^}]+)\}?\s*\^\{?([^\s}]+)\}?)?", re.I)
+_VI_WORD = re.compile(r"\w*[^\W\d_A-Za-z]\w*")  # từ có chữ ngoài ASCII ('của', 'trình'): không thuộc biểu thức
+_SKIP_NAMES = set(FUNCTIONS) | set(CONSTANTS) | {"np", "numpy", "math"}
+_NEEDS_EXPR = ("root_finding", "integration", "ode_ivp")
+_NEEDS_SPAN = ("integration", "ode_ivp")  # engine native không chạy được khi thiếu cận / khoảng
+
+def _free_names(expr: str) -> set:
+    return set(re.findall(r"(?<![\w.])([A-Za-z_]\w*)(?!\w)(?!\s*\()", expr)) - _SKIP_NAMES
+
+def _compile(expr: str, allowed: Optional[Tuple[str, ...]] = None, max_vars: int = 1):
+    """Normalized `expr` if it only uses single-letter variables (from `allowed` when given), else None."""
+    names = _free_names(expr)
+    if len(names) > max_vars or any(len(n) != 1 for n in names) or (allowed and not names <= set(allowed)):
+        return None
+    return check_expr(expr, tuple(allowed) if allowed else (tuple(sorted(names)) or ("x",)))
+
+def _longest_expr(run: str, allowed: Optional[Tuple[str, ...]] = None, max_vars: int = 1,
+                  need_var: bool = True) -> Optional[str]:
+    """Longest whitespace-token window of `run` that compiles (drops surrounding words such as 'nh', 'dx', 'tr')."""
+    tokens = run.strip().rstrip(".,;:").split()[:30]
+    for size in range(len(tokens), 0, -1):
+        for i in range(len(tokens) - size + 1):
+            s = " ".join(tokens[i:i + size]).rstrip(".")
+            c = _compile(s, allowed, max_vars)
+            if c is not None and (not need_var or _free_names(s)):
+                return c
+    return None
+
+def _fmt(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+def _domain(a: float, b: float) -> str:
+    return f"({_fmt(a)},{_fmt(b)})"
+
+def _intervals(text: str) -> List[Tuple[float, float]]:
+    out = []
+    for m in _INTERVAL.finditer(text):
+        lo, hi = (g for g in m.groups() if g is not None)
+        a, b = evaluate_constant(lo), evaluate_constant(hi)
+        if a is not None and b is not None and a < b:
+            out.append((a, b))
+    return out
+
+def _root_equation(text: str) -> Optional[str]:
+    """First 'lhs = rhs' in one variable -> 'lhs' (rhs = 0) or 'lhs - (rhs)'; 'f(x) = expr' -> 'expr'."""
+    for m in _EQUALS.finditer(text):
+        before, after = text[:m.start()], text[m.end():]
+        rhs = _longest_expr(_RIGHT_RUN.match(after).group(0), need_var=False)
+        if rhs is None:
+            continue
+        fx = re.search(r"(?<!\w)[A-Za-z]\s*\(\s*([A-Za-z])\s*\)\s*$", before)
+        if fx and _free_names(rhs) <= {fx.group(1)} and _free_names(rhs):
+            return rhs  # 'f(x) = ...'
+        lhs = _longest_expr(_LEFT_RUN.search(before).group(0), need_var=False)
+        if lhs is None:
+            continue
+        names = _free_names(lhs) | _free_names(rhs)
+        if len(names) != 1 or (re.fullmatch(r"[A-Za-z_]\w*", lhs.strip()) and not _free_names(rhs)):
+            continue  # tham số kiểu 'h = 0.2', 'n = 10'
+        return lhs if evaluate_constant(rhs) == 0 else f"{lhs} - ({rhs})"
+    return None
+
+def _integrand(text: str) -> Tuple[Optional[str], Optional[Tuple[float, float]]]:
+    """Integrand and limits; every match is scanned ('tích phân ∫_0^1 ...': the limits sit on the second one)."""
+    short, limits = None, None
+    for m in _INTEGRAND.finditer(text):
+        lim = None
+        if m.group(1) and m.group(2):
+            a, b = evaluate_constant(m.group(1)), evaluate_constant(m.group(2))
+            lim = (a, b) if a is not None and b is not None else None
+        window = _VI_WORD.sub(" | ", text[m.end():m.end() + 160])
+        window = re.split(r"(?<!\w)(?:trên|đoạn|khoảng|from|over|on|between|với|bằng|using|with)(?!\w)|[\[,;:]", window)[0]
+        runs = [r for r in re.findall(_RUN + r"+", window) if r.strip()]
+        exprs = [e for e in (_longest_expr(r) for r in runs) if e]
+        expr = max(exprs, key=len) if exprs else None
+        if lim is not None and expr is not None:
+            return expr, lim
+        short, limits = short or expr, limits or lim
+    return short, limits
+
+def _ode(text: str) -> Tuple[Optional[str], Optional[Tuple[float, float]]]:
+    m = _ODE.search(text)
+    if not m:
+        return None, None
+    dep = m.group(1) or m.group(3)
+    indep = m.group(2) or m.group(4)
+    run = _RIGHT_RUN.match(text[m.end():]).group(0)
+    names = _free_names(run) - {dep}
+    indep = indep or ("t" if "t" in names else "x")
+    rhs = _longest_expr(run, allowed=(dep, indep), max_vars=2, need_var=False)
+    ic = re.search(rf"(?<!\w){dep}\s*\(\s*({_NUM})\s*\)\s*=\s*({_NUM})", text)
+    if ic is None:
+        return rhs, None
+    t0 = float(ic.group(1))
+    targets = [float(x) for x in re.findall(rf"(?<!\w){dep}\s*\(\s*({_NUM})\s*\)(?!\s*=)", text)]
+    targets = [x for x in targets if x != t0]
+    if targets:
+        return rhs, (t0, targets[-1])
+    spans = [iv for iv in _intervals(text) if iv[0] == t0]
+    return rhs, spans[0] if spans else None
+
+def keyword_scores(task_text: str) -> Dict[str, float]:
+    """Category -> score from the keyword index (each distinct keyword once)."""
+    scores: Dict[str, float] = {}
+    for key in {_norm_kw(m.group(0)) for m in _KEYWORD_RE.finditer(task_text)}:
+        for cat, w in _INDEX.get(key, ()):
+            scores[cat] = scores.get(cat, 0.0) + w
+    return scores
+
+def rule_classify(task_text: str) -> dict:
+    """
+    Deterministic classification: keyword index + structural cues (y' = ..., '... = 0', linear equations,
+    ∫), then short_form / domain_hint extraction for the winning category.
+    confidence = (1 - runner-up / best) * min(1, best / 5), halved when the expression a native engine
+    needs (root_finding / integration / ode_ivp) could not be extracted, and again when integration /
+    ode_ivp has no span (limits / y(t0) -> t1), so the LLM supplies them.
+    """
+    text = task_text or ""
+    plain = _VI_WORD.sub(" | ", text)
+    scores = keyword_scores(text)
+    ode_rhs, ode_span = _ode(plain)
+    if ode_rhs is not None:
+        scores["ode_ivp"] = scores.get("ode_ivp", 0.0) + 4
+        # hai điều kiện ở hai điểm khác nhau: bài toán biên
+        conds = {float(x) for x in re.findall(rf"(?<!\w)[A-Za-z]\s*\(\s*({_NUM})\s*\)\s*=", text)}
+        if len(conds) >= 2:
+            scores["ode_bvp"] = scores.get("ode_bvp", 0.0) + 6
+    from linear_solver import parse_linear_system
+    linear = ode_rhs is None and parse_linear_system(text) is not None
+    if linear:
+        scores["linear_system"] = scores.get("linear_system", 0.0) + 4
+    equation = None if ode_rhs is not None or linear else _root_equation(plain)
+    if equation is not None:
+        scores["root_finding"] = scores.get("root_finding", 0.0) + 2
+    ranked = sorted(scores.items(), key=lambda kv: -kv[1])
+    if not ranked:
+        return {"category": "other", "short_form": None, "domain_hint": None, "notes": "rules: no keyword",
+                "original_task": task_text, "classifier": "rules", "confidence": 0.0}
+    category, best = ranked[0]
+    second = ranked[1][1] if len(ranked) > 1 else 0.0
+    confidence = (1 - second / best) * min(1.0, best / 5)
+    short, span = None, None
+    if category == "root_finding":
+        short = equation
+        spans = _intervals(text)
+        span = spans[0] if spans else None
+    elif category == "integration":
+        short, span = _integrand(text)
+        spans = _intervals(text)
+        span = span or (spans[0] if spans else None)
+    elif category == "ode_ivp":
+        short, span = ode_rhs, ode_span
+    if category in _NEEDS_EXPR and short is None:
+        confidence *= 0.5
+    if category in _NEEDS_SPAN and span is None:
+        confidence *= 0.5
+    return {"category": category, "short_form": short, "domain_hint": _domain(*span) if span else None,
+            "notes": "rules: " + ", ".join(f"{c}={s:g}" for c, s in ranked[:3]), "original_task": task_text,
+            "classifier": "rules", "confidence": round(confidence, 3)}
@@ -0,0 +1,382 @@
+# quadrature.py
+"""
+In-process, vectorized quadrature for the methods in ALGORITHM_MAP["integration"].
+
+Every method integrates a batch: arrays of intervals (a, b) and an integrand `f` that accepts 2-D arrays
+(one row per batch element), or a list of callables, one per row. Trapezoid / Simpson / Gaussian
+Quadrature use `n` (subintervals / nodes) when given and report the n-vs-2n error estimate; without it
+they double n until the estimate is below tol (only the new midpoints are evaluated). Romberg keeps its
+trapezoid column per integrand and interval in an LRU, so a later call with a tighter tol only adds levels;
+Gauss-Legendre nodes are cached per n. Adaptive Quadrature is adaptive Simpson over all open panels of
+the batch at once; Monte Carlo reports its standard error.
+run_method() returns the metrics dicts Validator.pick_best uses; parse_quadrature() reads f, [a, b], n, tol.
+"""
+import json, re
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+import numpy as np
+from expr_compiler import FUNCTIONS, CONSTANTS, evaluate_constant, try_compile
+
+Array = np.ndarray
+Integrand = Union[Callable, Sequence[Callable]]
+
+# canonical name -> aliases (lowercase, no punctuation), incl. Vietnamese names; matched as whole words
+_ALIASES = {
+    "Trapezoid": ["trapezoid", "trapezoidal", "trapz", "hinh thang", "hình thang"],
+    "Simpson": ["simpson", "simpson 1 3", "simpson 3 8"],
+    "Romberg": ["romberg"],
+    "Adaptive Quadrature": ["adaptive quadrature", "adaptive simpson", "adaptive", "thich nghi", "thích nghi", "quad"],
+    "Gaussian Quadrature": ["gaussian quadrature", "gauss quadrature", "gauss legendre", "gaussian", "gauss",
+                            "cau phuong gauss", "cầu phương gauss"],
+    "Monte Carlo": ["monte carlo", "montecarlo"],
+}
+
+_MAX_LEVEL = 20          # n tối đa 2^20 khi nhân đôi
+_ROMBERG_LEVELS = 16     # tableau tối đa 2^16 + 1 điểm
+_ROMBERG_CACHE = 32      # số (integrand, interval) giữ cột trapezoid
+_ADAPTIVE_PANELS = 1 << 18
+_MC_SAMPLES = 1 << 16    # mẫu mặc định / kích thước chunk
+_MC_MAX = 1 << 22        # mẫu tối đa mỗi tích phân
+_MC_BUDGET = 1 << 22     # tổng số lần gọi f cho cả batch
+_GAUSS_MAX = 1024
+
+def match_method(name: str) -> Optional[str]:
+    """Map a free-form method name ('Công thức hình thang', 'Gauss-Legendre 5 điểm'...) to a canonical one."""
+    key = re.sub(r"[^\w\s]", " ", (name or "").lower())
+    key = re.sub(r"\s+", " ", key).strip()
+    pairs = sorted(((a, m) for m, al in _ALIASES.items() for a in al), key=lambda p: -len(p[0]))
+    for alias, method in pairs:
+        if re.search(rf"(?<!\w){re.escape(alias)}(?!\w)", key):
+            return method
+    return None
+
+def _prep(f: Integrand, a, b, tol) -> Tuple[Array, Array, Array]:
+    m = 1 if callable(f) else len(f)
+    a, b, tol = np.broadcast_arrays(np.asarray(a, float), np.asarray(b, float), np.asarray(tol, float),
+                                    np.zeros(m))[:3]
+    return a.astype(float).ravel(), b.astype(float).ravel(), tol.astype(float).ravel()
+
+def _take(f: Integrand, idx: Array) -> Integrand:
+    return f if callable(f) else [f[i] for i in idx]
+
+def _eval(f: Integrand, X: Array) -> Array:
+    """f on a (rows, points) grid: one call for a shared integrand, one per row otherwise."""
+    with np.errstate(all="ignore"):
+        if callable(f):
+            return np.broadcast_to(np.asarray(f(X), float), X.shape)
+        return np.stack([np.broadcast_to(np.asarray(fi(x), float), x.shape) for fi, x in zip(f, X)])
+
+def _grid(a: Array, b: Array, n: int) -> Array:
+    return a[:, None] + (b - a)[:, None] * (np.arange(n + 1) / n)
+
+def _refine(f: Integrand, a: Array, b: Array, Y: Array) -> Array:
+    """Values on the grid with twice the subintervals; only the new midpoints are evaluated."""
+    n = Y.shape[1] - 1
+    Z = np.empty((Y.shape[0], 2 * n + 1))
+    Z[:, ::2] = Y
+    Z[:, 1::2] = _eval(f, a[:, None] + (b - a)[:, None] * ((np.arange(n) + 0.5) / n))
+    return Z
+
+def _trap_rule(Y: Array, h: Array) -> Array:
+    return h * (Y.sum(axis=1) - (Y[:, 0] + Y[:, -1]) / 2)
+
+def _simpson_rule(Y: Array, h: Array) -> Array:
+    return h / 3 * (Y[:, 0] + Y[:, -1] + 4 * Y[:, 1:-1:2].sum(axis=1) + 2 * Y[:, 2:-1:2].sum(axis=1))
+
+_RULES = {"Trapezoid": (_trap_rule, 2, 1), "Simpson": (_simpson_rule, 4, 2)}  # rule, order, n tối thiểu
+
+# Each method: (f, a, b, tol, maxiter, n) -> (value, error estimate, iterations, evaluations, converged)
+
+def _effective_n(name: str, n: int) -> int:
+    """Subinterval / node count a method actually uses for a requested n (Simpson rounds an odd n up)."""
+    if name in _RULES:
+        step = _RULES[name][2]
+        return max(step, int(n) + (int(n) % step))
+    if name == "Gaussian Quadrature":
+        return max(1, int(n))
+    return int(n)
+
+def _composite(kind: str, f, a, b, tol, maxiter, n=None):
+    rule, p, step = _RULES[kind]
+    a, b, tol = _prep(f, a, b, tol)
+    m = a.size
+    val, err = np.full(m, np.nan), np.full(m, np.inf)
+    it, evals, conv = np.zeros(m, int), np.zeros(m, int), np.zeros(m, bool)
+    if n is not None:
+        # n cố định: tính trên lưới 2n, Q_n lấy từ các điểm chẵn, sai số Richardson của Q_n
+        n = _effective_n(kind, n)
+        Z = _eval(f, _grid(a, b, 2 * n))
+        q_n, q_2n = rule(Z[:, ::2], (b - a) / n), rule(Z, (b - a) / (2 * n))
+        val, err = q_n, np.abs(q_2n - q_n) * 2 ** p / (2 ** p - 1)
+        return val, err, np.ones(m, int), np.full(m, 2 * n + 1), np.isfinite(val)
+    idx, k = np.arange(m), 2
+    Y = _eval(f, _grid(a, b, k))
+    prev = rule(Y, (b - a) / k)
+    evals += k + 1
+    for level in range(1, min(maxiter, _MAX_LEVEL) + 1):
+        Y = _refine(_take(f, idx), a[idx], b[idx], Y)
+        k = Y.shape[1] - 1
+        cur = rule(Y, (b[idx] - a[idx]) / k)
+        e = np.abs(cur - prev) / (2 ** p - 1)
+        val[idx], err[idx], it[idx] = cur, e, level
+        evals[idx] += k // 2
+        done = (e <= tol[idx]) | ~np.isfinite(cur)
+        conv[idx[done]] = np.isfinite(cur[done])
+        keep = ~done
+        idx, Y, prev = idx[keep], Y[keep], cur[keep]
+        if idx.size == 0:
+            break
+    return val, err, it, evals, conv
+
+def trapezoid(f, a, b, tol, maxiter, n=None):
+    return _composite("Trapezoid", f, a, b, tol, maxiter, n)
+
+def simpson(f, a, b, tol, maxiter, n=None):
+    return _composite("Simpson", f, a, b, tol, maxiter, n)
+
+_RICHARDSON = 1.0 / (4.0 ** np.arange(1, _ROMBERG_LEVELS + 2) - 1)
+_romberg_columns: "OrderedDict[tuple, Tuple[Array, List[Array]]]" = OrderedDict()
+
+def _romberg_key(f: Integrand, a: Array, b: Array) -> Optional[tuple]:
+    try:
+        key = (f if callable(f) else tuple(f), a.tobytes(), b.tobytes())
+        hash(key)
+        return key
+    except TypeError:
+        return None
+
+def romberg(f, a, b, tol, maxiter, n=None):
+    """Romberg tableau; the trapezoid column T_k (and the finest grid) is reused across calls."""
+    a, b, tol = _prep(f, a, b, tol)
+    m, levels = a.size, min(maxiter, _ROMBERG_LEVELS)
+    key = _romberg_key(f, a, b)
+    Y, column = _romberg_columns.pop(key, (None, [])) if key is not None else (None, [])
+    evals = np.zeros(m, int)
+    if Y is None:
+        Y = _eval(f, _grid(a, b, 1))
+        column = [_trap_rule(Y, b - a)]
+        evals += 2
+    val, err = np.full(m, np.nan), np.full(m, np.inf)
+    it, conv = np.zeros(m, int), np.zeros(m, bool)
+    row = [column[0]]
+    for k in range(1, levels + 1):
+        if k >= len(column):
+            Y = _refine(f, a, b, Y)
+            evals += (Y.shape[1] - 1) // 2
+            column.append(_trap_rule(Y, (b - a) / (Y.shape[1] - 1)))
+        new = [column[k]]
+        for j in range(1, k + 1):
+            new.append(new[j - 1] + (new[j - 1] - row[j - 1]) * _RICHARDSON[j - 1])
+        e = np.abs(new[k] - row[k - 1])
+        fresh = ~conv
+        val[fresh], err[fresh], it[fresh] = new[k][fresh], e[fresh], k
+        conv |= (e <= tol) & np.isfinite(new[k])
+        row = new
+        if conv.all() or not np.isfinite(new[k]).any():
+            break
+    if key is not None:
+        _romberg_columns[key] = (Y, column)
+        while len(_romberg_columns) > _ROMBERG_CACHE:
+            _romberg_columns.popitem(last=False)
+    return val, err, it, evals, conv
+
+@lru_cache(maxsize=64)
+def legendre_nodes(n: int) -> Tuple[Array, Array]:
+    """Gauss-Legendre nodes and weights on [-1, 1] (read-only, cached per n)."""
+    x, w = np.polynomial.legendre.leggauss(n)
+    x.flags.writeable = w.flags.writeable = False
+    return x, w
+
+def _gauss(f: Integrand, a: Array, b: Array, n: int) -> Array:
+    x, w = legendre_nodes(n)
+    half, mid = (b - a) / 2, (b + a) / 2
+    return half * (_eval(f, mid[:, None] + half[:, None] * x) @ w)
+
+def gaussian_quadrature(f, a, b, tol, maxiter, n=None):
+    a, b, tol = _prep(f, a, b, tol)
+    m = a.size
+    if n is not None:
+        n = _effective_n("Gaussian Quadrature", n)
+        q_n, q_2n = _gauss(f, a, b, n), _gauss(f, a, b, 2 * n)
+        err = np.abs(q_2n - q_n)
+        return q_n, err, np.ones(m, int), np.full(m, 3 * n), np.isfinite(q_n)
+    val, err = np.full(m, np.nan), np.full(m, np.inf)
+    it, evals, conv = np.zeros(m, int), np.zeros(m, int), np.zeros(m, bool)
+    idx, k = np.arange(m), 2
+    prev = _gauss(f, a, b, k)
+    evals += k
+    for level in range(1, maxiter + 1):
+        if 2 * k > _GAUSS_MAX:
+            break
+        k *= 2
+        cur = _gauss(_take(f, idx), a[idx], b[idx], k)
+        e = np.abs(cur - prev)
+        val[idx], err[idx], it[idx] = cur, e, level
+        evals[idx] += k
+        done = (e <= tol[idx]) | ~np.isfinite(cur)
+        conv[idx[done]] = np.isfinite(cur[done])
+        idx, prev = idx[~done], cur[~done]
+        if idx.size == 0:
+            break
+    return val, err, it, evals, conv
+
+def adaptive_quadrature(f, a, b, tol, maxiter, n=None):
+    """Adaptive Simpson: every level refines all open panels of all batch elements in one evaluation."""
+    a, b, tol = _prep(f, a, b, tol)
+    m, k = a.size, max(2, int(n or 4))
+    owner = np.repeat(np.arange(m), k)
+    edges = _grid(a, b, k)
+    lo, hi = edges[:, :-1].ravel(), edges[:, 1:].ravel()
+    ptol = np.repeat(tol / k, k)
+    mid = (lo + hi) / 2
+    fl, fm, fh = (_eval_owned(f, x, owner) for x in (lo, mid, hi))
+    whole = (hi - lo) / 6 * (fl + 4 * fm + fh)
+    val, err = np.zeros(m), np.zeros(m)
+    it, evals = np.zeros(m, int), np.full(m, 2 * k + 1)
+    last = max(1, min(maxiter, 50))
+    for level in range(1, last + 1):
+        lm, rm = (lo + mid) / 2, (mid + hi) / 2
+        flm, frm = _eval_owned(f, lm, owner), _eval_owned(f, rm, owner)
+        np.add.at(evals, owner, 2)
+        left, right = (mid - lo) / 6 * (fl + 4 * flm + fm), (hi - mid) / 6 * (fm + 4 * frm + fh)
+        delta = left + right - whole
+        e = np.abs(delta) / 15
+        ok = (e <= ptol) | ~np.isfinite(delta)
+        np.add.at(val, owner[ok], (left + right + delta / 15)[ok])
+        np.add.at(err, owner[ok], e[ok])
+        it[owner] = level
+        split = ~ok
+        if not split.any() or level == last or 2 * split.sum() > _ADAPTIVE_PANELS:
+            break
+        s = split
+        owner = np.concatenate([owner[s], owner[s]])
+        lo, mid, hi = np.concatenate([lo[s], mid[s]]), np.concatenate([lm[s], rm[s]]), np.concatenate([mid[s], hi[s]])
+        fl, fm, fh = np.concatenate([fl[s], fm[s]]), np.concatenate([flm[s], frm[s]]), np.concatenate([fm[s], fh[s]])
+        whole = np.concatenate([left[s], right[s]])
+        ptol = np.concatenate([ptol[s], ptol[s]]) / 2
+    # panel còn mở (hết level / quá nhiều panel): cộng ước lượng hiện có, đánh dấu không hội tụ
+    conv = np.isfinite(val) & (err <= tol)
+    if split.any():
+        np.add.at(val, owner[split], (left + right)[split])
+        np.add.at(err, owner[split], e[split])
+        conv[np.unique(owner[split])] = False
+    return val, err, it, evals, conv
+
+def _eval_owned(f: Integrand, x: Array, owner: Array) -> Array:
+    """f at points x where x[i] belongs to batch element owner[i]."""
+    if callable(f):
+        return _eval(f, x[None, :])[0]
+    out = np.empty(x.shape)
+    for j in np.unique(owner):
+        sel = owner == j
+        out[sel] = _eval([f[j]], x[sel][None, :])[0]
+    return out
+
+def monte_carlo(f, a, b, tol, maxiter, n=None, seed: int = 0):
+    """
+    Plain Monte Carlo in chunks; error = standard error. With n >= 1000 exactly n samples are drawn;
+    otherwise sampling stops at tol, at the sample cap, or once tol is out of reach (error ~ 1/sqrt(N)).
+    """
+    a, b, tol = _prep(f, a, b, tol)
+    m = a.size
+    rng = np.random.default_rng(seed)
+    fixed = bool(n and n >= 1000)
+    total = max(1000, min(int(n) if fixed else _MC_MAX, _MC_BUDGET // m))
+    chunk = min(_MC_SAMPLES, total)
+    s, s2, cnt = np.zeros(m), np.zeros(m), 0
+    it = 0
+    while cnt < total and it < max(1, maxiter):
+        k = min(chunk, total - cnt)
+        Y = _eval(f, a[:, None] + (b - a)[:, None] * rng.random((m, k)))
+        s += Y.sum(axis=1)
+        s2 += (Y * Y).sum(axis=1)
+        cnt += k
+        it += 1
+        mean = s / cnt
+        err = (b - a) * np.sqrt(np.maximum(s2 / cnt - mean ** 2, 0.0) / cnt)
+        if not fixed and (np.all(err <= tol) or np.all(cnt * (err / tol) ** 2 > total)):
+            break
+    val = (b - a) * s / cnt
+    conv = np.isfinite(val) if fixed else np.isfinite(val) & (err <= tol)
+    return val, err, np.full(m, it), np.full(m, cnt), conv
+
+METHODS: Dict[str, Callable] = {
+    "Trapezoid": trapezoid, "Simpson": simpson, "Romberg": romberg, "Adaptive Quadrature": adaptive_quadrature,
+    "Gaussian Quadrature": gaussian_quadrature, "Monte Carlo": monte_carlo,
+}
+
+def solve(method: str, f: Integrand, a, b, tol=1e-8, maxiter: int = 50, n: Optional[int] = None) -> Dict[str, Array]:
+    """Batched integral. Returns arrays: value, error (estimate), iterations, evaluations, converged."""
+    name = match_method(method)
+    if name is None:
+        raise ValueError(f"unsupported integration method: {method}")
+    # tích phân suy rộng (vd 1/sqrt(x) trên [0,1]) cho inf/nan ở đầu mút: không để lọt RuntimeWarning,
+    # giá trị không hữu hạn được run_method báo là thất bại
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        val, err, it, evals, conv = METHODS[name](f, a, b, tol, maxiter, n)
+    conv = conv & np.isfinite(val) & np.isfinite(err)
+    return {"value": val, "error": err, "iterations": it, "evaluations": evals, "converged": conv}
+
+def run_method(method: str, f: Integrand, a, b, tol=1e-8, maxiter: int = 50, n: Optional[int] = None) -> List[dict]:
+    """One metrics dict per batch element; `residual` is the method's error estimate."""
+    out = solve(method, f, a, b, tol, maxiter, n)
+    results = []
+    for i in range(out["value"].size):
+        r = {"method": method, "success": bool(out["converged"][i]), "iterations": int(out["iterations"][i]),
+             "result": float(out["value"][i]), "residual": float(out["error"][i]),
+             "evaluations": int(out["evaluations"][i]), "engine": "native"}
+        if n is not None:
+            r["n"] = _effective_n(match_method(method), n)
+        if not np.isfinite(r["result"]) or not np.isfinite(r["residual"]):
+            r.update({"success": False, "result": None, "residual": None,
+                      "error": "non-finite value (integrand singular on the interval?)"})
+        elif not r["success"]:
+            r["error"] = f"error estimate {r['residual']:.3g} above tol {tol:g}"
+        results.append(r)
+    return results
+
+# ---- task text -> (f, a, b, n, tol) ----
+
+_NUM = r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?"
+_LIMIT = r"[-+]?[\w.*/()]+"
+_INTERVAL_RE = re.compile(rf"(?<!\w)(?:đoạn|khoảng|interval|over|on|trên)\s*[\[(]\s*({_LIMIT})\s*[,;]\s*({_LIMIT})\s*[\])]"
+                          rf"|(?<!\w)(?:từ|from)\s+({_LIMIT})\s+(?:đến|tới|to)\s+({_LIMIT})", re.I)
+_TOL_RE = re.compile(rf"(?:sai số|độ chính xác|tol(?:erance)?|eps(?:ilon)?|ε|accuracy)\s*(?:=|<=|<|≤|là|of)?\s*({_NUM})", re.I)
+
+def integrand_variable(expr: str) -> str:
+    names = set(re.findall(r"(?<![\w.])([A-Za-z_]\w*)", expr or "")) - set(FUNCTIONS) - set(CONSTANTS) - {"np", "numpy", "math"}
+    return names.pop() if len(names) == 1 else "x"
+
+def parse_quadrature(task_text: str, short_form: Optional[str], domain_hint: Optional[str] = None) -> Optional[dict]:
+    """{'f', 'a', 'b', 'n', 'tol', 'variable'} from the classifier's short_form / domain_hint and the task text."""
+    from root_solver import parse_interval
+    var = integrand_variable(short_form)
+    c = try_compile(short_form, (var,))
+    if c is None:
+        return None
+    limits = parse_interval(domain_hint)
+    m = _INTERVAL_RE.search(task_text or "")
+    if m:
+        lo, hi = (g for g in m.groups() if g is not None)
+        parsed = evaluate_constant(lo), evaluate_constant(hi)
+        if None not in parsed and (limits is None or not np.allclose(parsed, limits)):
+            limits = parsed  # đề ghi rõ cận (vd [0, pi]) ưu tiên hơn domain_hint đã làm tròn
+    if limits is None:
+        return None
+    n = re.search(r"\bn\s*=\s*(\d+)", task_text or "")
+    tol = _TOL_RE.search(task_text or "")
+    return {"f": c.f, "a": limits[0], "b": limits[1], "n": int(n.group(1)) if n else None,
+            "tol": float(tol.group(1)) if tol else None, "variable": var}
+
+if __name__ == "__main__":
+    import time
+    f = try_compile("exp(-x**2)").f
+    a, b = np.zeros(1000), np.linspace(0.5, 3.0, 1000)  # 1000 khoảng trong một lần gọi
+    for name in METHODS:
+        t = time.perf_counter()
+        out = solve(name, f, a, b, tol=1e-8)
+        print(f"{name:<22}{(time.perf_counter() - t) * 1000:8.2f} ms  converged={out['converged'].mean():.2f}  "
+              f"max_err={np.nanmax(out['error']):.2e}")
+    q = parse_quadrature("Tính tích phân của sin(x) trên đoạn [0, pi] bằng công thức hình thang với n = 100.", "sin(x)")
+    print(json.dumps(run_method("Trapezoid", q["f"], q["a"], q["b"], n=q["n"])[0], ensure_ascii=False))
@@ -0,0 +1,236 @@
+# research.py
+"""
+Research layer for the execution agent: one `research` tool instead of separate search / arxiv / wikipedia tools.
+
+  - NotesBackend: BM25 index over algorithm_notes.NOTES (every ALGORITHM_MAP method, tagged with its
+    categories). A lookup whose terms are mostly covered by the best note (coverage >= min_coverage,
+    e.g. "Regula Falsi convergence") is answered locally, with no network access.
+  - Otherwise every remote backend is queried concurrently (one daemon thread per call, one deadline for
+    all of them; a backend whose previous call is still hanging is skipped, not queued); answers are cached
+    per (backend, normalized query) in a DiskCache with TTL. Errors and timeouts are returned to the agent
+    but never cached. Notes are appended only when they match at least two query terms and score at
+    least min_note_score.
+A backend is any object with `name` and `search(query) -> str`: ToolBackend wraps a LangChain tool
+(load_tools), StaticBackend is an offline stand-in (fixed answers or a callable, optional latency).
+
+    python research.py "Regula Falsi convergence"
+"""
+import argparse, asyncio, contextvars, hashlib, math, os, re, tempfile, threading, time, unicodedata
+from collections import Counter, defaultdict
+from concurrent.futures import Future, wait
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+from langchain_core.tools import StructuredTool
+from algorithm_map import ALGORITHM_MAP
+from algorithm_notes import NOTES
+from llm_cache import DiskCache
+import instrumentation
+
+# từ không mang nội dung (Anh + Việt đã bỏ dấu), không tính vào điểm BM25 / độ phủ
+_STOP = {"a", "an", "the", "of", "for", "and", "or", "in", "on", "to", "with", "by", "is", "are", "what", "how",
+         "does", "do", "when", "which", "method", "methods", "algorithm", "phuong", "phap", "thuat", "toan", "cua",
+         "va", "la", "cho", "voi", "khi", "nao", "gi", "nhu"}
+
+# thuật ngữ tiếng Việt (đã bỏ dấu) -> từ tiếng Anh dùng trong ghi chú
+_SYNONYMS = {"hoi tu": "convergence", "sai so": "error", "on dinh": "stability", "toc do": "rate",
+             "dieu kien": "condition", "danh gia": "bound", "chi phi": "cost", "buoc": "step"}
+_SYNONYM_RE = re.compile(r"\b(?:" + "|".join(_SYNONYMS) + r")\b")
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase ASCII terms without diacritics ('hội tụ' -> 'convergence'), stop words removed."""
+    s = unicodedata.normalize("NFD", (text or "").lower().replace("đ", "d"))
+    s = "".join(ch for ch in s if not unicodedata.combining(ch))
+    s = _SYNONYM_RE.sub(lambda m: _SYNONYMS[m.group(0)], s)
+    return [t for t in re.findall(r"[a-z0-9]+", s) if t not in _STOP]
+
+def normalize_query(query: str) -> str:
+    return re.sub(r"\s+", " ", (query or "").strip().lower())
+
+class BM25Index:
+    """Okapi BM25 over a small in-memory corpus {doc_id: text}."""
+    def __init__(self, docs: Dict[str, str], k1: float = 1.5, b: float = 0.75):
+        self.ids = list(docs)
+        self.k1, self.b = k1, b
+        tfs = [Counter(tokenize(docs[i])) for i in self.ids]
+        self.lengths = [sum(tf.values()) for tf in tfs]
+        self.avgdl = sum(self.lengths) / max(1, len(self.lengths))
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        for d, tf in enumerate(tfs):
+            for term, f in tf.items():
+                self.postings[term].append((d, f))
+        n = len(self.ids)
+        self.idf = {t: math.log(1 + (n - len(p) + 0.5) / (len(p) + 0.5)) for t, p in self.postings.items()}
+
+    def search(self, query: str, k: int = 3) -> List[Tuple[str, float, float]]:
+        """Top-k (doc_id, score, coverage); coverage = fraction of distinct query terms found in the doc."""
+        terms = set(tokenize(query))
+        scores: Dict[int, float] = defaultdict(float)
+        matched: Dict[int, int] = defaultdict(int)
+        for t in terms:
+            for d, f in self.postings.get(t, ()):
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[d] / self.avgdl)
+                scores[d] += self.idf[t] * f * (self.k1 + 1) / (f + norm)
+                matched[d] += 1
+        top = sorted(scores, key=lambda d: -scores[d])[:k]
+        return [(self.ids[d], round(scores[d], 3), matched[d] / len(terms)) for d in top]
+
+class NotesBackend:
+    """Local notes for every ALGORITHM_MAP method (no network)."""
+    name = "notes"
+
+    def __init__(self, notes: Optional[Dict[str, str]] = None, k: int = 2):
+        self.notes = NOTES if notes is None else notes
+        self.k = k
+        cats: Dict[str, List[str]] = defaultdict(list)
+        for cat, methods in ALGORITHM_MAP.items():
+            for m in methods:
+                cats[m].append(cat)
+        self.categories = dict(cats)
+        # tên phương pháp lặp lại để tăng trọng số tiêu đề
+        self.index = BM25Index({m: f"{m}\n{m}\n{' '.join(self.categories.get(m, []))}\n{text}"
+                                for m, text in self.notes.items()})
+
+    def hits(self, query: str) -> List[Tuple[str, float, float]]:
+        return self.index.search(query, self.k)
+
+    def format(self, hits: Sequence[Tuple[str, float, float]]) -> str:
+        return "\n".join(f"- {m} ({', '.join(self.categories.get(m, [])) or '-'}): {self.notes[m]}" for m, _, _ in hits)
+
+    def search(self, query: str) -> str:
+        return self.format(self.hits(query)) or f"No note matches {query!r}"
+
+class ToolBackend:
+    """Remote source behind a LangChain tool (ddg-search, arxiv, wikipedia, ...)."""
+    def __init__(self, tool):
+        self.tool = tool
+        self.name = tool.name
+
+    def search(self, query: str) -> str:
+        return str(self.tool.invoke(query))
+
+class StaticBackend:
+    """Offline stand-in for a remote source: fixed answers by normalized query, or a callable."""
+    def __init__(self, name: str, answers: Union[Dict[str, str], Callable[[str], str]], latency: float = 0.0):
+        self.name = name
+        self.answers = answers
+        self.latency = latency
+
+    def search(self, query: str) -> str:
+        if self.latency:
+            time.sleep(self.latency)
+        if callable(self.answers):
+            return self.answers(query)
+        return self.answers.get(normalize_query(query), f"No good {self.name} result for {query!r}")
+
+class ResearchLayer:
+    def __init__(self, backends: Sequence = (), notes: Optional[NotesBackend] = None,
+                 cache: Optional[DiskCache] = None, timeout: float = 20.0, min_coverage: float = 0.6,
+                 min_note_score: float = 3.5, max_chars: int = 2000):
+        self.backends = list(backends)
+        self.notes = notes or NotesBackend()
+        self.cache = cache
+        self.timeout = timeout
+        self.min_coverage = min_coverage
+        self.min_note_score = min_note_score
+        self.max_chars = max_chars
+        self._busy: set = set()  # backend đang có lời gọi chưa trả về (kể cả đã quá hạn)
+        self._lock = threading.Lock()
+
+    def _key(self, backend, query: str) -> str:
+        return hashlib.sha256(f"{backend.name}\0{normalize_query(query)}".encode("utf-8")).hexdigest()
+
+    def _call(self, backend, query: str) -> Tuple[str, bool]:
+        t0 = time.perf_counter()
+        try:
+            text, ok = str(backend.search(query)), True
+        except Exception as e:
+            text, ok = f"Error: {type(e).__name__}: {e}", False
+        instrumentation.record_call("research", backend.name, time.perf_counter() - t0, **({} if ok else {"error": text[:80]}))
+        return text, ok
+
+    def _start(self, backend, query: str) -> Optional[Future]:
+        """Call `backend` on its own daemon thread; None while its previous call is still running."""
+        with self._lock:
+            if backend.name in self._busy:
+                return None
+            self._busy.add(backend.name)
+        fut: Future = Future()
+        ctx = contextvars.copy_context()
+        def run():
+            try:
+                fut.set_result(ctx.run(self._call, backend, query))
+            finally:
+                with self._lock:
+                    self._busy.discard(backend.name)
+        threading.Thread(target=run, name=f"research-{backend.name}", daemon=True).start()
+        return fut
+
+    def search(self, query: str) -> str:
+        """Local notes when they cover the query, else all remote backends at once (cached) + the best notes."""
+        t0 = time.perf_counter()
+        hits = self.notes.hits(query)
+        if hits and hits[0][2] >= self.min_coverage:
+            instrumentation.count("research_local")
+            instrumentation.record_call("research", self.notes.name, time.perf_counter() - t0)
+            return self.notes.format(hits)
+        results: Dict[str, str] = {}
+        pending = {}
+        for b in self.backends:
+            cached = self.cache.get(self._key(b, query)) if self.cache else None
+            if cached is not None:
+                instrumentation.count("research_cache_hits")
+                results[b.name] = cached
+            elif (fut := self._start(b, query)) is not None:
+                pending[fut] = b
+            else:
+                instrumentation.count("research_busy")
+                results[b.name] = "Error: previous query to this source is still running"
+        if pending:
+            done, late = wait(pending, timeout=self.timeout)
+            for fut in done:
+                b = pending[fut]
+                text, ok = fut.result()
+                results[b.name] = text
+                if ok and self.cache:
+                    self.cache.set(self._key(b, query), text)
+            for fut in late:
+                results[pending[fut].name] = f"Error: no answer within {self.timeout:g}s"
+        sections = [f"### {b.name}\n{results[b.name][:self.max_chars]}" for b in self.backends]
+        # ghi chú chỉ khớp một từ ("foo one" -> Inverse Power) là trùng hợp, không kèm theo
+        n_terms = len(set(tokenize(query)))
+        hits = [h for h in hits if h[1] >= self.min_note_score and h[2] * n_terms >= 2 - 1e-9]
+        if hits:
+            sections.append(f"### {self.notes.name}\n{self.notes.format(hits)}")
+        return "\n\n".join(sections) or f"No result for {query!r} (no matching note, no remote source configured)"
+
+    async def asearch(self, query: str) -> str:
+        return await asyncio.to_thread(self.search, query)
+
+    def as_tool(self) -> StructuredTool:
+        return StructuredTool.from_function(
+            func=self.search,
+            coroutine=self.asearch,
+            name="research",
+            description=(
+                "Look up numerical methods and background: convergence, error bounds, stability, "
+                "requirements, library functions. Built-in notes cover every standard method; web sources "
+                "(search/arxiv/wikipedia) are queried together when the notes do not. One call per question."
+            ),
+            handle_tool_error=True
+        )
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Query the research layer (local notes + optional offline stand-in).")
+    ap.add_argument("query")
+    ap.add_argument("--min-coverage", type=float, default=0.6)
+    args = ap.parse_args(argv)
+    # hai nguồn giả lập chậm: chạy song song, lần hỏi thứ hai lấy từ cache
+    slow = [StaticBackend(n, lambda q, n=n: f"[{n}] stand-in answer for {q!r}", latency=0.3) for n in ("web-demo", "papers-demo")]
+    cache = DiskCache(os.path.join(tempfile.gettempdir(), "research_demo.sqlite"), ttl=60)
+    layer = ResearchLayer(slow, cache=cache, min_coverage=args.min_coverage)
+    for attempt in (1, 2):
+        t0 = time.perf_counter()
+        text = layer.search(args.query)
+        print(f"--- attempt {attempt}: {time.perf_counter() - t0:.3f}s\n{text}")
+
+if __name__ == "__main__":
+    main()
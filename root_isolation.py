@@ -0,0 +1,106 @@
+# root_isolation.py
+"""
+Root isolation for tasks without a usable domain_hint ("nghiệm dương lớn nhất", ...).
+
+f is evaluated on a dense vectorized grid; cells with a sign change and cells around local
+extrema of |f| (possible double roots / close root pairs) are refined on sub-grids, all cells of
+one level in a single evaluation. Returns every isolating bracket so the validator can refine
+all roots in one batched root_solver call.
+"""
+import re
+from typing import Callable, List, Optional, Sequence, Tuple
+import numpy as np
+
+DEFAULT_DOMAINS = [(-10.0, 10.0), (-100.0, 100.0), (-1000.0, 1000.0)]
+
+def _eval(f: Callable, x: np.ndarray) -> np.ndarray:
+    with np.errstate(all="ignore"):
+        y = np.asarray(f(x), dtype=float)
+    return np.where(np.isfinite(y), y, np.nan)
+
+def _sign_cells(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """Boolean mask over cells [x[..., i], x[..., i+1]] containing a sign change or an exact zero."""
+    y0, y1 = y[..., :-1], y[..., 1:]
+    change = (np.sign(y0) * np.sign(y1) < 0) | (y0 == 0)
+    return change & np.isfinite(y0) & np.isfinite(y1)
+
+def _pole_free(f: Callable, lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    # bỏ cực (pole): |f| ở giữa ô phải nhỏ hơn ở hai đầu
+    ylo, yhi, ymid = _eval(f, lo), _eval(f, hi), _eval(f, (lo + hi) / 2)
+    return np.abs(ymid) <= np.maximum(np.abs(ylo), np.abs(yhi)) + 1e-12
+
+def isolate_roots(f: Callable, a: float, b: float, n: int = 2001, sub: int = 32, levels: int = 3,
+                  tol: float = 1e-10) -> List[Tuple[float, float]]:
+    """All isolating brackets (lo, hi) of f in [a, b], sorted. A bracket with lo == hi is an exact root."""
+    x = np.linspace(a, b, n)
+    y = _eval(f, x)
+    cells = np.flatnonzero(_sign_cells(x, y))
+    lo, hi = x[cells], x[cells + 1]
+    # cực trị cục bộ của |f| không đổi dấu: có thể là nghiệm kép hoặc cặp nghiệm rất gần nhau
+    ay = np.abs(y)
+    ext = np.flatnonzero((ay[1:-1] > 0) & (ay[1:-1] < ay[:-2]) & (ay[1:-1] < ay[2:]) & (np.sign(y[:-2]) == np.sign(y[2:]))) + 1
+    ext_lo, ext_hi = x[ext - 1], x[ext + 1]
+
+    brackets: List[Tuple[float, float]] = []
+    # tách các ô đổi dấu có thể chứa 3, 5... nghiệm
+    if lo.size:
+        g = lo[:, None] + (hi - lo)[:, None] * np.linspace(0.0, 1.0, sub)[None, :]
+        gy = _eval(f, g)
+        m = _sign_cells(g, gy)
+        r, c = np.nonzero(m)
+        blo, bhi = g[r, c], g[r, c + 1]
+        keep = _pole_free(f, blo, bhi)
+        brackets += list(zip(blo[keep], bhi[keep]))
+    for _ in range(levels):
+        if not ext_lo.size:
+            break
+        g = ext_lo[:, None] + (ext_hi - ext_lo)[:, None] * np.linspace(0.0, 1.0, sub)[None, :]
+        gy = _eval(f, g)
+        m = _sign_cells(g, gy)
+        r, c = np.nonzero(m)
+        brackets += list(zip(g[r, c], g[r, c + 1]))
+        found = m.any(axis=1)
+        # chưa đổi dấu: thu hẹp quanh điểm |f| nhỏ nhất rồi lặp
+        j = np.nanargmin(np.where(np.isnan(gy), np.inf, np.abs(gy)), axis=1)
+        rows = np.arange(g.shape[0])
+        touching = ~found & (np.abs(gy[rows, j]) < tol)
+        brackets += [(v, v) for v in g[rows[touching], j[touching]]]
+        nxt = ~found & ~touching
+        jl, jr = np.maximum(j - 1, 0), np.minimum(j + 1, sub - 1)
+        ext_lo, ext_hi = g[rows[nxt], jl[nxt]], g[rows[nxt], jr[nxt]]
+    out = sorted({(float(l), float(h)) for l, h in brackets})
+    # bỏ nghiệm đúng (l == h) đã nằm trong một bracket khác
+    spans = [(l, h) for l, h in out if l < h]
+    return [(l, h) for l, h in out if l < h or not any(sl <= l <= sh for sl, sh in spans)]
+
+def scan(f: Callable, domain: Optional[Tuple[float, float]] = None,
+         domains: Sequence[Tuple[float, float]] = DEFAULT_DOMAINS, **kw) -> List[Tuple[float, float]]:
+    """isolate_roots on `domain`, or on growing default domains until some root is found."""
+    if domain is not None:
+        return isolate_roots(f, domain[0], domain[1], **kw)
+    for a, b in domains:
+        found = isolate_roots(f, a, b, **kw)
+        if found:
+            return found
+    return []
+
+def root_selector(task_text: str) -> Callable[[Sequence[float]], Optional[int]]:
+    """
+    Index of the root the task asks for: 'lớn nhất'/'largest' -> max, 'nhỏ nhất'/'smallest' -> min,
+    'dương'/'positive' and 'âm'/'negative' filter by sign. Default: the first (leftmost) root.
+    """
+    t = (task_text or "").lower()
+    positive = bool(re.search(r"nghiệm dương|dương (lớn|nhỏ)|positive", t))
+    negative = bool(re.search(r"nghiệm âm|âm (lớn|nhỏ)|negative", t))
+    largest = bool(re.search(r"lớn nhất|largest|greatest|biggest", t))
+    smallest = bool(re.search(r"nhỏ nhất|smallest|least", t))
+    def pick(roots: Sequence[float]) -> Optional[int]:
+        idx = [i for i, r in enumerate(roots) if (not positive or r > 0) and (not negative or r < 0)]
+        if not idx:
+            return None
+        if largest:
+            return max(idx, key=lambda i: roots[i])
+        if smallest:
+            return min(idx, key=lambda i: roots[i])
+        return idx[0]
+    return pick
@@ -0,0 +1,292 @@
+# root_solver.py
+"""
+In-process, vectorized root finding for the methods in ALGORITHM_MAP["root_finding"].
+
+Every method works on NumPy arrays of brackets (a, b) (and optionally per-element tol), so many
+intervals / tolerances are solved in one call. `f` must accept arrays (see make_func).
+run_method() returns the same metrics dicts the sandbox scripts print for Validator.pick_best.
+"""
+import json, re
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+from expr_compiler import compile_expr
+
+Array = np.ndarray
+
+# canonical name -> aliases (lowercase, no punctuation), incl. Vietnamese names
+_ALIASES = {
+    "Bisection": ["bisection", "chia doi", "chia đôi"],
+    "Regula Falsi": ["regula falsi", "false position", "day cung", "dây cung"],
+    "Secant": ["secant", "cat tuyen", "cát tuyến"],
+    "Newton-Raphson": ["newton raphson", "newton", "tiep tuyen", "tiếp tuyến"],
+    "Brentq": ["brentq", "brent"],
+    "Fixed-point": ["fixed point", "lap don", "lặp đơn", "diem bat dong", "điểm bất động"],
+    "Muller": ["muller"],
+}
+
+def match_method(name: str) -> Optional[str]:
+    """Map a free-form method name ('Newton method', 'Phương pháp dây cung'...) to a canonical one."""
+    key = re.sub(r"[^\w\s]", " ", (name or "").lower())
+    key = re.sub(r"\s+", " ", key).strip()
+    # "regula falsi" và "secant" có thể cùng xuất hiện; thử alias dài trước
+    pairs = sorted(((a, m) for m, al in _ALIASES.items() for a in al), key=lambda p: -len(p[0]))
+    for alias, method in pairs:
+        if alias in key:
+            return method
+    return None
+
+def make_func(expr: str) -> Callable[[Array], Array]:
+    """Vectorized f(x) from a short_form such as 'x**3 - x - 1' (see expr_compiler)."""
+    return compile_expr(expr).f
+
+def _num_diff(f: Callable, x: Array) -> Array:
+    h = 1e-7 * np.maximum(1.0, np.abs(x))
+    return (f(x + h) - f(x - h)) / (2 * h)
+
+def _prep(a, b, tol) -> Tuple[Array, Array, Array]:
+    a, b, tol = np.broadcast_arrays(np.asarray(a, float), np.asarray(b, float), np.asarray(tol, float))
+    return a.astype(float).ravel(), b.astype(float).ravel(), tol.astype(float).ravel()
+
+# Each method: (f, a, b, tol, maxiter, df) -> (x, iterations, converged, error-mask-or-None);
+# a method stops an element early (iterations < maxiter, not converged) only on a non-finite step
+# (bisection also on a collapsed bracket)
+
+# số lần chia đôi thêm sau khi khoảng < tol để |f(c)| kịp xuống dưới tol (hàm dốc tới ~1e9)
+_BISECT_EXTRA = 30
+
+def bisection(f, a, b, tol, maxiter, df=None):
+    a, b, tol = _prep(a, b, tol)
+    fa, fb = f(a), f(b)
+    bad = np.sign(fa) * np.sign(fb) > 0
+    x, it = (a + b) / 2, np.zeros(a.shape, int)
+    conv = np.zeros(a.shape, bool)
+    active = ~bad
+    for _ in range(maxiter):
+        if not active.any(): break
+        c = (a + b) / 2; fc = f(c)
+        x = np.where(active, c, x)
+        # khoảng < tol chưa đủ: chỉ hội tụ khi |f(c)| < tol; khoảng đã nhỏ hơn tol * 2**-_BISECT_EXTRA
+        # hoặc trung điểm không còn dịch chuyển (đổi dấu qua điểm gián đoạn, vd 1/x) thì dừng, báo thất bại
+        done = np.abs(fc) < tol
+        stall = ~done & ((c <= a) | (c >= b) | ((b - a) / 2 < tol * 2.0 ** -_BISECT_EXTRA))
+        conv |= active & done
+        active &= ~(done | stall)
+        it += active
+        left = fa * fc <= 0
+        b, fb = np.where(active & left, c, b), np.where(active & left, fc, fb)
+        a, fa = np.where(active & ~left, c, a), np.where(active & ~left, fc, fa)
+    return x, it, conv, bad
+
+def regula_falsi(f, a, b, tol, maxiter, df=None):
+    a, b, tol = _prep(a, b, tol)
+    fa, fb = f(a), f(b)
+    bad = np.sign(fa) * np.sign(fb) > 0
+    x, it = a.copy(), np.zeros(a.shape, int)
+    conv = np.zeros(a.shape, bool)
+    active = ~bad
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for _ in range(maxiter):
+            if not active.any(): break
+            c = b - fb * (b - a) / (fb - fa); fc = f(c)
+            done = (np.abs(fc) < tol) | (np.abs(c - x) < tol)
+            x = np.where(active, c, x)
+            conv |= active & done
+            active &= ~done
+            it += active
+            left = fa * fc <= 0
+            b, fb = np.where(active & left, c, b), np.where(active & left, fc, fb)
+            a, fa = np.where(active & ~left, c, a), np.where(active & ~left, fc, fa)
+    return x, it, conv, bad
+
+def secant(f, a, b, tol, maxiter, df=None):
+    x0, x1, tol = _prep(a, b, tol)
+    f0, f1 = f(x0), f(x1)
+    it = np.zeros(x0.shape, int)
+    conv = np.zeros(x0.shape, bool)
+    active = np.ones(x0.shape, bool)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for _ in range(maxiter):
+            if not active.any(): break
+            x2 = x1 - f1 * (x1 - x0) / (f1 - f0); f2 = f(x2)
+            ok = np.isfinite(x2)
+            done = ok & (np.abs(x2 - x1) < tol) & (np.abs(f2) < tol)
+            upd = active & ok
+            x0, f0 = np.where(upd, x1, x0), np.where(upd, f1, f0)
+            x1, f1 = np.where(upd, x2, x1), np.where(upd, f2, f1)
+            conv |= active & done
+            active &= ok & ~done
+            it += active
+    return x1, it, conv, None
+
+def newton_raphson(f, a, b, tol, maxiter, df=None):
+    a, b, tol = _prep(a, b, tol)
+    df = df or (lambda x: _num_diff(f, x))
+    x = (a + b) / 2
+    it = np.zeros(x.shape, int)
+    conv = np.zeros(x.shape, bool)
+    active = np.ones(x.shape, bool)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for _ in range(maxiter):
+            if not active.any(): break
+            fx = f(x)
+            xn = x - fx / df(x)
+            ok = np.isfinite(xn)
+            done = ok & (np.abs(xn - x) < tol) & (np.abs(f(xn)) < tol)
+            x = np.where(active & ok, xn, x)
+            conv |= active & done
+            active &= ok & ~done
+            it += active
+    return x, it, conv, None
+
+def brentq(f, a, b, tol, maxiter, df=None):
+    """Brent's method (same control flow as scipy's brentq), masked per element."""
+    xpre, xcur, tol = _prep(a, b, tol)
+    fpre, fcur = f(xpre), f(xcur)
+    bad = np.sign(fpre) * np.sign(fcur) > 0
+    xblk, fblk = np.zeros_like(xcur), np.zeros_like(xcur)
+    spre, scur = np.zeros_like(xcur), np.zeros_like(xcur)
+    it = np.zeros(xcur.shape, int)
+    # nghiệm nằm đúng ở đầu mút
+    xcur, fcur = np.where(fpre == 0, xpre, xcur), np.where(fpre == 0, 0.0, fcur)
+    conv = fcur == 0
+    active = ~bad & ~conv
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for _ in range(maxiter):
+            if not active.any(): break
+            m = active & (fpre * fcur < 0)
+            xblk, fblk = np.where(m, xpre, xblk), np.where(m, fpre, fblk)
+            spre = np.where(m, xcur - xpre, spre); scur = np.where(m, xcur - xpre, scur)
+            m = active & (np.abs(fblk) < np.abs(fcur))
+            xpre, xcur, xblk = np.where(m, xcur, xpre), np.where(m, xblk, xcur), np.where(m, xcur, xblk)
+            fpre, fcur, fblk = np.where(m, fcur, fpre), np.where(m, fblk, fcur), np.where(m, fcur, fblk)
+            delta = (tol + 4 * np.finfo(float).eps * np.abs(xcur)) / 2
+            sbis = (xblk - xcur) / 2
+            done = (fcur == 0) | (np.abs(sbis) < delta)
+            conv |= active & done
+            active &= ~done
+            if not active.any(): break
+            interp = (np.abs(spre) > delta) & (np.abs(fcur) < np.abs(fpre))
+            secant_step = -fcur * (xcur - xpre) / (fcur - fpre)
+            dpre = (fpre - fcur) / (xpre - xcur)
+            dblk = (fblk - fcur) / (xblk - xcur)
+            iqi_step = -fcur * (fblk * dblk - fpre * dpre) / (dblk * dpre * (fblk - fpre))
+            stry = np.where(xpre == xblk, secant_step, iqi_step)
+            good = interp & (2 * np.abs(stry) < np.minimum(np.abs(spre), 3 * np.abs(sbis) - delta))
+            spre = np.where(active, np.where(good, scur, sbis), spre)
+            scur = np.where(active, np.where(good, stry, sbis), scur)
+            xpre, fpre = np.where(active, xcur, xpre), np.where(active, fcur, fpre)
+            step = np.where(np.abs(scur) > delta, scur, np.where(sbis > 0, delta, -delta))
+            xcur = np.where(active, xcur + step, xcur)
+            fcur = np.where(active, f(xcur), fcur)
+            it += active
+    return xcur, it, conv, bad
+
+def fixed_point(f, a, b, tol, maxiter, df=None):
+    """x = g(x) with g(x) = x - f(x)/m, m = f'(x0) (relaxed Picard iteration from the midpoint)."""
+    a, b, tol = _prep(a, b, tol)
+    x = (a + b) / 2
+    m = (df or (lambda t: _num_diff(f, t)))(x)
+    m = np.where(np.abs(m) < 1e-12, 1.0, m)
+    it = np.zeros(x.shape, int)
+    conv = np.zeros(x.shape, bool)
+    active = np.ones(x.shape, bool)
+    with np.errstate(over="ignore", invalid="ignore"):
+        for _ in range(maxiter):
+            if not active.any(): break
+            xn = x - f(x) / m
+            ok = np.isfinite(xn)
+            done = ok & (np.abs(xn - x) < tol)
+            x = np.where(active & ok, xn, x)
+            conv |= active & done
+            active &= ok & ~done
+            it += active
+    return x, it, conv, None
+
+def muller(f, a, b, tol, maxiter, df=None):
+    a, b, tol = _prep(a, b, tol)
+    x0, x1, x2 = a.astype(complex), b.astype(complex), ((a + b) / 2).astype(complex)
+    f0, f1, f2 = f(x0), f(x1), f(x2)
+    it = np.zeros(a.shape, int)
+    conv = np.zeros(a.shape, bool)
+    active = np.ones(a.shape, bool)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for _ in range(maxiter):
+            if not active.any(): break
+            h1, h2 = x1 - x0, x2 - x1
+            d1, d2 = (f1 - f0) / h1, (f2 - f1) / h2
+            A = (d2 - d1) / (h2 + h1)
+            B = A * h2 + d2
+            D = np.sqrt(B * B - 4 * f2 * A)
+            E = np.where(np.abs(B - D) < np.abs(B + D), B + D, B - D)
+            x3 = x2 - 2 * f2 / E
+            ok = np.isfinite(x3)
+            f3 = f(x3)
+            done = ok & (np.abs(x3 - x2) < tol)
+            upd = active & ok
+            x0, f0 = np.where(upd, x1, x0), np.where(upd, f1, f0)
+            x1, f1 = np.where(upd, x2, x1), np.where(upd, f2, f1)
+            x2, f2 = np.where(upd, x3, x2), np.where(upd, f3, f2)
+            conv |= active & done
+            active &= ok & ~done
+            it += active
+    return x2, it, conv, None  # nghiệm phức: solve() bỏ converged
+
+METHODS: Dict[str, Callable] = {
+    "Bisection": bisection, "Regula Falsi": regula_falsi, "Secant": secant,
+    "Newton-Raphson": newton_raphson, "Brentq": brentq, "Fixed-point": fixed_point, "Muller": muller,
+}
+
+def solve(method: str, f: Callable, a, b, tol=1e-6, maxiter: int = 200, df: Optional[Callable] = None) -> Dict[str, Array]:
+    """Batched solve. Returns arrays: root, iterations, residual, converged, bad_bracket, complex_root."""
+    name = match_method(method)
+    if name is None:
+        raise ValueError(f"unsupported root-finding method: {method}")
+    x, it, conv, bad = METHODS[name](f, a, b, tol, maxiter, df)
+    # Muller có thể hội tụ tới nghiệm phức: không tính là nghiệm thực
+    cplx = conv & (np.abs(np.imag(x)) > np.maximum(np.asarray(tol, float), 1e-12))
+    x = np.real(x)
+    with np.errstate(all="ignore"):
+        res = np.abs(f(x))
+    bad = np.zeros(x.shape, bool) if bad is None else bad
+    return {"root": x, "iterations": it, "residual": res, "converged": conv & ~cplx & ~bad, "bad_bracket": bad,
+            "complex_root": cplx}
+
+def run_method(method: str, f: Callable, a, b, tol=1e-6, maxiter: int = 200, df: Optional[Callable] = None) -> List[dict]:
+    """One metrics dict per bracket, same keys as the sandbox JSON line."""
+    out = solve(method, f, a, b, tol, maxiter, df)
+    results = []
+    for i in range(out["root"].size):
+        r = {"method": method, "success": bool(out["converged"][i]), "iterations": int(out["iterations"][i]),
+             "result": float(out["root"][i]), "residual": float(out["residual"][i]), "engine": "native"}
+        if out["bad_bracket"][i]:
+            r.update({"success": False, "error": "No bracket"})
+        elif out["complex_root"][i]:
+            r["error"] = f"converged to a complex value at iteration {r['iterations'] + 1}"
+        elif not r["success"] and r["iterations"] < maxiter and match_method(method) == "Bisection":
+            r["error"] = f"bracket collapsed with |f(x)| = {r['residual']:.3g} above tol {tol:g} (discontinuity?)"
+        elif not r["success"] and r["iterations"] < maxiter:
+            # secant / Newton / fixed-point / Muller dừng sớm khi bước lặp cho giá trị không hữu hạn
+            r["error"] = f"diverged (non-finite value) at iteration {r['iterations'] + 1}"
+        elif not r["success"]:
+            r["error"] = f"no convergence in {maxiter} iterations"
+        if not np.isfinite(r["result"]) or not np.isfinite(r["residual"]):
+            r.update({"success": False, "result": None, "residual": None, "error": r.get("error") or "non-finite"})
+        results.append(r)
+    return results
+
+def parse_interval(domain_hint: Optional[str]) -> Optional[Tuple[float, float]]:
+    """'(1,2)' / '[1, 2]' -> (1.0, 2.0)."""
+    if not domain_hint:
+        return None
+    m = re.search(r"([-+]?[\d.]+(?:e[-+]?\d+)?)\s*[,;]\s*([-+]?[\d.]+(?:e[-+]?\d+)?)", str(domain_hint), re.I)
+    if not m:
+        return None
+    try:
+        return float(m.group(1)), float(m.group(2))
+    except ValueError:
+        return None
+
+if __name__ == "__main__":
+    f = make_func("x**3 - x - 1")
+    for name in METHODS:
+        print(json.dumps(run_method(name, f, 1.0, 2.0, tol=1e-6)[0]))
@@ -0,0 +1,325 @@
+# sandbox_pool.py
+"""
+Warm sandbox pool used by tools.execute_python_raw.
+
+Backends share one small interface (run_code / install / reset / is_alive / close):
+  - "e2b":   remote E2B code-interpreter sandbox
+  - "local": persistent Python worker subprocess (offline tests / benchmarks)
+Sandboxes are pre-warmed (numpy/scipy/sympy imported), checked out around each call,
+reset on return and evicted after `idle_ttl` seconds idle or when a health check fails.
+"""
+import functools, json, os, subprocess, sys, threading, time, queue
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Optional, Callable, Dict, List
+import instrumentation
+
+PREWARM_CODE = "import numpy, scipy, sympy, math, json"
+
+@dataclass
+class ExecResult:
+    stdout: str = ""
+    text: Optional[str] = None
+    error: Optional[str] = None  # traceback nếu lỗi
+
+class SandboxBackend:
+    name = "base"
+    can_install = True  # install() được phép (LocalSandbox: chỉ khi bật rõ ràng)
+    def run_code(self, code: str, timeout: Optional[float] = None) -> ExecResult: raise NotImplementedError
+    def install(self, command: str) -> None: raise NotImplementedError
+    def reset(self) -> None: raise NotImplementedError
+    def is_alive(self) -> bool: raise NotImplementedError
+    def close(self) -> None: raise NotImplementedError
+
+class E2BSandbox(SandboxBackend):
+    name = "e2b"
+    def __init__(self):
+        from e2b_code_interpreter import Sandbox
+        self._sb = Sandbox.create()
+        self._closed = False
+
+    def run_code(self, code: str, timeout: Optional[float] = None) -> ExecResult:
+        try:
+            execution = self._sb.run_code(code, timeout=timeout) if timeout else self._sb.run_code(code)
+        except Exception as e:
+            if "timeout" not in type(e).__name__.lower():
+                raise
+            # như LocalSandbox: kernel có thể vẫn đang chạy code -> bỏ sandbox (release() sẽ không trả lại pool)
+            self.close()
+            return ExecResult(error=f"TimeoutError: execution exceeded {timeout}s")
+        output = getattr(execution.logs, "stdout", "")
+        if isinstance(output, list):
+            output = "".join(str(line) for line in output)
+        err = execution.error.traceback if execution.error else None
+        return ExecResult(stdout=output or "", text=getattr(execution, "text", None), error=err)
+
+    def install(self, command: str) -> None:
+        self._sb.commands.run(command)
+
+    def reset(self) -> None:
+        self._sb.run_code("%reset -f")
+
+    def is_alive(self) -> bool:
+        if self._closed:
+            return False
+        try:
+            return bool(self._sb.is_running())
+        except Exception:
+            return False
+
+    def close(self) -> None:
+        self._closed = True
+        try:
+            self._sb.kill()
+        except Exception:
+            pass
+
+# worker: giữ globals giữa các lần exec, giao tiếp JSON lines qua fd riêng
+_WORKER_SRC = r'''
+import sys, os, io, json, traceback, contextlib
+proto = os.fdopen(os.dup(1), "w")
+os.dup2(2, 1)
+sys.stdout = os.fdopen(1, "w")
+g = {"__name__": "__main__"}
+for line in sys.stdin:
+    req = json.loads(line)
+    if req["op"] == "reset":
+        g.clear(); g["__name__"] = "__main__"
+        proto.write(json.dumps({"stdout": "", "error": None}) + "\n"); proto.flush()
+        continue
+    out, err = io.StringIO(), None
+    try:
+        with contextlib.redirect_stdout(out):
+            exec(compile(req["code"], "<sandbox>", "exec"), g)
+    except BaseException:
+        err = traceback.format_exc()
+    proto.write(json.dumps({"stdout": out.getvalue(), "error": err}) + "\n"); proto.flush()
+'''
+
+class LocalSandbox(SandboxBackend):
+    """
+    Stateful local interpreter in a subprocess. Not isolated: only for trusted/offline use.
+    install() runs pip of `python` and is refused unless allow_install=True (SANDBOX_LOCAL_INSTALL=1):
+    with the default interpreter it would install LLM-chosen packages into this very environment.
+    """
+    name = "local"
+    def __init__(self, python: str = sys.executable, allow_install: bool = False):
+        self._python = python
+        self.can_install = allow_install
+        self._proc = subprocess.Popen([python, "-u", "-c", _WORKER_SRC], stdin=subprocess.PIPE,
+                                      stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        self._replies: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        threading.Thread(target=self._read, daemon=True).start()
+
+    def _read(self):
+        for line in self._proc.stdout:
+            self._replies.put(line)
+        self._replies.put(None)
+
+    def _call(self, req: dict, timeout: Optional[float]) -> ExecResult:
+        with self._lock:
+            self._proc.stdin.write(json.dumps(req) + "\n")
+            self._proc.stdin.flush()
+            try:
+                line = self._replies.get(timeout=timeout)
+            except queue.Empty:
+                self.close()
+                return ExecResult(error=f"TimeoutError: execution exceeded {timeout}s")
+        if line is None:
+            return ExecResult(error="RuntimeError: sandbox worker exited")
+        data = json.loads(line)
+        return ExecResult(stdout=data["stdout"], error=data["error"])
+
+    def run_code(self, code: str, timeout: Optional[float] = None) -> ExecResult:
+        return self._call({"op": "exec", "code": code}, timeout)
+
+    def install(self, command: str) -> None:
+        if not self.can_install:
+            raise PermissionError("package installs are disabled for the local sandbox (SANDBOX_LOCAL_INSTALL=1)")
+        args = command.split()
+        if args[:2] != ["pip", "install"]:
+            raise ValueError(f"unsupported install command: {command}")
+        subprocess.run([self._python, "-m", "pip", "install", "-q", *args[2:]], check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def reset(self) -> None:
+        self._call({"op": "reset"}, timeout=10)
+
+    def is_alive(self) -> bool:
+        # poll() trả về None khi thread khác đang wait() trong close(): dựa vào cờ _closed trước
+        return not self._closed and self._proc.poll() is None
+
+    def close(self) -> None:
+        self._closed = True
+        if self._proc.poll() is None:
+            self._proc.kill()
+            self._proc.wait()
+
+BACKENDS: Dict[str, Callable[[], SandboxBackend]] = {"e2b": E2BSandbox, "local": LocalSandbox}
+
+class SandboxPool:
+    """
+    Keep up to `size` warm idle sandboxes. acquire() hands out an idle healthy one (or creates
+    a new one when the pool is empty); release() resets it and puts it back, or closes it when
+    it is unhealthy / the pool is full. Idle sandboxes older than `idle_ttl` are evicted by a
+    background reaper (and on acquire/release); close() stops it and closes every idle sandbox.
+    """
+    def __init__(self, factory: Callable[[], SandboxBackend], size: int = 2, idle_ttl: float = 240.0,
+                 prewarm_code: Optional[str] = PREWARM_CODE, rate_limiter=None):
+        self.factory = factory
+        self.rate_limiter = rate_limiter  # giới hạn tốc độ tạo sandbox mới (acquire() blocking)
+        self.size = size
+        self.idle_ttl = idle_ttl
+        self.prewarm_code = prewarm_code
+        self._idle: List[tuple] = []  # (sandbox, idle_since)
+        self._lock = threading.Lock()
+        self.stats = {"created": 0, "reused": 0, "evicted": 0, "unhealthy": 0}  # cập nhật dưới _lock
+        self._closed = threading.Event()
+        if idle_ttl > 0:
+            threading.Thread(target=self._reap, name="sandbox-reaper", daemon=True).start()
+
+    def _bump(self, key: str, n: int = 1):
+        with self._lock:
+            self.stats[key] += n
+
+    def _reap(self):
+        # kiểm tra vài lần trong mỗi idle_ttl, dừng khi pool đóng
+        while not self._closed.wait(max(1.0, min(60.0, self.idle_ttl / 4))):
+            try:
+                self._evict_idle()
+            except Exception:
+                pass
+
+    def _create(self) -> SandboxBackend:
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        t0 = time.perf_counter()
+        sb = self.factory()
+        self._bump("created")
+        if self.prewarm_code:
+            sb.run_code(self.prewarm_code)
+        instrumentation.record_call("sandbox_create", sb.name, time.perf_counter() - t0)
+        return sb
+
+    def _evict_idle(self):
+        now = time.monotonic()
+        with self._lock:
+            keep, drop = [], []
+            for sb, since in self._idle:
+                (drop if now - since > self.idle_ttl else keep).append((sb, since))
+            self._idle = keep
+            self.stats["evicted"] += len(drop)
+        for sb, _ in drop:
+            sb.close()
+
+    def prewarm(self, n: Optional[int] = None, background: bool = True):
+        """Fill the idle list up to `n` (default `size`) sandboxes."""
+        def fill():
+            with self._lock:
+                missing = max(0, (n or self.size) - len(self._idle))
+            for _ in range(missing):
+                sb = self._create()
+                with self._lock:
+                    closed = self._closed.is_set()
+                    if not closed:
+                        self._idle.append((sb, time.monotonic()))
+                if closed:
+                    sb.close()
+                    return
+        if background:
+            threading.Thread(target=fill, daemon=True).start()
+        else:
+            fill()
+
+    def acquire(self) -> SandboxBackend:
+        self._evict_idle()
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                sb, _ = self._idle.pop()
+            if sb.is_alive():
+                self._bump("reused")
+                instrumentation.count("sandbox_reused")
+                return sb
+            self._bump("unhealthy")
+            sb.close()
+        return self._create()
+
+    def release(self, sb: SandboxBackend, healthy: bool = True):
+        if healthy and sb.is_alive():
+            try:
+                sb.reset()
+                if self.prewarm_code:
+                    sb.run_code(self.prewarm_code)
+            except Exception:
+                healthy = False
+            with self._lock:
+                keep = healthy and not self._closed.is_set() and len(self._idle) < self.size
+                if keep:
+                    self._idle.append((sb, time.monotonic()))
+            if keep:
+                self._evict_idle()
+                return
+        sb.close()
+
+    @contextmanager
+    def checkout(self):
+        sb = self.acquire()
+        ok = False
+        try:
+            yield sb
+            ok = True
+        finally:
+            self.release(sb, healthy=ok)
+
+    def close(self):
+        self._closed.set()
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for sb, _ in idle:
+            sb.close()
+
+_POOL: Optional[SandboxPool] = None
+_POOL_LOCK = threading.Lock()
+
+def get_pool() -> SandboxPool:
+    """Process-wide pool configured from settings (SANDBOX_BACKEND, SANDBOX_POOL_SIZE, SANDBOX_IDLE_TTL)."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            from settings import SANDBOX_BACKEND, SANDBOX_POOL_SIZE, SANDBOX_IDLE_TTL, SANDBOX_LOCAL_INSTALL, \
+                get_sandbox_rate_limiter
+            factory = BACKENDS[SANDBOX_BACKEND]
+            if factory is LocalSandbox:
+                factory = functools.partial(LocalSandbox, allow_install=SANDBOX_LOCAL_INSTALL)
+            _POOL = SandboxPool(factory, size=SANDBOX_POOL_SIZE, idle_ttl=SANDBOX_IDLE_TTL,
+                                rate_limiter=get_sandbox_rate_limiter())
+            _POOL.prewarm()
+        return _POOL
+
+if __name__ == "__main__":
+    # quick offline benchmark: cold sandbox per call vs pooled
+    import argparse
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--backend", default="local", choices=sorted(BACKENDS))
+    ap.add_argument("-n", type=int, default=10)
+    args = ap.parse_args()
+    code = "import numpy as np\nprint(np.linalg.norm(np.arange(10.0)))"
+    t = time.perf_counter()
+    for _ in range(args.n):
+        sb = BACKENDS[args.backend]()
+        sb.run_code(code)
+        sb.close()
+    cold = time.perf_counter() - t
+    pool = SandboxPool(BACKENDS[args.backend], size=2)
+    pool.prewarm(background=False)
+    t = time.perf_counter()
+    for _ in range(args.n):
+        with pool.checkout() as sb:
+            sb.run_code(code)
+    warm = time.perf_counter() - t
+    pool.close()
+    print(f"{args.backend}: cold {cold / args.n * 1000:.1f} ms/call, pooled {warm / args.n * 1000:.1f} ms/call, stats={pool.stats}")
@@ -1,12 +1,144 @@
 # settings.py
 from dotenv import load_dotenv
-import os
-from langchain_google_genai import ChatGoogleGenerativeAI
+import os, threading
 
 load_dotenv()
+# "gemini" | "mock" (scripted replay for offline benchmarks, see benchmark/mock_llm.py)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
-    raise RuntimeError("GEMINI_API_KEY chưa được thiết lập trong .env")
 
-# shared LLM
-LLM = ChatGoogleGenerativeAI(model="gemini-2.0-flash", api_key=GEMINI_API_KEY, temperature=0)
\ No newline at end of file
+# Chỉ giá trị cấu hình được đọc khi import; LLM, rate limiter, cache SQLite, step store và method KB dựng lười
+# qua các hàm get_*() (lần gọi đầu, dùng chung cả process, như sandbox_pool.get_pool), nên import settings
+# hay problem_classifier không ghi gì xuống đĩa
+_SHARED: dict = {}
+_SHARED_LOCK = threading.RLock()
+
+def _shared(name: str, build):
+    with _SHARED_LOCK:
+        if name not in _SHARED:
+            _SHARED[name] = build()
+        return _SHARED[name]
+
+# shared token-bucket limiters (Gemini requests, sandbox creation); batch.py có thể chỉnh requests_per_second
+def get_gemini_rate_limiter():
+    from langchain_core.rate_limiters import InMemoryRateLimiter
+    return _shared("gemini_rate_limiter", lambda: InMemoryRateLimiter(
+        requests_per_second=float(os.getenv("GEMINI_RPS", "4")),
+        check_every_n_seconds=0.05, max_bucket_size=float(os.getenv("GEMINI_BURST", "4"))))
+
+def get_sandbox_rate_limiter():
+    from langchain_core.rate_limiters import InMemoryRateLimiter
+    return _shared("sandbox_rate_limiter", lambda: InMemoryRateLimiter(
+        requests_per_second=float(os.getenv("SANDBOX_CREATE_RPS", "1")),
+        check_every_n_seconds=0.05, max_bucket_size=float(os.getenv("SANDBOX_CREATE_BURST", "2"))))
+
+def _build_llm():
+    from instrumentation import LLM_CALLBACK
+    if LLM_BACKEND == "mock":
+        from benchmark.mock_llm import ScriptedChatModel
+        return ScriptedChatModel.from_env(callbacks=[LLM_CALLBACK])
+    if not GEMINI_API_KEY:
+        raise RuntimeError("GEMINI_API_KEY chưa được thiết lập trong .env")
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI(model="gemini-2.0-flash", api_key=GEMINI_API_KEY, temperature=0,
+                                  rate_limiter=get_gemini_rate_limiter(), callbacks=[LLM_CALLBACK])
+
+def get_llm():
+    """Shared chat model (Gemini, or the scripted mock when LLM_BACKEND=mock)."""
+    return _shared("llm", _build_llm)
+
+# cached LLM for plain-prompt calls (classifier, researcher, planner, validator, install command);
+# the ReAct agent and final prompt keep using get_llm() directly
+LLM_CACHE = os.getenv("LLM_CACHE", "1") != "0"
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", ".cache")
+
+def _build_cached_llm():
+    from llm_cache import CachedLLM, MemoryLRU, DiskCache
+    return CachedLLM(
+        get_llm(),
+        memory=MemoryLRU(int(os.getenv("LLM_CACHE_MEMORY", "512"))),
+        disk=DiskCache(os.path.join(LLM_CACHE_DIR, "llm.sqlite"),
+                       ttl=float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600))),
+                       max_bytes=int(float(os.getenv("LLM_CACHE_MAX_MB", "200")) * 1024 * 1024)) if LLM_CACHE else None,
+        enabled=LLM_CACHE,
+    )
+
+def get_cached_llm():
+    return _shared("cached_llm", _build_cached_llm)
+
+# problem_classifier: skip the LLM when the rule-based classifier is at least this confident (> 1 = always ask the LLM)
+CLASSIFY_RULE_THRESHOLD = float(os.getenv("CLASSIFY_RULE_THRESHOLD", "0.8"))
+
+# validation mode for Validator.validate_methods: "sequential" | "concurrent" | "race"
+VALIDATION_MODE = os.getenv("VALIDATION_MODE", "concurrent")
+
+# sandbox pool (see sandbox_pool.py): backend "e2b" | "local"
+SANDBOX_BACKEND = os.getenv("SANDBOX_BACKEND", "e2b")
+SANDBOX_POOL_SIZE = int(os.getenv("SANDBOX_POOL_SIZE", "2"))
+SANDBOX_IDLE_TTL = float(os.getenv("SANDBOX_IDLE_TTL", "240"))
+# local backend only: let the sandbox pip-install missing modules (into the worker's interpreter, i.e. this environment)
+SANDBOX_LOCAL_INSTALL = os.getenv("SANDBOX_LOCAL_INSTALL", "0") == "1"
+# persistent sessions (tools.open_session) unused this long are released back to the pool; 0 disables
+SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", "900"))
+# web research tools for the execution agent (langchain load_tools names); SEARCH_TOOLS="" disables them
+SEARCH_TOOLS = [t.strip() for t in os.getenv("SEARCH_TOOLS", "ddg-search,arxiv,wikipedia").split(",") if t.strip()]
+# research layer wrapping them (see research.py): remote answers cached on disk with TTL; the local notes
+# answer alone when they cover at least RESEARCH_LOCAL_MIN_COVERAGE of the query terms
+def _build_research_cache():
+    if os.getenv("RESEARCH_CACHE", "1") == "0":
+        return None
+    from llm_cache import DiskCache
+    return DiskCache(os.path.join(LLM_CACHE_DIR, "research.sqlite"),
+                     ttl=float(os.getenv("RESEARCH_CACHE_TTL", str(3 * 24 * 3600))))
+
+def get_research_cache():
+    return _shared("research_cache", _build_research_cache)
+
+RESEARCH_TIMEOUT = float(os.getenv("RESEARCH_TIMEOUT", "20"))
+RESEARCH_LOCAL_MIN_COVERAGE = float(os.getenv("RESEARCH_LOCAL_MIN_COVERAGE", "0.6"))
+# notes appended to remote answers only when their BM25 score reaches this (weak matches like a shared "one" dropped)
+RESEARCH_NOTES_MIN_SCORE = float(os.getenv("RESEARCH_NOTES_MIN_SCORE", "3.5"))
+
+# step execution context (see step_context.py): "full" resends every earlier result to the agent,
+# "compact" fits them into CONTEXT_BUDGET chars (full outputs kept in get_step_store()),
+# "fused" = compact + consecutive compute-only steps run in one agent round-trip
+EXECUTION_MODE = os.getenv("EXECUTION_MODE", "full")
+CONTEXT_BUDGET = int(os.getenv("CONTEXT_BUDGET", "4000"))
+STEP_RESULT_MAX = int(os.getenv("STEP_RESULT_MAX", "2000"))  # chars of one step result kept in the graph state
+STEP_FUSION_MAX = int(os.getenv("STEP_FUSION_MAX", "4"))
+
+def _build_step_store():
+    if EXECUTION_MODE == "full":
+        return None
+    from llm_cache import DiskCache
+    from step_context import StepStore
+    return StepStore(DiskCache(
+        os.path.join(LLM_CACHE_DIR, "steps.sqlite"),
+        ttl=float(os.getenv("STEP_STORE_TTL", str(7 * 24 * 3600))),
+        max_bytes=int(float(os.getenv("STEP_STORE_MAX_MB", "100")) * 1024 * 1024)))
+
+def get_step_store():
+    return _shared("step_store", _build_step_store)
+
+# durable graph checkpoints (see checkpoint.py); CHECKPOINT=0 disables them
+CHECKPOINT = os.getenv("CHECKPOINT", "1") != "0"
+CHECKPOINT_DB = os.getenv("CHECKPOINT_DB", os.path.join(LLM_CACHE_DIR, "checkpoints.sqlite"))
+CHECKPOINT_MAX_AGE_DAYS = float(os.getenv("CHECKPOINT_MAX_AGE_DAYS", "14")) or None  # gc khi mở DB; 0 = không giới hạn
+CHECKPOINT_MAX_MB = float(os.getenv("CHECKPOINT_MAX_MB", "500")) or None
+
+# knowledge base of past validation outcomes (see method_kb.py); METHOD_KB=0 disables ranking/pruning
+METHOD_KB_DB = os.getenv("METHOD_KB_DB", os.path.join(LLM_CACHE_DIR, "method_kb.sqlite"))
+
+def _build_method_kb():
+    if os.getenv("METHOD_KB", "1") == "0":
+        return None
+    from method_kb import MethodKB
+    return MethodKB(METHOD_KB_DB,
+                    min_runs=int(os.getenv("METHOD_KB_MIN_RUNS", "5")),            # số lần chạy tối thiểu trước khi prune
+                    min_success=float(os.getenv("METHOD_KB_MIN_SUCCESS", "0.1")),  # prune nếu tỉ lệ thành công thấp hơn
+                    window=int(os.getenv("METHOD_KB_WINDOW", "50")),               # tỉ lệ tính trên N lần chạy gần nhất
+                    explore_every=int(os.getenv("METHOD_KB_EXPLORE_EVERY", "10")), # chạy lại phương pháp bị prune sau N lần bỏ qua
+                    max_rows=int(os.getenv("METHOD_KB_MAX_ROWS", "200000")))
+
+def get_method_kb():
+    return _shared("method_kb", _build_method_kb)
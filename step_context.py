@@ -0,0 +1,104 @@
+# step_context.py
+"""
+Bounded step context for the execution loop (EXECUTION_MODE = "compact" | "fused").
+
+- Step outputs are kept in full out of band (a DiskCache keyed by "<session>:<step>"); the graph state
+  and the prompts only carry compacted copies. Earlier results share a fixed character budget: the newest
+  gets half, the one before a quarter, ...; once a share would drop below `floor`, the older results are
+  replaced by one summary line. Long outputs keep their head and tail lines, so iteration tables keep
+  their header and last rows.
+- is_compute_step() flags plan steps that only need code execution; consecutive ones are fused into one
+  agent round-trip / one sandbox execution and the output is split back per step by "### STEP k" markers.
+"""
+import re
+from typing import Dict, List, Optional, Sequence
+
+FUSED_MARKER = "### STEP {}"
+_MARKER_RE = re.compile(r"^### STEP (\d+)\s*$", re.M)
+
+def approx_tokens(text: str) -> int:
+    return len(text) // 4  # ~4 ký tự / token, đủ để so sánh tương đối
+
+def compact(text: str, limit: int, ref: Optional[str] = None) -> str:
+    """Trim `text` to about `limit` chars, keeping head (~2/3) and tail (~1/3) lines."""
+    text = text or ""
+    if len(text) <= limit:
+        return text
+    where = f", đầy đủ: {ref}" if ref else ""
+    lines = text.splitlines()
+    if len(lines) < 3:
+        head, tail = text[:limit * 2 // 3], text[-(limit // 3):]
+        return f"{head} ... [{len(text) - len(head) - len(tail)} ký tự bị lược{where}] ... {tail}"
+    head, size = [], 0
+    for line in lines:
+        if head and size + len(line) + 1 > limit * 2 // 3:
+            break
+        head.append(line)
+        size += len(line) + 1
+    tail, size = [], 0
+    for line in reversed(lines[len(head):]):
+        if tail and size + len(line) + 1 > limit // 3:
+            break
+        tail.insert(0, line)
+        size += len(line) + 1
+    skipped = len(lines) - len(head) - len(tail)
+    if skipped <= 0:
+        return text
+    return "\n".join(head + [f"... [{skipped} dòng bị lược{where}] ..."] + tail)
+
+def fit_results(results: Sequence[str], budget: int, floor: int = 160) -> List[str]:
+    """
+    Compact earlier step results into ~`budget` chars, newest first (1/2, 1/4, ... of the budget).
+    Results whose share would fall below `floor` become "" except the newest of them, which carries one
+    summary line for all, so the total stays bounded however many steps ran.
+    """
+    out, share = [], budget / 2
+    for i in reversed(range(len(results))):
+        if share < floor and out:
+            # các bước cũ hơn: một dòng tóm tắt thay cho từng kết quả
+            span = f"1-{i + 1}" if i else "1"
+            return [""] * i + [f"[kết quả bước {span} đã lược, đầy đủ trong step store]"] + out[::-1]
+        out.append(compact(results[i], max(floor, int(share)) if not out else int(share), ref=f"step {i + 1}"))
+        share /= 2
+    return out[::-1]
+
+class StepStore:
+    """Full step outputs, out of band (any get/set store, e.g. llm_cache.DiskCache)."""
+    def __init__(self, backend):
+        self.backend = backend
+
+    def put(self, session_id: str, step: int, output: str) -> None:
+        self.backend.set(f"{session_id}:{step}", output)
+
+    def get(self, session_id: str, step: int) -> Optional[str]:
+        return self.backend.get(f"{session_id}:{step}")
+
+_RESEARCH_RE = re.compile(r"tìm hiểu|tra cứu|nghiên cứu|tham khảo|giải thích|nhận xét|kết luận|trình bày|so sánh|"
+                          r"search|arxiv|wikipedia|research|look up|explain|discuss|compare", re.I)
+_COMPUTE_RE = re.compile(r"run_code|```|\btính|\blặp|\bgiải|định nghĩa|khai báo|\blập|áp dụng|\bprint\s*\(|"
+                         r"\bquét|\bchia|compute|calculate|evaluate|iterate|define|solve|implement|\bcode", re.I)
+
+def is_compute_step(step: str) -> bool:
+    """True for steps that only need code to run (no research / prose answer)."""
+    return bool(_COMPUTE_RE.search(step)) and not _RESEARCH_RE.search(step)
+
+def fusable_group(steps: Sequence[str], idx: int, max_steps: int = 4) -> List[int]:
+    """Indices of the consecutive compute-only steps starting at `idx` (just [idx] otherwise)."""
+    group = [idx]
+    if is_compute_step(steps[idx]):
+        j = idx + 1
+        while j < len(steps) and len(group) < max_steps and is_compute_step(steps[j]):
+            group.append(j)
+            j += 1
+    return group
+
+def split_fused_output(output: str, step_numbers: Sequence[int]) -> Optional[List[str]]:
+    """Split a fused execution's stdout on "### STEP k" markers; None when no marker was printed."""
+    marks = list(_MARKER_RE.finditer(output or ""))
+    if not marks:
+        return None
+    parts: Dict[int, str] = {}
+    for i, m in enumerate(marks):
+        end = marks[i + 1].start() if i + 1 < len(marks) else len(output)
+        parts[int(m.group(1))] = output[m.end():end].strip()
+    return [parts.get(k, "") or "No output" for k in step_numbers]
@@ -0,0 +1,13 @@
+# tests/conftest.py
+# offline env, đặt trước khi import settings: mock LLM, sandbox local, không search, cache vào thư mục tạm
+import os, sys, tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ.setdefault("LLM_BACKEND", "mock")
+os.environ.setdefault("SANDBOX_BACKEND", "local")
+os.environ["SEARCH_TOOLS"] = ""
+os.environ.setdefault("LLM_CACHE", "0")
+os.environ.setdefault("LLM_CACHE_DIR", tempfile.mkdtemp(prefix="nm-tests-"))
+os.environ.setdefault("MOCK_LLM_CORPUS", os.path.join(ROOT, "benchmark", "corpus.jsonl"))
@@ -0,0 +1,94 @@
+import asyncio, operator, sqlite3, sys, time, types
+from typing import Annotated, TypedDict
+import pytest
+from langgraph.graph import StateGraph, START, END
+from checkpoint import gc, invoke_checkpointed, list_runs, main, open_checkpointer, task_hash
+
+
+class S(TypedDict, total=False):
+    task: str
+    trail: Annotated[list, operator.add]
+
+
+def _graph(calls, fail_b, checkpointer=None):
+    def a(state):
+        calls.append("a")
+        return {"trail": ["a"]}
+
+    def b(state):
+        calls.append("b")
+        if fail_b:
+            fail_b.pop()
+            raise RuntimeError("sandbox timeout")
+        return {"trail": ["b"]}
+
+    g = StateGraph(S)
+    g.add_node("a", a); g.add_node("b", b)
+    g.add_edge(START, "a"); g.add_edge("a", "b"); g.add_edge("b", END)
+    return g.compile(checkpointer=checkpointer)
+
+
+def test_task_hash_ignores_surrounding_space():
+    assert task_hash(" x = 1 ") == task_hash("x = 1")
+
+
+def test_resume_continues_from_last_node(tmp_path):
+    db = str(tmp_path / "ck.sqlite")
+    calls = []
+
+    async def go():
+        async with open_checkpointer(db) as (saver, ledger):
+            graph = _graph(calls, [True], saver)
+            with pytest.raises(RuntimeError):
+                await invoke_checkpointed(graph, "task", ledger)
+            row = await ledger.latest_unfinished("task")
+            assert row["status"] == "error" and row["last_node"] == "a"
+            tid, state = await invoke_checkpointed(graph, "task", ledger, resume=True)
+            assert tid == row["thread_id"]
+            assert (await ledger.get(tid))["status"] == "done"
+            return state
+
+    state = asyncio.run(go())
+    assert state["trail"] == ["a", "b"]
+    assert calls == ["a", "b", "b"]  # node a không chạy lại
+    assert [r["status"] for r in list_runs(db)] == ["done"]
+
+
+def test_on_abort_only_without_checkpointer():
+    aborted = []
+
+    async def on_abort(state):
+        aborted.append(state)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(invoke_checkpointed(_graph([], [True]), "task", on_abort=on_abort))
+    assert aborted and aborted[0]["trail"] == ["a"]
+
+
+def test_gc_drops_old_threads(tmp_path):
+    db = str(tmp_path / "ck.sqlite")
+
+    async def go():
+        async with open_checkpointer(db) as (saver, ledger):
+            graph = _graph([], [], saver)
+            await invoke_checkpointed(graph, "old", ledger)
+            await invoke_checkpointed(graph, "new", ledger)
+
+    asyncio.run(go())
+    con = sqlite3.connect(db)
+    con.execute("UPDATE runs SET updated=? WHERE task='old'", (time.time() - 30 * 86400,))
+    con.commit(); con.close()
+    assert gc(db, max_age_days=7) == {"threads_removed": 1}
+    assert [r["task"] for r in list_runs(db)] == ["new"]
+    assert gc(str(tmp_path / "missing.sqlite"), 1) == {"threads_removed": 0}
+
+
+def test_cli_resume_uses_db(tmp_path, monkeypatch):
+    seen = {}
+
+    async def resume_task(thread_id, report_path=None, db=None):
+        seen.update(thread_id=thread_id, db=db)
+
+    monkeypatch.setitem(sys.modules, "main", types.SimpleNamespace(resume_task=resume_task))
+    main(["--db", str(tmp_path / "other.sqlite"), "resume", "abc:123"])
+    assert seen == {"thread_id": "abc:123", "db": str(tmp_path / "other.sqlite")}
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+from expr_compiler import UnsafeExpression, check_expr, compile_expr, evaluate_constant, normalize, try_compile
+
+
+def test_normalize():
+    assert normalize("f(x) = x^3 - x - 1 = 0") == "x**3 - x - 1"
+    assert normalize("3x + 2 = x") == "(3*x + 2) - (x)"
+    assert normalize("x − 1") == "x - 1"
+
+
+def test_compile_vectorized_with_derivatives():
+    c = compile_expr("np.sin(x) + x**2")
+    x = np.array([0.0, 1.0, 2.0])
+    assert np.allclose(c.f(x), np.sin(x) + x ** 2)
+    assert np.allclose(c.df(x), np.cos(x) + 2 * x, atol=1e-6)
+    assert np.allclose(c.d2f(x), -np.sin(x) + 2, atol=1e-4)
+
+
+def test_constant_derivative_broadcasts():
+    c = compile_expr("2*x + 1")
+    assert c.df(np.zeros(4)).shape == (4,)
+
+
+def test_compile_is_memoized():
+    assert compile_expr("x**2 - 2") is compile_expr("x^2 - 2")
+
+
+def test_two_variables():
+    c = compile_expr("t*y + 1", variables=("t", "y"))
+    assert c.f(2.0, 3.0) == pytest.approx(7.0)
+
+
+@pytest.mark.parametrize("expr", ["__import__('os').system('true')", "x.__class__", "open('f')", "lambda: 1",
+                                  "sin(x, 2)", "y + 1"])
+def test_rejects_unsafe(expr):
+    with pytest.raises(UnsafeExpression):
+        compile_expr(expr)
+    assert try_compile(expr) is None
+    assert check_expr(expr) is None
+
+
+@pytest.mark.parametrize("expr", ["9**9**9", "x**1000", "10.0**400 * x", "2**-101 + x"])
+def test_rejects_huge_powers(expr):
+    # không được treo tiến trình ở phép tính số nguyên lớn
+    with pytest.raises(UnsafeExpression):
+        compile_expr(expr)
+
+
+def test_moderate_power_allowed():
+    assert compile_expr("x**100").f(1.0) == pytest.approx(1.0)
+    assert check_expr("x^3") == "x**3"
+
+
+def test_evaluate_constant():
+    assert evaluate_constant("pi/2") == pytest.approx(np.pi / 2)
+    assert evaluate_constant("sqrt(2)") == pytest.approx(2 ** 0.5)
+    assert evaluate_constant("1e-3") == pytest.approx(1e-3)
+    assert evaluate_constant("x + 1") is None
+    assert evaluate_constant("1/0") is None
+    assert evaluate_constant(None) is None
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+import scipy.sparse as sp
+from linear_solver import METHODS, as_matrix, match_method, parse_linear_system, parse_omega, run_method
+
+# đối xứng, chéo trội: mọi phương pháp (kể cả Cholesky, CG) áp dụng được
+A = np.array([[4.0, 1.0, 0.0], [1.0, 4.0, 1.0], [0.0, 1.0, 4.0]])
+X = np.array([1.0, -2.0, 3.0])
+B = A @ X
+
+
+def test_match_method_aliases():
+    assert match_method("Phương pháp lặp Seidel") == "Gauss-Seidel"
+    assert match_method("LU decomposition") == "LU"
+    assert match_method("Gaussian elimination with pivoting") == "Gaussian Elimination"
+    assert match_method("Gradient liên hợp") == "Conjugate Gradient"
+    assert match_method("Bisection") is None
+
+
+@pytest.mark.parametrize("method", sorted(METHODS))
+def test_each_method_solves_dense(method):
+    r = run_method(method, A, B, tol=1e-10, omega=1.1)
+    assert r["success"], r
+    assert np.allclose(r["result"], X, atol=1e-6)
+    assert r["format"] == "dense" and r["residual"] < 1e-8
+
+
+@pytest.mark.parametrize("method", ["Jacobi", "Gauss-Seidel", "Conjugate Gradient", "GMRES", "LU"])
+def test_sparse_input(method):
+    n = 300
+    M = sp.diags([-np.ones(n - 1), 4 * np.ones(n), -np.ones(n - 1)], [-1, 0, 1], format="csr")
+    x = np.linspace(-1, 1, n)
+    r = run_method(method, M, M @ x, tol=1e-10)
+    assert r["success"] and r["format"] == "csr"
+    assert r["result"] is None and r["x_norm"] == pytest.approx(np.linalg.norm(x), rel=1e-6)
+
+
+def test_as_matrix_sparsifies_large_mostly_zero():
+    assert sp.issparse(as_matrix(np.eye(300)))
+    assert isinstance(as_matrix(np.eye(3)), np.ndarray)
+
+
+def test_failures_are_reported():
+    singular = run_method("Gaussian Elimination", [[1.0, 2.0], [2.0, 4.0]], [1.0, 2.0])
+    assert not singular["success"] and singular["error"]
+    r = run_method("Cholesky", [[1.0, 2.0], [2.0, 1.0]], [1.0, 1.0])
+    assert not r["success"]
+    r = run_method("Jacobi", [[1.0, 3.0], [3.0, 1.0]], [1.0, 1.0], maxiter=50)
+    assert not r["success"] and r["error"] == "no convergence in 50 iterations"  # không chéo trội: phân kỳ
+    assert not run_method("LU", np.eye(3), [1.0, 2.0])["success"]
+
+
+def test_parse_equations():
+    A_, b_, names = parse_linear_system("Giải hệ: 2x + y - z = 8; -3x - y + 2z = -11; -2x + y + 2z = -3 bằng Gauss")
+    assert names == ["x", "y", "z"]
+    assert np.allclose(A_, [[2, 1, -1], [-3, -1, 2], [-2, 1, 2]]) and np.allclose(b_, [8, -11, -3])
+
+
+def test_parse_matrix_literals():
+    A_, b_, names = parse_linear_system("A = [[4, 1], [1, 3]], b = [1, 2], dùng Jacobi với eps = 1e-6")
+    assert np.allclose(A_, [[4, 1], [1, 3]]) and np.allclose(b_, [1, 2]) and len(names) == 2
+    assert parse_linear_system("tính tích phân sin(x)") is None
+
+
+def test_parse_omega():
+    assert parse_omega("SOR với omega = 1.25") == 1.25
+    assert parse_omega("ω = 1.1") == 1.1
+    assert parse_omega("omega = 2.5") is None
+    assert parse_omega("w = 1.2") is None
@@ -0,0 +1,97 @@
+import asyncio, os, subprocess, sys, time
+from llm_cache import CachedLLM, DiskCache, MemoryLRU, normalize_prompt
+
+
+class FakeLLM:
+    model = "fake"
+
+    def __init__(self, temperature=0, delay=0.0):
+        self.temperature, self.delay, self.calls = temperature, delay, 0
+
+    def _reply(self, prompt):
+        from langchain_core.messages import AIMessage
+        self.calls += 1
+        return AIMessage(content=f"answer {self.calls}")
+
+    def invoke(self, prompt, config=None, **kwargs):
+        return self._reply(prompt)
+
+    async def ainvoke(self, prompt, config=None, **kwargs):
+        await asyncio.sleep(self.delay)
+        return self._reply(prompt)
+
+
+def test_memory_lru_evicts_oldest():
+    m = MemoryLRU(2)
+    m.set("a", "1"); m.set("b", "2"); m.get("a"); m.set("c", "3")
+    assert m.get("a") == "1" and m.get("b") is None and m.get("c") == "3"
+
+
+def test_disk_cache_ttl_and_size_cap(tmp_path):
+    d = DiskCache(str(tmp_path / "c.sqlite"), ttl=0.05)
+    d.set("k", "v")
+    assert d.get("k") == "v"
+    time.sleep(0.1)
+    assert d.get("k") is None
+    d = DiskCache(str(tmp_path / "s.sqlite"), max_bytes=10)
+    for i in range(5):
+        d.set(f"k{i}", "x" * 4)
+        time.sleep(0.002)
+    d.evict()
+    assert d.get("k4") == "xxxx" and d.get("k0") is None
+
+
+def test_normalize_prompt_ignores_cosmetics():
+    assert normalize_prompt("\n    a   b  \n\n\n\n    c\n") == normalize_prompt("a b\n\nc")
+
+
+def test_invoke_hits_memory_then_disk(tmp_path):
+    llm = FakeLLM()
+    c = CachedLLM(llm, disk=DiskCache(str(tmp_path / "llm.sqlite")))
+    first = c.invoke("prompt", site="t")
+    assert c.invoke("  prompt  ", site="t").content == first.content
+    # tiến trình mới: bộ nhớ trống, đọc lại từ đĩa
+    c2 = CachedLLM(llm, disk=DiskCache(str(tmp_path / "llm.sqlite")))
+    assert c2.invoke("prompt", site="t").content == first.content
+    assert llm.calls == 1
+    assert c.report()["t"] == {"memory_hit": 1, "disk_hit": 0, "miss": 1, "bypass": 0, "coalesced": 0}
+    assert c2.report()["t"]["disk_hit"] == 1
+
+
+def test_nonzero_temperature_and_disabled_bypass():
+    llm = FakeLLM(temperature=0.7)
+    c = CachedLLM(llm)
+    c.invoke("p", site="t"); c.invoke("p", site="t")
+    assert llm.calls == 2 and c.report()["t"]["bypass"] == 2
+    off = CachedLLM(FakeLLM(), enabled=False)
+    off.invoke("p"); off.invoke("p")
+    assert off.llm.calls == 2
+
+
+def test_site_defaults_to_caller_name():
+    c = CachedLLM(FakeLLM())
+    c.invoke("p")
+    assert "test_site_defaults_to_caller_name" in c.report()
+
+
+def test_ainvoke_coalesces_identical_prompts():
+    llm = FakeLLM(delay=0.05)
+    c = CachedLLM(llm)
+
+    async def go():
+        return await asyncio.gather(*(c.ainvoke("same", site="t") for _ in range(5)))
+
+    out = asyncio.run(go())
+    assert llm.calls == 1 and {r.content for r in out} == {"answer 1"}
+    assert c.report()["t"]["coalesced"] == 4
+
+
+def test_importing_settings_writes_nothing(tmp_path):
+    # cache SQLite, step store, method KB chỉ được dựng khi gọi get_*()
+    env = dict(os.environ, LLM_CACHE_DIR=str(tmp_path / "cache"), LLM_CACHE="1", EXECUTION_MODE="compact",
+               PYTHONPATH=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    env.pop("GEMINI_API_KEY", None)
+    env["LLM_BACKEND"] = "gemini"
+    code = "import settings, problem_classifier; problem_classifier.rule_classify('x**2 - 2 = 0')"
+    subprocess.run([sys.executable, "-c", code], env=env, check=True, cwd=tmp_path)
+    assert list(tmp_path.iterdir()) == []
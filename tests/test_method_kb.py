@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+from method_kb import MethodKB, canonical, task_features
+
+CAT, FEAT = "root_finding", "poly3,interval"
+
+
+@pytest.fixture
+def kb(tmp_path):
+    kb = MethodKB(str(tmp_path / "kb.sqlite"), min_runs=3, min_success=0.2, window=5, explore_every=3)
+    yield kb
+    kb.close()
+
+
+def _runs(kb, n, outcomes, features=FEAT, run="r"):
+    """n validation runs; outcomes: method -> (success, wall_s)."""
+    for i in range(n):
+        results = [{"method": m, "success": ok, "iterations": 5, "residual": 1e-9, "engine": "native"}
+                   for m, (ok, _) in outcomes.items()]
+        kb.record(f"{run}{i}", CAT, features, results, timings={m: w for m, (_, w) in outcomes.items()})
+
+
+def test_task_features():
+    assert task_features("root_finding", "x^3 - x - 1", "(1,2)") == "poly3,interval"
+    assert "trig" in task_features("root_finding", "sin(x) - x/2")
+    A = np.array([[4.0, 1.0], [1.0, 3.0]])
+    assert task_features("linear_system", system=(A, None, None)) == "n<=10,sym,diagdom"
+    assert task_features(None) == "-"
+
+
+def test_canonical():
+    assert canonical("root_finding", "Phương pháp dây cung") == "Regula Falsi"
+    assert canonical("linear_system", "Seidel") == "Gauss-Seidel"
+    assert canonical("other", " Custom ") == "Custom"
+
+
+def test_rank_without_history_keeps_order(kb):
+    assert kb.rank(CAT, FEAT, ["Newton", "Bisection"]) == (["Newton", "Bisection"], [])
+    assert kb.rank(None, FEAT, ["Newton"]) == (["Newton"], [])
+
+
+def test_rank_orders_by_cost_and_prunes_failures(kb):
+    _runs(kb, 3, {"Bisection": (True, 0.3), "Newton-Raphson": (True, 0.1), "Fixed-point": (False, 0.1)})
+    ordered, pruned = kb.rank(CAT, FEAT, ["Lặp đơn", "Chia đôi", "Newton", "Muller"])
+    assert ordered == ["Newton", "Chia đôi", "Muller"]
+    assert pruned == [{"method": "Lặp đơn", "runs": 3, "success_rate": 0.0}]
+
+
+def test_falls_back_to_category_stats(kb):
+    _runs(kb, 3, {"Secant": (False, 0.1)}, features="trig")
+    assert kb.rank(CAT, "exp", ["Secant", "Brent"])[0] == ["Brent"]
+
+
+def test_never_prunes_everything(kb):
+    _runs(kb, 3, {"Secant": (False, 0.1), "Bisection": (False, 0.1)})
+    ordered, pruned = kb.rank(CAT, FEAT, ["Secant", "Bisection"])
+    assert len(ordered) == 1 and len(pruned) == 1
+
+
+def test_window_lets_a_method_recover(kb):
+    _runs(kb, 5, {"Secant": (False, 0.1)}, run="old")
+    _runs(kb, 5, {"Secant": (True, 0.1)}, run="new")  # chỉ 5 lần gần nhất được tính
+    assert kb.rank(CAT, FEAT, ["Secant", "Brent"]) == (["Secant", "Brent"], [])
+
+
+def test_explore_every_retries_pruned_method(kb):
+    _runs(kb, 3, {"Secant": (False, 0.1)})
+    for i in range(2):
+        ordered, pruned = kb.rank(CAT, FEAT, ["Secant", "Brent"])
+        assert ordered == ["Brent"]
+        kb.record(f"p{i}", CAT, FEAT, [], pruned=pruned)
+    # lần thứ explore_every: chạy lại, xếp sau các phương pháp khác
+    assert kb.rank(CAT, FEAT, ["Secant", "Brent"]) == (["Brent", "Secant"], [])
+
+
+def test_record_report_and_compact(kb):
+    results = [{"method": "Newton", "success": True, "iterations": 4, "residual": 1e-12},
+               {"method": "Bisection", "success": False, "cancelled": True}]
+    kb.record("run1", CAT, FEAT, results, best=results[0], ranked=["Newton", "Bisection"], timings={"Newton": 0.2})
+    rep = kb.report(CAT)[CAT]
+    assert rep["runs"] == 1 and rep["top1_hit_rate"] == 1.0
+    assert rep["methods"]["Newton-Raphson"]["mean_wall_s"] == 0.2
+    assert rep["methods"]["Bisection"]["runs"] == 0  # bị huỷ: không tính vào thống kê
+    assert kb.compact(1) == 1
@@ -0,0 +1,63 @@
+import time
+import numpy as np
+import pytest
+from ode_solver import ORDERS, make_rhs, match_method, parse_ivp, run_method, solve
+
+# y' = y - x^2 + 1, y(0) = 0.5  ->  y = (x + 1)^2 - 0.5 e^x
+F, JAC = make_rhs("y - x**2 + 1")
+EXACT = 9 - 0.5 * np.exp(2)
+
+
+def test_match_method_aliases():
+    assert match_method("Runge-Kutta bậc 4") == "RK4"
+    assert match_method("Euler hiện") == "Euler"
+    assert match_method("backward Euler") == "Implicit Euler"
+    assert match_method("Dormand-Prince") == "RK45"
+    assert match_method("Simpson") is None
+
+
+@pytest.mark.parametrize("method", sorted(ORDERS) + ["RK45"])
+def test_each_method_without_h(method):
+    # không có h: chia đôi bước trong ngân sách _HALVING_MAX_STEPS, tol vừa với bậc của phương pháp
+    tol = {1: 1e-2, 2: 1e-4}.get(ORDERS.get(method), 1e-7)
+    r = run_method(method, F, 0.0, 0.5, 2.0, tol=tol, jac=JAC)[0]
+    assert r["success"], r
+    assert r["result"] == pytest.approx(EXACT, abs=tol * 10)
+
+
+def test_given_h_reports_step_doubling_estimate():
+    r = run_method("RK4", F, 0.0, 0.5, 2.0, h=0.2, tol=1e-3)[0]
+    assert r["success"] and r["h"] == 0.2 and r["iterations"] == 10
+    assert abs(r["result"] - EXACT) < 1e-3 and 0 < r["residual"] < 1e-3
+
+
+def test_batched_initial_values():
+    y0 = np.array([0.0, 0.5, 1.0])
+    out = solve("RK45", F, 0.0, y0, 2.0, tol=1e-9)
+    assert out["converged"].all()
+    assert np.allclose(out["y"], 9 - (1 - y0) * np.exp(2), atol=1e-6)
+
+
+@pytest.mark.parametrize("method", ["Euler", "Implicit Euler"])
+def test_halving_is_bounded(method):
+    # tol không đạt được với phương pháp bậc 1: dừng theo ngân sách bước / thời gian, báo thất bại
+    t = time.perf_counter()
+    r = run_method(method, F, 0.0, 0.5, 2.0, tol=1e-12, jac=JAC)[0]
+    assert time.perf_counter() - t < 2.0
+    assert not r["success"] and "above tol" in r["error"]
+
+
+def test_blow_up_is_failure():
+    f, jac = make_rhs("y**2")
+    r = run_method("RK4", f, 0.0, 1.0, 2.0, h=0.1, jac=jac)[0]
+    assert not r["success"] and r["result"] is None
+
+
+def test_parse_ivp():
+    ivp = parse_ivp("Giải phương trình vi phân y' = y - x**2 + 1, y(0) = 0.5 bằng phương pháp Runge-Kutta bậc 4 "
+                    "với bước h = 0.2, tính y(2).", "y - x**2 + 1", "(0,2)")
+    assert (ivp["t0"], ivp["y0"], ivp["t1"], ivp["h"]) == (0.0, 0.5, 2.0, 0.2)
+    assert ivp["f"](0.0, 0.5) == pytest.approx(1.5)
+    ivp = parse_ivp("dy/dt = -2*y, y(0) = 1, tính y(1) với n = 10", "-2*y", None)
+    assert ivp["independent"] == "t" and ivp["h"] == pytest.approx(0.1)
+    assert parse_ivp("y' = y", "y", None) is None
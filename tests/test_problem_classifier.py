@@ -0,0 +1,69 @@
+import asyncio
+import pytest
+import problem_classifier
+from problem_classifier import _parse_classification, aclassify_task, classify_task, rule_classify
+
+
+@pytest.mark.parametrize("text, category, short_form, domain_hint", [
+    ("Bằng phương pháp chia đôi, tìm nghiệm của phương trình x**2 - 2 = 0 trong khoảng (1, 2) với sai số 1e-6.",
+     "root_finding", "x**2 - 2", "(1,2)"),
+    ("Tính tích phân của sin(x) trên đoạn [0, pi] bằng công thức hình thang với n = 100.",
+     "integration", "sin(x)", "(0,3.141592653589793)"),
+    ("Giải phương trình vi phân y' = y - x**2 + 1, y(0) = 0.5 bằng Runge-Kutta bậc 4 với h = 0.2, tính y(2).",
+     "ode_ivp", "y - x**2 + 1", "(0,2)"),
+    ("Giải hệ phương trình 2x + y = 3; x + 3y = 5 bằng Gauss-Seidel", "linear_system", None, None),
+    ("Giải bài toán biên y'' = -y, y(0) = 0, y(1) = 1 bằng phương pháp bắn", "ode_bvp", None, None),
+])
+def test_rule_classify(text, category, short_form, domain_hint):
+    r = rule_classify(text)
+    assert (r["category"], r["short_form"], r["domain_hint"]) == (category, short_form, domain_hint)
+    assert r["confidence"] >= 0.8 and r["classifier"] == "rules" and r["original_task"] == text
+
+
+def test_no_keyword_is_other():
+    r = rule_classify("Viết một bài thơ về mùa thu")
+    assert r["category"] == "other" and r["confidence"] == 0.0
+
+
+def test_integrand_from_a_later_cue():
+    # "tích phân" đầu tiên không kèm biểu thức: lấy cận và hàm từ cue sau
+    r = rule_classify("Cho tích phân, hãy tính tích phân ∫_0^1 exp(-x**2) dx bằng Simpson")
+    assert r["short_form"] == "exp(-x**2)" and r["domain_hint"] == "(0,1)"
+
+
+@pytest.mark.parametrize("text", [
+    "Tính tích phân của hàm số sau bằng Simpson.",
+    "Giải phương trình vi phân y' = y - x**2 + 1 bằng Euler",
+])
+def test_missing_span_defers_to_llm(text):
+    assert rule_classify(text)["confidence"] < problem_classifier.CLASSIFY_RULE_THRESHOLD
+
+
+def test_confident_rules_skip_the_llm(monkeypatch):
+    def no_llm():
+        raise AssertionError("LLM called")
+
+    monkeypatch.setattr(problem_classifier, "get_cached_llm", no_llm)
+    text = "Bằng phương pháp chia đôi, tìm nghiệm của phương trình x**2 - 2 = 0 trong khoảng (1, 2)."
+    assert classify_task(text)["classifier"] == "rules"
+    assert asyncio.run(aclassify_task(text))["classifier"] == "rules"
+
+
+def test_low_confidence_asks_the_llm(monkeypatch):
+    class Reply:
+        content = '```json\n{"category": "integration", "short_form": "x**2", "domain_hint": "(0,1)"}\n```'
+
+    class LLM:
+        def invoke(self, prompt):
+            return Reply()
+
+    monkeypatch.setattr(problem_classifier, "get_cached_llm", LLM)
+    text = "Tính tích phân của hàm số sau bằng Simpson."
+    r = classify_task(text)
+    assert r["classifier"] == "llm" and r["short_form"] == "x**2" and r["original_task"] == text
+
+
+def test_unparseable_llm_reply_falls_back_to_rules():
+    text = "Tính tích phân của hàm số sau bằng Simpson."
+    r = _parse_classification("không phải JSON", text)
+    assert r["classifier"] == "fallback" and r["category"] == "integration"
@@ -0,0 +1,59 @@
+import warnings
+import numpy as np
+import pytest
+from expr_compiler import compile_expr
+from quadrature import METHODS, match_method, parse_quadrature, run_method, solve
+
+SIN = compile_expr("sin(x)").f
+
+
+def test_match_method_aliases():
+    assert match_method("công thức hình thang") == "Trapezoid"
+    assert match_method("Simpson 1/3") == "Simpson"
+    assert match_method("Gauss-Legendre") == "Gaussian Quadrature"
+    assert match_method("Newton") is None
+
+
+@pytest.mark.parametrize("method", sorted(METHODS))
+def test_each_method_integrates_sin(method):
+    tol = 1e-2 if method == "Monte Carlo" else 1e-8
+    r = run_method(method, SIN, 0.0, np.pi, tol=tol)[0]
+    assert r["success"], r
+    assert r["result"] == pytest.approx(2.0, abs=max(tol, 1e-7) * 5)
+
+
+def test_batched_intervals():
+    out = solve("Adaptive Quadrature", SIN, np.zeros(3), np.array([np.pi / 2, np.pi, 2 * np.pi]), tol=1e-10)
+    assert out["converged"].all()
+    assert np.allclose(out["value"], [1.0, 2.0, 0.0], atol=1e-8)
+
+
+@pytest.mark.parametrize("method, n, effective", [("Simpson", 9, 10), ("Trapezoid", 9, 9), ("Gaussian Quadrature", 0, 1)])
+def test_reports_effective_n(method, n, effective):
+    assert run_method(method, SIN, 0.0, 1.0, n=n)[0]["n"] == effective
+
+
+@pytest.mark.parametrize("method", ["Trapezoid", "Simpson", "Romberg", "Adaptive Quadrature"])
+def test_endpoint_singularity_fails_without_warnings(method):
+    f = compile_expr("1/sqrt(x)").f
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", RuntimeWarning)
+        r = run_method(method, f, 0.0, 1.0, tol=1e-6)[0]
+    assert not r["success"] and r["result"] is None
+    assert r["error"].startswith("non-finite")
+
+
+def test_tol_out_of_reach_is_failure():
+    r = run_method("Monte Carlo", SIN, 0.0, np.pi, tol=1e-9)[0]
+    assert not r["success"] and "above tol" in r["error"]
+
+
+def test_parse_quadrature():
+    q = parse_quadrature("Tính tích phân của sin(x) trên đoạn [0, pi] bằng công thức hình thang với n = 100.",
+                         "sin(x)", "(0, 3.14)")
+    assert q["a"] == 0.0 and q["b"] == pytest.approx(np.pi)  # cận ghi trong đề thắng domain_hint đã làm tròn
+    assert q["n"] == 100 and q["variable"] == "x"
+    q = parse_quadrature("Tính tích phân exp(-t**2) từ 0 đến 1 với sai số 1e-6", "exp(-t**2)", "(0,1)")
+    assert q["variable"] == "t" and q["tol"] == 1e-6 and q["f"](np.array([0.0]))[0] == 1.0
+    assert parse_quadrature("Tính tích phân sin(x)", "sin(x)") is None
+    assert parse_quadrature("Tính tích phân", "import os") is None
@@ -0,0 +1,77 @@
+import threading, time
+import pytest
+from llm_cache import DiskCache
+from research import BM25Index, NotesBackend, ResearchLayer, StaticBackend, normalize_query, tokenize
+
+
+class Counting(StaticBackend):
+    def __init__(self, name, answer="remote answer", latency=0.0, fail=False):
+        super().__init__(name, lambda q: answer, latency)
+        self.calls, self.fail = 0, fail
+
+    def search(self, query):
+        self.calls += 1
+        if self.fail:
+            raise ConnectionError("rate limited")
+        return super().search(query)
+
+
+def test_tokenize_folds_vietnamese():
+    assert tokenize("Tốc độ hội tụ của phương pháp Newton") == ["rate", "convergence", "newton"]
+    assert normalize_query("  Regula   Falsi ") == "regula falsi"
+
+
+def test_bm25_ranks_and_reports_coverage():
+    idx = BM25Index({"a": "newton convergence quadratic", "b": "bisection bracket halving", "c": "secant"})
+    (top, score, cov), = idx.search("newton convergence", k=1)
+    assert top == "a" and score > 0 and cov == 1.0
+    assert idx.search("unrelated words") == []
+
+
+def test_notes_answer_locally():
+    remote = Counting("web")
+    text = ResearchLayer([remote]).search("Regula Falsi convergence")
+    assert "Regula Falsi" in text and remote.calls == 0
+
+
+def test_remote_answers_are_cached(tmp_path):
+    remote = Counting("web")
+    layer = ResearchLayer([remote], cache=DiskCache(str(tmp_path / "r.sqlite")))
+    first = layer.search("latest arxiv paper on spectral deferred correction")
+    assert "### web\nremote answer" in first
+    assert layer.search("Latest arxiv paper on  spectral deferred correction") == first
+    assert remote.calls == 1
+
+
+def test_backends_run_concurrently_and_errors_are_not_cached(tmp_path):
+    slow = [Counting(f"s{i}", latency=0.2) for i in range(3)]
+    bad = Counting("bad", fail=True)
+    layer = ResearchLayer(slow + [bad], cache=DiskCache(str(tmp_path / "r.sqlite")))
+    t = time.perf_counter()
+    text = layer.search("obscure preprint title")
+    assert time.perf_counter() - t < 0.5
+    assert "### bad\nError: ConnectionError: rate limited" in text
+    layer.search("obscure preprint title")
+    assert bad.calls == 2 and all(s.calls == 1 for s in slow)
+
+
+def test_timeout_and_busy_backend():
+    release = threading.Event()
+    hang = StaticBackend("hang", lambda q: release.wait(5) and "late")
+    layer = ResearchLayer([hang], timeout=0.1)
+    assert "Error: no answer within 0.1s" in layer.search("first question about nothing")
+    # lời gọi trước còn treo: không xếp hàng thêm thread mới
+    assert "still running" in layer.search("second question about nothing")
+    release.set()
+
+
+def test_weak_note_matches_are_dropped():
+    layer = ResearchLayer([Counting("web")], min_coverage=1.1)  # luôn hỏi nguồn remote
+    assert "### notes" not in layer.search("foo one")
+    assert "### notes\n- Newton-Raphson" in layer.search("newton raphson quadratic convergence")
+
+
+def test_as_tool():
+    tool = ResearchLayer().as_tool()
+    assert tool.name == "research"
+    assert "Bisection" in tool.invoke({"query": "Bisection bracket"})
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+from expr_compiler import compile_expr
+from root_isolation import isolate_roots, root_selector, scan
+
+
+def _roots_in(brackets, roots):
+    return all(any(lo <= r <= hi for lo, hi in brackets) for r in roots)
+
+
+def test_isolates_every_simple_root():
+    f = compile_expr("(x - 1)*(x - 2)*(x - 3)").f
+    br = isolate_roots(f, -10, 10)
+    assert len(br) == 3 and _roots_in(br, [1, 2, 3])
+    assert all(lo < hi for lo, hi in br)
+
+
+def test_close_roots_in_one_cell_are_split():
+    f = compile_expr("(x - 1)*(x - 1.001)*(x - 1.002)").f
+    br = isolate_roots(f, -10, 10)
+    assert len(br) == 3 and _roots_in(br, [1, 1.001, 1.002])
+
+
+def test_double_root_found_without_sign_change():
+    f = compile_expr("(x - 0.3)**2").f
+    # |f| chạm 0 không đổi dấu: trả về nghiệm đúng dạng (v, v) với |f(v)| < tol
+    br = isolate_roots(f, -1, 1)
+    assert len(br) == 1 and br[0][0] == br[0][1] == pytest.approx(0.3, abs=1e-4)
+
+
+def test_pole_is_not_a_root():
+    br = isolate_roots(compile_expr("1/(x - 0.5)").f, -2, 2)
+    assert br == []
+    br = isolate_roots(compile_expr("tan(x)").f, -2, 2)
+    assert len(br) == 1 and _roots_in(br, [0.0])
+
+
+def test_scan_grows_default_domains():
+    br = scan(compile_expr("x - 50").f)
+    assert _roots_in(br, [50])
+    assert scan(compile_expr("x**2 + 1").f) == []
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Tính nghiệm dương lớn nhất", 3),
+    ("Tìm nghiệm âm", 0),
+    ("find the smallest positive root", 2),
+    ("giải phương trình", 0),
+])
+def test_root_selector(text, expected):
+    assert root_selector(text)([-1.5, -0.5, 0.5, 2.0]) == expected
+
+
+def test_root_selector_no_match():
+    assert root_selector("nghiệm dương")([-2.0, -1.0]) is None
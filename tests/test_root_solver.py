@@ -0,0 +1,76 @@
+import math
+import numpy as np
+import pytest
+from root_solver import METHODS, match_method, make_func, parse_interval, run_method, solve
+
+F = make_func("x**3 - x - 1")
+ROOT = 1.324717957244746
+
+
+def test_match_method_aliases():
+    assert match_method("Phương pháp dây cung") == "Regula Falsi"
+    assert match_method("Newton method") == "Newton-Raphson"
+    assert match_method("chia đôi") == "Bisection"
+    assert match_method("Cholesky") is None
+
+
+def test_parse_interval():
+    assert parse_interval("(1,2)") == (1.0, 2.0)
+    assert parse_interval("[-1.5; 2e1]") == (-1.5, 20.0)
+    assert parse_interval("somewhere") is None
+    assert parse_interval(None) is None
+
+
+@pytest.mark.parametrize("method", sorted(METHODS))
+def test_each_method_finds_root(method):
+    r = run_method(method, F, 1.0, 2.0, tol=1e-8)[0]
+    assert r["success"], r
+    assert r["result"] == pytest.approx(ROOT, abs=1e-6)
+    assert r["engine"] == "native"
+
+
+def test_batched_brackets():
+    out = solve("Brentq", make_func("x**2 - 2"), [1.0, -2.0], [2.0, -1.0], tol=1e-10)
+    assert out["converged"].all()
+    assert np.allclose(out["root"], [math.sqrt(2), -math.sqrt(2)])
+
+
+def test_no_bracket():
+    r = run_method("Bisection", F, 2.0, 3.0)[0]
+    assert not r["success"] and r["error"] == "No bracket"
+
+
+def test_bisection_requires_small_residual():
+    # khoảng < tol nhưng |f(x)| vẫn lớn hơn tol: hàm dốc phải chia tiếp
+    r = run_method("Bisection", lambda x: 1e6 * (x - 1.3), 1.0, 2.0, tol=1e-6)[0]
+    assert r["success"] and r["residual"] < 1e-6
+
+
+def test_bisection_pole_is_failure():
+    r = run_method("Bisection", lambda x: 1 / x, -1.0, 2.0, tol=1e-6)[0]
+    assert not r["success"]
+    assert "bracket collapsed" in r["error"]
+
+
+def test_muller_complex_root_is_failure():
+    r = run_method("Muller", make_func("x**2 + 1"), -1.0, 1.0)[0]
+    assert not r["success"]
+    assert "complex" in r["error"]
+
+
+def test_no_convergence_message():
+    r = run_method("Bisection", F, 1.0, 2.0, tol=1e-12, maxiter=5)[0]
+    assert not r["success"]
+    assert r["error"] == "no convergence in 5 iterations"
+
+
+def test_validator_counts_bisection_from_task_interval():
+    from validator import Validator
+    v = Validator("Tìm nghiệm dương lớn nhất của x**3 - 6*x**2 + 11*x - 6 = 0", short_form="x**3 - 6*x**2 + 11*x - 6",
+                  category="root_finding")
+    assert len(v.brackets) == 3
+    r = v._native("Bisection")
+    assert r["success"] and r["result"] == pytest.approx(3.0, abs=1e-5)
+    # khoảng phân ly do scan thu hẹp: vẫn tính đủ số lần chia đôi từ miền quét [-10, 10]
+    lo, hi = r["bracket"]
+    assert r["iterations"] >= math.log2(20 / 1e-6) - 1 > math.log2((hi - lo) / 1e-6)
@@ -0,0 +1,63 @@
+import pytest
+from llm_cache import MemoryLRU
+from step_context import StepStore, compact, fit_results, fusable_group, is_compute_step, split_fused_output
+
+
+def test_compact_keeps_head_and_tail_lines():
+    table = "\n".join(f"{i:>3} {i * 0.5:.6f}" for i in range(200))
+    out = compact(table, 300, ref="step 2")
+    assert len(out) < 400
+    assert out.startswith("  0 ") and out.endswith("199 99.500000")
+    assert "dòng bị lược, đầy đủ: step 2" in out
+    assert compact("short", 300) == "short"
+
+
+def test_compact_single_long_line():
+    out = compact("x" * 1000, 90)
+    assert len(out) < 150 and "ký tự bị lược" in out
+
+
+def test_fit_results_newest_gets_most():
+    results = ["a" * 3000 for _ in range(3)]
+    out = fit_results(results, 2000)
+    assert len(out) == 3
+    assert len(out[2]) > len(out[1]) > len(out[0])
+
+
+@pytest.mark.parametrize("n", [10, 50, 200])
+def test_fit_results_stays_within_budget(n):
+    out = fit_results(["y" * 5000] * n, 4000)
+    assert len(out) == n
+    assert sum(map(len, out)) <= 4000 * 1.1
+    assert sum(1 for r in out if "đã lược, đầy đủ trong step store" in r) == 1
+
+
+def test_step_store_roundtrip():
+    store = StepStore(MemoryLRU())
+    store.put("s1", 2, "full output")
+    assert store.get("s1", 2) == "full output" and store.get("s1", 3) is None
+
+
+@pytest.mark.parametrize("step, compute", [
+    ("Tính f(1) và f(2), in kết quả", True),
+    ("Lặp Newton đến khi sai số < 1e-6", True),
+    ("Define f and compute the integral", True),
+    ("Giải thích ý nghĩa của nghiệm", False),
+    ("Tra cứu công thức Simpson trên wikipedia", False),
+    ("Kết luận nghiệm nằm trong khoảng (1, 2)", False),
+])
+def test_is_compute_step(step, compute):
+    assert is_compute_step(step) is compute
+
+
+def test_fusable_group():
+    steps = ["Định nghĩa f(x)", "Tính f(a), f(b)", "Nhận xét kết quả", "Tính nghiệm"]
+    assert fusable_group(steps, 0) == [0, 1]
+    assert fusable_group(steps, 2) == [2]
+    assert fusable_group(["Tính"] * 6, 0, max_steps=4) == [0, 1, 2, 3]
+
+
+def test_split_fused_output():
+    out = "### STEP 1\n1.0\n### STEP 2\n\n### STEP 3\n3.0\n"
+    assert split_fused_output(out, [1, 2, 3]) == ["1.0", "No output", "3.0"]
+    assert split_fused_output("no markers", [1]) is None
@@ -1,11 +1,12 @@
-import re
+import re, json, threading, time, uuid
+from typing import Optional
 from dotenv import load_dotenv
 from langchain_core.tools import tool, StructuredTool
-from e2b_code_interpreter import Sandbox
-from settings import LLM
+from sandbox_pool import get_pool
+from settings import get_cached_llm, SESSION_IDLE_TTL
+import instrumentation
 
 load_dotenv()
-llm = LLM
 
 def extract_missing_module(error_msg: str) -> str:
     """Trích xuất tên module bị thiếu từ error message"""
@@ -13,6 +14,12 @@ def extract_missing_module(error_msg: str) -> str:
     match = re.search(pattern, error_msg)
     return match.group(1) if match else None
 
+# tên module -> package pip khi hai tên khác nhau; tránh một lượt hỏi LLM cho các trường hợp phổ biến
+KNOWN_PACKAGES = {
+    "sklearn": "scikit-learn", "cv2": "opencv-python", "PIL": "Pillow", "yaml": "PyYAML",
+    "bs4": "beautifulsoup4", "skimage": "scikit-image", "Crypto": "pycryptodome", "dateutil": "python-dateutil",
+}
+
 def get_install_command(missing_module: str, llm) -> str:
     prompt = f"""
 I got this error: "No module named '{missing_module}'"
@@ -29,40 +36,102 @@ Example: pip install torch
     except Exception:
         return f"pip install {missing_module}"
 
+def install_module(sandbox, missing_module: str) -> None:
+    """Install by known/guessed package name first; ask the LLM only if that fails."""
+    top = missing_module.split(".")[0]
+    instrumentation.count("install_retries")
+    t0 = time.perf_counter()
+    try:
+        sandbox.install(f"pip install {KNOWN_PACKAGES.get(top, top)}")
+    except Exception:
+        try:
+            sandbox.install(get_install_command(missing_module, get_cached_llm()))
+        except Exception as ie:
+            print("Install failed:", ie)
+    instrumentation.record_call("sandbox_install", missing_module, time.perf_counter() - t0)
+
+class RunGuard:
+    """
+    Deadline + kill switch for one sandboxed run (validator candidates). cancel() closes the sandbox the
+    run currently holds, so a hung or losing candidate really stops and its sandbox is not reused.
+    """
+    def __init__(self, timeout: Optional[float] = None):
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.cancelled = False
+        self.killed = False
+        self._sandbox = None
+        self._lock = threading.Lock()
+
+    def remaining(self) -> Optional[float]:
+        return None if self.deadline is None else self.deadline - time.monotonic()
+
+    def attach(self, sandbox) -> bool:
+        """Bind the checked-out sandbox; False when the run was already cancelled."""
+        with self._lock:
+            self._sandbox = None if self.cancelled else sandbox
+            return not self.cancelled
+
+    def detach(self) -> None:
+        with self._lock:
+            self._sandbox = None
+
+    def cancel(self) -> None:
+        with self._lock:
+            self.cancelled = True
+            sandbox, self._sandbox = self._sandbox, None
+        if sandbox is not None:
+            self.killed = True
+            sandbox.close()
+
+def run_in_sandbox(sandbox, code: str, max_install_attempts: int = 5, guard: Optional[RunGuard] = None) -> str:
+    """Run code in an already checked-out sandbox, auto-installing missing modules (within guard's deadline)."""
+    attempt = 0
+    while attempt < max_install_attempts:
+        timeout = guard.remaining() if guard is not None else None
+        if timeout is not None and timeout <= 0:
+            return "Error: TimeoutError: deadline exceeded before execution"
+        t0 = time.perf_counter()
+        execution = sandbox.run_code(code, timeout=timeout)
+        instrumentation.record_call("sandbox_run", sandbox.name, time.perf_counter() - t0,
+                                    error=bool(execution.error))
+        # success
+        if not execution.error:
+            if execution.stdout:
+                return execution.stdout.strip()
+            if execution.text:
+                return execution.text.strip()
+            return "No output"
+        # error -> check missing module
+        error_msg = execution.error
+        missing_module = extract_missing_module(error_msg)
+        if missing_module and getattr(sandbox, "can_install", True):
+            install_module(sandbox, missing_module)
+            attempt += 1
+            continue
+        # other error
+        return f"Error: {error_msg}"
+    return f"Error: Max install attempts ({max_install_attempts}) reached. Last error: {execution.error}"
+
 def execute_python_raw(code: str, max_install_attempts: int = 5) -> str:
     """
-    Run code in E2B sandbox. Auto-install missing modules by asking LLM for pip command.
+    Run code in a pooled sandbox (see sandbox_pool). Auto-install missing modules.
     Returns stdout/text or an error message.
     """
-    attempt = 0
+    return execute_guarded(code, None, max_install_attempts)
+
+def execute_guarded(code: str, guard: Optional[RunGuard], max_install_attempts: int = 5) -> str:
+    """execute_python_raw bounded by `guard`: run_code gets the time left, guard.cancel() kills the sandbox."""
+    if guard is not None and guard.cancelled:
+        return "Error: cancelled"
     try:
-        with Sandbox.create() as sandbox:
-            while attempt < max_install_attempts:
-                execution = sandbox.run_code(code)
-                # success
-                if not execution.error:
-                    output = getattr(execution.logs, "stdout", "")
-                    if isinstance(output, list):
-                        output = "".join(str(line) for line in output)
-                    if output:
-                        return output.strip()
-                    if getattr(execution, "text", None):
-                        return execution.text.strip()
-                    return "No output"
-                # error -> check missing module
-                error_msg = execution.error.traceback
-                missing_module = extract_missing_module(error_msg)
-                if missing_module:
-                    install_command = get_install_command(missing_module, llm)
-                    try:
-                        sandbox.commands.run(install_command)
-                    except Exception as ie:
-                        print("Install failed:", ie)
-                    attempt += 1
-                    continue
-                # other error
-                return f"Error: {error_msg}"
-            return f"Error: Max install attempts ({max_install_attempts}) reached. Last error: {execution.error.traceback}"
+        with get_pool().checkout() as sandbox:
+            if guard is not None and not guard.attach(sandbox):
+                return "Error: cancelled"
+            try:
+                return run_in_sandbox(sandbox, code, max_install_attempts, guard)
+            finally:
+                if guard is not None:
+                    guard.detach()
     except Exception as e:
         return f"Error: {e}"
 
@@ -75,4 +144,114 @@ e2b_sandbox_tool = StructuredTool.from_function(
         "Call only when you have a concrete code block to execute and expect stdout/text back."
     ),
     handle_tool_error=True
-)
\ No newline at end of file
+)
+
+# --- persistent sessions: một sandbox giữ state (biến, import, hàm) suốt một lần chạy graph ---
+# {session_id: [sandbox, lock, last_used]}; phiên bị bỏ quên (run bị ngắt giữa chừng) hết hạn sau SESSION_IDLE_TTL
+_SESSIONS = {}
+_SESSIONS_LOCK = threading.Lock()
+_REAPER = None
+
+def _reap_idle_sessions() -> None:
+    now = time.monotonic()
+    with _SESSIONS_LOCK:
+        # phiên đang chạy code (giữ lock) không bị thu hồi
+        expired = [sid for sid, (_, lock, last) in _SESSIONS.items()
+                   if now - last > SESSION_IDLE_TTL and not lock.locked()]
+        entries = [_SESSIONS.pop(sid) for sid in expired]
+    for sandbox, _, _ in entries:
+        instrumentation.count("sessions_expired")
+        get_pool().release(sandbox)
+
+def _reaper_loop() -> None:
+    while True:
+        time.sleep(max(1.0, min(60.0, SESSION_IDLE_TTL / 4)))
+        try:
+            _reap_idle_sessions()
+        except Exception:
+            pass
+
+def _start_reaper() -> None:
+    global _REAPER
+    with _SESSIONS_LOCK:
+        if _REAPER is None and SESSION_IDLE_TTL > 0:
+            _REAPER = threading.Thread(target=_reaper_loop, name="session-reaper", daemon=True)
+            _REAPER.start()
+
+_SNAPSHOT_CODE = """
+def __na_snapshot():
+    import json, sys, types
+    skip = {"In", "Out", "exit", "quit", "get_ipython"}
+    out = []
+    for k, v in list(globals().items()):
+        if k.startswith("_") or k in skip or isinstance(v, types.ModuleType):
+            continue
+        size = getattr(v, "nbytes", None)
+        if not isinstance(size, int):
+            size = sys.getsizeof(v)
+        item = {"name": k, "type": type(v).__name__, "size": size}
+        if hasattr(v, "shape"):
+            item["shape"] = list(getattr(v, "shape"))
+        out.append(item)
+    print(json.dumps(out))
+__na_snapshot()
+del __na_snapshot
+"""
+
+def open_session() -> str:
+    """Check a sandbox out of the pool and keep it until close_session. Returns session id."""
+    session_id = uuid.uuid4().hex
+    _start_reaper()
+    sandbox = get_pool().acquire()
+    with _SESSIONS_LOCK:
+        _SESSIONS[session_id] = [sandbox, threading.Lock(), time.monotonic()]
+    return session_id
+
+def close_session(session_id: str) -> None:
+    with _SESSIONS_LOCK:
+        entry = _SESSIONS.pop(session_id, None)
+    if entry:
+        get_pool().release(entry[0])
+
+def session_alive(session_id: str) -> bool:
+    with _SESSIONS_LOCK:
+        entry = _SESSIONS.get(session_id)
+    return entry is not None and entry[0].is_alive()
+
+def execute_in_session(session_id: str, code: str, max_install_attempts: int = 5) -> str:
+    """Like execute_python_raw, but state persists across calls with the same session id."""
+    with _SESSIONS_LOCK:
+        entry = _SESSIONS.get(session_id)
+    if entry is None:
+        return f"Error: unknown or closed session {session_id}"
+    sandbox, lock, _ = entry
+    try:
+        with lock:
+            try:
+                return run_in_sandbox(sandbox, code, max_install_attempts)
+            finally:
+                entry[2] = time.monotonic()
+    except Exception as e:
+        return f"Error: {e}"
+
+def session_snapshot(session_id: str) -> list:
+    """Names, types and sizes (bytes) of user variables currently defined in the session."""
+    out = execute_in_session(session_id, _SNAPSHOT_CODE)
+    try:
+        return json.loads(out.splitlines()[-1])
+    except Exception:
+        return []
+
+def make_session_tool(session_id: str) -> StructuredTool:
+    def run_python(code: str) -> str:
+        return execute_in_session(session_id, code)
+    return StructuredTool.from_function(
+        func=run_python,
+        name="e2b_sandbox",
+        description=(
+            "Run vetted Python code in a persistent sandbox session: variables, imports and functions "
+            "defined in earlier calls (including earlier plan steps) are still available. "
+            "Call only when you have a concrete code block to execute and expect stdout/text back."
+        ),
+        handle_tool_error=True
+    )
\ No newline at end of file
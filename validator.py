@@ -1,23 +1,50 @@
 # validator.py
-import textwrap, re, json
-from typing import List, Dict, Any, Optional
-from settings import LLM
-from tools import e2b_sandbox_tool
+import asyncio, contextvars, textwrap, re, json, math, time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Dict, Any, Optional, Callable
+from settings import get_cached_llm
+from tools import RunGuard, execute_guarded
+from root_solver import match_method, parse_interval, run_method
+from expr_compiler import try_compile
+from root_isolation import DEFAULT_DOMAINS, scan, root_selector
+from linear_solver import parse_linear_system, parse_omega, run_method as run_linear, match_method as match_linear
+from quadrature import parse_quadrature, run_method as run_quadrature, match_method as match_quadrature
+from ode_solver import parse_ivp, run_method as run_ivp, match_method as match_ivp
+
+class _Cancelled(Exception):
+    """Raised inside a race-mode worker once another candidate has been accepted."""
 
 class Validator:
     """
     Generic validator: for each candidate method, ask LLM to produce self-contained Python script,
-    run in sandbox (e2b_sandbox_tool), parse first JSON line as metrics.
+    run in a pooled sandbox (tools.execute_guarded, bounded by a RunGuard), parse first JSON line as metrics.
+    Root-finding methods with a short_form are run in-process first (root_solver), without LLM/sandbox;
+    so are linear-system methods when A and b can be parsed from the task text (linear_solver),
+    integration methods (quadrature) and ode_ivp methods (ode_solver) when the integrand / right-hand
+    side compiles and the interval / initial condition is known.
     Fallback: small templates for common root-finding methods when possible.
     """
     def __init__(self, task_text: str, short_form: Optional[str]=None, domain_hint: Optional[str]=None,
-                 candidate_methods: Optional[List[str]]=None, tol: float=1e-6, maxiter: int=200):
+                 candidate_methods: Optional[List[str]]=None, tol: float=1e-6, maxiter: int=200,
+                 category: Optional[str]=None):
         self.task_text = task_text
+        self.category = category
         self.short_form = short_form
         self.domain_hint = domain_hint
         self.candidate_methods = candidate_methods
         self.tol = tol
         self.maxiter = maxiter
+        # short_form được compile một lần (LRU dùng chung giữa các task)
+        self.compiled = try_compile(short_form)
+        self.brackets = self._isolate()
+        # (A, b, variable names) cho linear_system nếu đọc được từ đề
+        self.system = parse_linear_system(task_text) if category == "linear_system" else None
+        self.omega = parse_omega(task_text) if self.system is not None else None
+        # integrand + [a, b] (+ n, tol) / f(t, y) + y(t0) = y0, t1 (+ h)
+        self.quad = parse_quadrature(task_text, short_form, domain_hint) if category == "integration" else None
+        self.ivp = parse_ivp(task_text, short_form, domain_hint) if category == "ode_ivp" else None
+        # method -> wall time (s) of its last validation; ngoài result dict để pick_best thấy đúng dict như tuần tự
+        self.timings: Dict[str, float] = {}
 
     def _clean(self, s: str) -> str:
         if not s: return s
@@ -25,10 +52,10 @@ class Validator:
         s = re.sub(r"\n```$", "", s, flags=re.I)
         return s.strip()
 
-    def _ask_methods(self) -> List[str]:
-        prompt = f"Đề xuất 2-3 thuật toán phù hợp cho bài toán: {self.task_text}"
-        r = LLM.invoke(prompt)
-        txt = getattr(r, "content", str(r))
+    def _methods_prompt(self) -> str:
+        return f"Đề xuất 2-3 thuật toán phù hợp cho bài toán: {self.task_text}"
+
+    def _parse_methods(self, txt: str) -> List[str]:
         parts = re.split(r"[\n,;]+", txt)
         methods = []
         for p in parts:
@@ -37,10 +64,18 @@ class Validator:
                 methods.append(re.sub(r"^\d+\.\s*","",t))
         return methods[:6]
 
-    def _ask_code(self, method: str) -> str:
+    def _ask_methods(self) -> List[str]:
+        r = get_cached_llm().invoke(self._methods_prompt())
+        return self._parse_methods(getattr(r, "content", str(r)))
+
+    async def _aask_methods(self) -> List[str]:
+        r = await get_cached_llm().ainvoke(self._methods_prompt())
+        return self._parse_methods(getattr(r, "content", str(r)))
+
+    def _code_prompt(self, method: str) -> str:
         hint_f = f"Short form: {self.short_form}" if self.short_form else ""
         hint_dom = f"Domain: {self.domain_hint}" if self.domain_hint else ""
-        prompt = textwrap.dedent(f"""
+        return textwrap.dedent(f"""
         Viết script Python để áp dụng phương pháp '{method}' cho bài toán:
         {self.task_text}
         {hint_f}
@@ -48,11 +83,19 @@ class Validator:
         Yêu cầu: script in 1 dòng JSON duy nhất cuối cùng: {{ "method":..., "success": true/false, "iterations": int|null, "result": ..., "residual": float|null, "error": optional }}
         Tol={self.tol}, maxiter={self.maxiter}.
         """)
-        r = LLM.invoke(prompt)
+
+    def _ask_code(self, method: str) -> str:
+        r = get_cached_llm().invoke(self._code_prompt(method))
+        return self._clean(getattr(r, "content", str(r)))
+
+    async def _aask_code(self, method: str) -> str:
+        r = await get_cached_llm().ainvoke(self._code_prompt(method))
         return self._clean(getattr(r, "content", str(r)))
 
-    def _fallback(self, method: str) -> str:
-        # minimal fallback for root-finding when short_form exists
+    def _fallback(self, method: str) -> Optional[str]:
+        # minimal fallback for root-finding when short_form exists; other categories have no template
+        if self.category not in (None, "root_finding"):
+            return None
         f = self.short_form or "None"
         bracket = ""
         if self.domain_hint:
@@ -66,34 +109,360 @@ class Validator:
         }
         return templates.get(method, templates.get("Secant"))
 
-    def validate_methods(self, candidate_methods: Optional[List[str]] = None) -> List[Dict[str,Any]]:
+    def _parse_output(self, method: str, out: str) -> Dict[str,Any]:
+        parsed = {"method": method, "raw_output": out}
+        first_json = None
+        for line in (out or "").splitlines():
+            line=line.strip()
+            if line.startswith("{") and line.endswith("}"):
+                first_json=line; break
+        if first_json:
+            try:
+                parsed_json = json.loads(first_json)
+                parsed.update(parsed_json)
+            except Exception as e:
+                parsed["parse_error"] = str(e)
+        else:
+            parsed["parse_error"] = "no json line"
+        return parsed
+
+    def _isolate(self) -> List[tuple]:
+        """Brackets for the native engine: the domain_hint if it brackets a sign change, else a root scan."""
+        if self.compiled is None or self.category not in (None, "root_finding"):
+            return []
+        f = self.compiled.f
+        hint = parse_interval(self.domain_hint)
+        try:
+            if hint and f(hint[0]) * f(hint[1]) < 0:
+                return [hint]
+            return scan(f, hint)
+        except Exception:
+            return []
+
+    def _task_span(self, brackets: List[tuple]) -> float:
+        """Width of the interval the task gave: domain_hint, else the default scan domain holding the brackets."""
+        hint = parse_interval(self.domain_hint)
+        if hint:
+            return hint[1] - hint[0]
+        lo, hi = min(a for a, _ in brackets), max(b for _, b in brackets)
+        return next((b - a for a, b in DEFAULT_DOMAINS if a <= lo and hi <= b), hi - lo)
+
+    def _native_isolated(self, method: str) -> Dict[str,Any]:
+        """Refine all isolated roots in one batched call and report the one the task asks for."""
+        f = self.compiled.f
+        proper = [(a, b) for a, b in self.brackets if a < b]
+        runs = []
+        if proper:
+            a, b = (list(t) for t in zip(*proper))
+            runs = run_method(method, f, a, b, tol=self.tol, maxiter=self.maxiter, df=self.compiled.df)
+            span = self._task_span(proper)
+            for r, br in zip(runs, proper):
+                r["bracket"] = list(br)
+                if match_method(method) == "Bisection" and span > br[1] - br[0]:
+                    # đếm lặp từ khoảng của đề: số lần chia đôi để tới khoảng phân ly mà scan cho sẵn
+                    r["iterations"] += math.ceil(math.log2(span / (br[1] - br[0])))
+        # nghiệm đúng trên lưới (nghiệm kép): scan đã cho sẵn
+        for a, _ in (br for br in self.brackets if br[0] == br[1]):
+            runs.append({"method": method, "success": True, "iterations": 0, "result": a,
+                         "residual": float(abs(f(a))), "engine": "native", "bracket": [a, a]})
+        ok = [r for r in runs if r["success"]]
+        idx = root_selector(self.task_text)([r["result"] for r in ok]) if ok else None
+        metrics = dict(ok[idx] if idx is not None else runs[0])
+        if ok and idx is None:
+            # hội tụ nhưng không nghiệm nào thỏa ràng buộc của đề (dương / âm)
+            metrics.update(success=False, error="no root satisfies the task constraint")
+        if len(self.brackets) > 1:
+            metrics["roots"] = sorted(r["result"] for r in ok)
+        return metrics
+
+    def _native_linear(self, method: str) -> Optional[Dict[str,Any]]:
+        if self.system is None or match_linear(method) is None:
+            return None
+        A, b, names = self.system
+        try:
+            metrics = run_linear(method, A, b, tol=self.tol, maxiter=self.maxiter, omega=self.omega)
+        except Exception:
+            return None
+        metrics["variables"] = names
+        parsed = {"method": method, "raw_output": json.dumps(metrics)}
+        parsed.update(metrics)
+        return parsed
+
+    def _native_quadrature(self, method: str) -> Optional[Dict[str,Any]]:
+        q = self.quad
+        if q is None or match_quadrature(method) is None:
+            return None
+        try:
+            metrics = run_quadrature(method, q["f"], q["a"], q["b"], tol=q["tol"] or self.tol,
+                                     maxiter=self.maxiter, n=q["n"])[0]
+        except Exception:
+            return None
+        metrics["interval"] = [q["a"], q["b"]]
+        parsed = {"method": method, "raw_output": json.dumps(metrics)}
+        parsed.update(metrics)
+        return parsed
+
+    def _native_ivp(self, method: str) -> Optional[Dict[str,Any]]:
+        p = self.ivp
+        if p is None or match_ivp(method) is None:
+            return None
+        try:
+            metrics = run_ivp(method, p["f"], p["t0"], p["y0"], p["t1"], h=p["h"], tol=self.tol, jac=p["jac"])[0]
+        except Exception:
+            return None
+        metrics["t"] = p["t1"]
+        parsed = {"method": method, "raw_output": json.dumps(metrics)}
+        parsed.update(metrics)
+        return parsed
+
+    def _native(self, method: str) -> Optional[Dict[str,Any]]:
+        """Run `method` with the in-process engine; None when the engine does not cover it."""
+        if self.category == "linear_system":
+            return self._native_linear(method)
+        if self.category == "integration":
+            return self._native_quadrature(method)
+        if self.category == "ode_ivp":
+            return self._native_ivp(method)
+        if self.category not in (None, "root_finding") or self.compiled is None or match_method(method) is None:
+            return None
+        try:
+            if self.brackets:
+                metrics = self._native_isolated(method)
+            else:
+                a, b = parse_interval(self.domain_hint) or (-10.0, 10.0)
+                metrics = run_method(method, self.compiled.f, a, b, tol=self.tol, maxiter=self.maxiter,
+                                     df=self.compiled.df)[0]
+        except Exception:
+            return None
+        parsed = {"method": method, "raw_output": json.dumps(metrics)}
+        parsed.update(metrics)
+        return parsed
+
+    def _validate_one(self, method: str, guard: Optional[RunGuard] = None) -> Dict[str,Any]:
+        t0 = time.perf_counter()
+        try:
+            return self._validate_candidate(method, guard)
+        finally:
+            self.timings[method] = round(time.perf_counter() - t0, 4)
+
+    def _validate_candidate(self, method: str, guard: Optional[RunGuard] = None) -> Dict[str,Any]:
+        if guard is not None and guard.cancelled:
+            raise _Cancelled()
+        native = self._native(method)
+        if native is not None:
+            return native
+        code = ""
+        try:
+            code = self._ask_code(method)
+            if not code or "print" not in code or "json" not in code:
+                code = self._fallback(method)
+        except Exception:
+            code = self._fallback(method)
+        if code is None:
+            return self._parse_output(method, "Error: no script for this method")
+        # race mode / timeout: bỏ qua sandbox nếu candidate đã bị hủy trong lúc sinh code
+        if guard is not None and guard.cancelled:
+            raise _Cancelled()
+        out = execute_guarded(code, guard)
+        return self._parse_output(method, out)
+
+    def accepts(self, result: Dict[str,Any], iter_budget: Optional[int] = None) -> bool:
+        """Default race acceptance: success, residual <= tol and (optionally) iterations <= iter_budget."""
+        if not result.get("success"):
+            return False
+        try:
+            if result.get("residual") is None or abs(float(result["residual"])) > self.tol:
+                return False
+        except (TypeError, ValueError):
+            return False
+        if iter_budget is not None:
+            it = result.get("iterations")
+            if not isinstance(it, (int, float)) or it > iter_budget:
+                return False
+        return True
+
+    @staticmethod
+    def _cancelled_result(method: str, started_at: Optional[float], now: float, expected: float,
+                          guard: Optional[RunGuard] = None) -> Dict[str,Any]:
+        # est_saved_seconds: ước lượng (thời gian trung bình của các candidate đã xong - elapsed), không phải đo
+        elapsed = now - started_at if started_at is not None else 0.0
+        return {
+            "method": method, "raw_output": "", "success": False, "error": "cancelled",
+            "cancelled": True, "cancel_stage": "running" if started_at is not None else "queued",
+            "sandbox_killed": bool(guard is not None and guard.killed),
+            "elapsed": round(elapsed, 3), "est_saved_seconds": round(max(0.0, expected - elapsed), 3),
+        }
+
+    def _validate_concurrent(self, methods: List[str], max_workers: int, timeout: float,
+                             accept: Optional[Callable[[Dict[str,Any]], bool]] = None) -> List[Dict[str,Any]]:
+        """
+        Run _validate_one for all methods in a thread pool (LLM + sandbox calls are I/O bound).
+        `timeout` is counted per candidate from the moment it starts running; a candidate that
+        exceeds it is reported as a failed run. Results keep the order of `methods`.
+
+        Each candidate runs under a RunGuard: the sandbox gets only the time left before its deadline,
+        and a timed-out candidate's sandbox is killed (never handed back to the pool).
+
+        With `accept` (race mode) the first result passing the predicate wins: queued candidates
+        are dropped, running ones skip their sandbox call or have their sandbox killed, and each of
+        them is reported with `cancelled`, `cancel_stage`, `sandbox_killed`, `elapsed` and
+        `est_saved_seconds` (an estimate from the mean duration of finished candidates).
+        """
+        started: Dict[int, float] = {}
+        durations: List[float] = []
+        guards = [RunGuard() for _ in methods]
+        def job(i: int, m: str) -> Dict[str,Any]:
+            started[i] = time.monotonic()
+            guards[i].deadline = started[i] + timeout
+            return self._validate_one(m, guards[i])
+
+        pool = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(methods))))
+        # copy_context: để instrumentation (ContextVar) thấy RunReport hiện tại trong thread
+        futures = {pool.submit(contextvars.copy_context().run, job, i, m): i for i, m in enumerate(methods)}
+        results: List[Optional[Dict[str,Any]]] = [None] * len(methods)
+        pending = set(futures)
+        winner = None
+        try:
+            while pending and winner is None:
+                done, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    i = futures[fut]
+                    try:
+                        results[i] = fut.result()
+                    except _Cancelled:
+                        continue
+                    except Exception as e:
+                        results[i] = self._parse_output(methods[i], f"Error: {e}")
+                    if i in started:
+                        durations.append(time.monotonic() - started[i])
+                    if accept is not None and winner is None and accept(results[i]):
+                        winner = i
+                now = time.monotonic()
+                for fut in list(pending):
+                    i = futures[fut]
+                    if i in started and now - started[i] > timeout:
+                        pending.discard(fut)
+                        guards[i].cancel()
+                        results[i] = self._parse_output(methods[i], f"Error: timeout after {timeout}s")
+            if winner is not None:
+                now = time.monotonic()
+                # ước lượng thời gian 1 candidate = trung bình các candidate đã chạy xong
+                expected = sum(durations) / len(durations) if durations else 0.0
+                for fut in pending:
+                    i = futures[fut]
+                    fut.cancel()
+                    guards[i].cancel()
+                    results[i] = self._cancelled_result(methods[i], started.get(i), now, expected, guards[i])
+                results[winner]["race_winner"] = True
+        finally:
+            # mọi candidate chưa xong (kể cả khi vòng chờ bị ngắt) đều bị hủy qua guard của nó: sandbox đang chạy
+            # bị kill, thread còn sinh code / chạy native (có giới hạn bước) thì không bao giờ tới được sandbox
+            for fut, i in futures.items():
+                if not fut.done():
+                    fut.cancel()
+                    guards[i].cancel()
+            pool.shutdown(wait=False, cancel_futures=True)
+        return results
+
+    def validate_methods(self, candidate_methods: Optional[List[str]] = None, concurrent: bool = False,
+                         max_workers: int = 4, timeout: float = 120.0, race: bool = False,
+                         accept: Optional[Callable[[Dict[str,Any]], bool]] = None,
+                         iter_budget: Optional[int] = None) -> List[Dict[str,Any]]:
+        """
+        concurrent: validate candidates in parallel (see _validate_concurrent).
+        race: concurrent + stop at the first result accepted by `accept`
+              (default: self.accepts with `iter_budget`) and cancel the rest.
+        """
         methods = candidate_methods or self.candidate_methods or self._ask_methods()
         methods = methods[:6]
-        results = []
-        for m in methods:
-            code = ""
-            try:
-                code = self._ask_code(m)
-                if not code or "print" not in code or "json" not in code:
-                    code = self._fallback(m)
-            except Exception:
-                code = self._fallback(m)
-            out = e2b_sandbox_tool.invoke(code)
-            parsed = {"method": m, "raw_output": out}
-            first_json = None
-            for line in (out or "").splitlines():
-                line=line.strip()
-                if line.startswith("{") and line.endswith("}"):
-                    first_json=line; break
-            if first_json:
+        if race:
+            accept = accept or (lambda r: self.accepts(r, iter_budget))
+            return self._validate_concurrent(methods, max_workers, timeout, accept)
+        if concurrent and len(methods) > 1:
+            return self._validate_concurrent(methods, max_workers, timeout)
+        return [self._validate_one(m) for m in methods]
+
+    async def _avalidate_one(self, method: str, guard: Optional[RunGuard] = None) -> Dict[str,Any]:
+        t0 = time.perf_counter()
+        try:
+            return await self._avalidate_candidate(method, guard)
+        finally:
+            self.timings[method] = round(time.perf_counter() - t0, 4)
+
+    async def _avalidate_candidate(self, method: str, guard: Optional[RunGuard] = None) -> Dict[str,Any]:
+        # engine native là CPU-bound: chạy trong thread để không chặn event loop (wait_for của candidate vẫn áp dụng)
+        native = await asyncio.to_thread(self._native, method)
+        if native is not None:
+            return native
+        try:
+            code = await self._aask_code(method)
+            if not code or "print" not in code or "json" not in code:
+                code = self._fallback(method)
+        except Exception:
+            code = self._fallback(method)
+        if code is None:
+            return self._parse_output(method, "Error: no script for this method")
+        # sandbox client là sync: chạy trong executor để không chặn event loop; hủy task -> guard.cancel() kill sandbox
+        out = await asyncio.to_thread(execute_guarded, code, guard)
+        return self._parse_output(method, out)
+
+    async def avalidate_methods(self, candidate_methods: Optional[List[str]] = None, concurrent: bool = True,
+                                max_workers: int = 4, timeout: float = 120.0, race: bool = False,
+                                accept: Optional[Callable[[Dict[str,Any]], bool]] = None,
+                                iter_budget: Optional[int] = None) -> List[Dict[str,Any]]:
+        """
+        Async validate_methods: same options and result dicts, but LLM calls use ainvoke and
+        sandbox runs are offloaded to threads. A candidate that times out or loses the race is
+        cancelled (pending LLM requests are dropped) and the sandbox its thread holds is killed.
+        """
+        methods = candidate_methods or self.candidate_methods or await self._aask_methods()
+        methods = methods[:6]
+        if not (concurrent or race):
+            return [await self._avalidate_one(m) for m in methods]
+        sem = asyncio.Semaphore(max(1, max_workers))
+        started: Dict[int, float] = {}
+        guards: Dict[int, RunGuard] = {}
+
+        async def one(i: int, m: str) -> Dict[str,Any]:
+            async with sem:
+                started[i] = time.monotonic()
+                guards[i] = RunGuard(timeout)
                 try:
-                    parsed_json = json.loads(first_json)
-                    parsed.update(parsed_json)
+                    return await asyncio.wait_for(self._avalidate_one(m, guards[i]), timeout)
+                except asyncio.TimeoutError:
+                    guards[i].cancel()
+                    return self._parse_output(m, f"Error: timeout after {timeout}s")
+                except asyncio.CancelledError:
+                    guards[i].cancel()
+                    raise
                 except Exception as e:
-                    parsed["parse_error"] = str(e)
-            else:
-                parsed["parse_error"] = "no json line"
-            results.append(parsed)
+                    return self._parse_output(m, f"Error: {e}")
+
+        tasks = {asyncio.ensure_future(one(i, m)): i for i, m in enumerate(methods)}
+        if not race:
+            return list(await asyncio.gather(*tasks))
+        accept = accept or (lambda r: self.accepts(r, iter_budget))
+        results: List[Optional[Dict[str,Any]]] = [None] * len(methods)
+        durations: List[float] = []
+        pending, winner = set(tasks), None
+        while pending and winner is None:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for t in done:
+                i = tasks[t]
+                results[i] = t.result()
+                durations.append(time.monotonic() - started[i])
+                if winner is None and accept(results[i]):
+                    winner = i
+        if winner is not None:
+            now = time.monotonic()
+            expected = sum(durations) / len(durations) if durations else 0.0
+            for t in pending:
+                t.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            for t in pending:
+                i = tasks[t]
+                results[i] = self._cancelled_result(methods[i], started.get(i), now, expected, guards.get(i))
+            results[winner]["race_winner"] = True
         return results
 
     def pick_best(self, results: List[Dict[str,Any]]) -> Dict[str,Any]: